@@ -1,6 +1,6 @@
+import os
 import streamlit as st
 import requests
-from bs4 import BeautifulSoup
 from auth import *
 import pytrends
 from googleapiclient.discovery import build
@@ -10,47 +10,48 @@ from google.auth.transport.requests import Request
 from httpx_oauth.clients.google import GoogleOAuth2
 import matplotlib.pyplot as plt
 from google_auth_oauthlib import flow
-from pytrends.request import TrendReq
 import datetime
 import pandas as pd
 import numpy as np
 import pickle
 import asyncio
 import json
-
-# Helper function to convert large numbers to thousands, millions, etc.
-def format_number(number):
-    if number >= 1_000_000_000:
-        return f"{number / 1_000_000_000:.1f}B"
-    elif number >= 1_000_000:
-        return f"{number / 1_000_000:.1f}M"
-    elif number >= 1_000:
-        return f"{number / 1_000:.1f}K"
-    return str(number)
+from viralbot import analytics
+from viralbot.youtube_api import get_client, credential_key, client_registry, execute_request, project_key
+from viralbot.credentials import ManagedCredentials, credential_manager
+from viralbot.response_cache import response_cache
+from viralbot.singleflight import single_flight
+from viralbot.tracing import tracer, span
+from viralbot.resilience import circuit_breakers
+from viralbot.memo import memo_cache
+from viralbot.video_store import video_store
+from viralbot.tag_index import tag_index
+from viralbot.utils import format_number, extract_video_id, data_path
+from viralbot.video_batch import get_videos_bulk
+from viralbot.channel_resolver import resolve_channel_id
+from viralbot.comments import ingest_comments
+from viralbot.catalog import CATALOG_COLUMNS
+from viralbot.jobs import ACTIVE, DONE, RESUMABLE, job_runner, read_parts
+from viralbot.quota import quota_ledger
+from viralbot.velocity import snapshot_collector, snapshot_store, watchlist
+from viralbot.scoring import rank_videos
 
 def get_channel_id(Channel_url):
-    # Fetch the page content
-    response = requests.get(Channel_url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
-    # Find channel ID in the page metadata
-    channel_link = soup.find("link", {"rel": "canonical"})
-    if channel_link:
-        canonical_url = channel_link["href"]
-        channel_id = canonical_url.split("/")[-1]
-        return channel_id
-    else:
+    # Resolved IDs are remembered on disk, so repeat lookups skip the network
+    youtube = get_service() if session_credentials() else None
+    return resolve_channel_id(Channel_url, youtube)
+
+
+# Run an analytics function with the session's client, reporting failures
+def run_analytics(function, *args, **kwargs):
+    youtube = get_service()
+    if youtube is None:
+        return None
+    try:
+        return function(youtube, *args, **kwargs)
+    except Exception as e:
+        st.error(f"API request failed: {e}")
         return None
-    
-def extract_video_id(video_url):
-    # Split the URL by slashes and take the last part
-    video_id = video_url.split('/')[-1]
-    
-    # If the video ID contains a query string (e.g., ?si=...)
-    if '?' in video_id:
-        video_id = video_id.split('?')[0]
-    
-    return video_id
 
 
 def get_channel_analytics(Channel_url):
@@ -59,25 +60,12 @@ def get_channel_analytics(Channel_url):
     if not channel_id:
         return None
     
-    youtube = get_service()
-    response = execute_api_request(
-        youtube.channels().list,
-        part="statistics",
-        id=channel_id
-    )
-    
-    if 'items' in response and response['items']:
-        stats = response['items'][0]['statistics']
-        
-        # Create DataFrame
-        data = {
-            "Metric": ["Subscriber Count", "Total Views", "Total Videos"],
-            "Value": [int(stats.get('subscriberCount', 0)), int(stats.get('viewCount', 0)), int(stats.get('videoCount', 0))]
-        }
-        df = pd.DataFrame(data)
+    df = run_analytics(analytics.channel_analytics, channel_id)
+    if df is not None:
         # Plot
         st.write("### Channel Analytics")
-        st.bar_chart(df.set_index("Metric")["Value"])
+        with span("render.chart"):
+            st.bar_chart(df.set_index("Metric")["Value"])
         return df
     else:
         st.write(f"No data found for channel {channel_id}")
@@ -85,74 +73,50 @@ def get_channel_analytics(Channel_url):
 
 
 def get_video_metrics(video_url):
-    video_id = extract_video_id(video_url)
-    youtube = get_service()
-    response = execute_api_request(
-        youtube.videos().list,
-        part="statistics",
-        id=video_id
-    )
+    df = run_analytics(analytics.video_metrics, video_url)
     
-    if 'items' in response and response['items']:
-        stats = response['items'][0]['statistics']
-        
-        # Create DataFrame
-        data = {
-            "Metric": ["View Count", "Like Count", "Comment Count"],
-            "Value": [int(stats.get('viewCount', 0)), int(stats.get('likeCount', 0)), int(stats.get('commentCount', 0))]
-        }
-        df = pd.DataFrame(data)
-        
+    if df is not None:
         # Plot
         st.write("### Video Metrics")
-        st.bar_chart(df.set_index("Metric")["Value"])
+        with span("render.chart"):
+            st.bar_chart(df.set_index("Metric")["Value"])
         
         return df
     else:
-        st.write(f"No data found for video {video_id}")
+        st.write(f"No data found for video {extract_video_id(video_url)}")
         return None
 
 def search_youtube(query, max_results=5):
-    youtube = get_service()
-    response = execute_api_request(
-        youtube.search().list,
-        part="snippet",
-        q=query,
-        type="video,channel,playlist",
-        maxResults=max_results
-    )
+    df = run_analytics(analytics.search_youtube, query, max_results)
     
-    if 'items' in response:
-        data = [{
-            "Title": item['snippet']['title'],
-            "Type": item['id']['kind'].split('#')[-1],  # Extract video, channel, or playlist
-            "Description": item['snippet']['description']
-        } for item in response['items']]
-        
-        df = pd.DataFrame(data)
+    if df is not None:
         return df
     else:
         st.write(f"No results found for query '{query}'")
         return None
 
 
+def deep_search_youtube(queries, max_results, quota_budget, new_only):
+    # Hits already shown this session are skipped when new_only is set
+    seen = st.session_state.setdefault("search_seen", set()) if new_only else None
+    result = run_analytics(analytics.deep_search, queries, max_results, quota_budget, seen)
+    if result is None:
+        return None
+    df, stats = result
+    st.caption(
+        f"{stats['pages']} pages ({stats['cached_pages']} cached), "
+        f"{stats['quota_units']} quota units, {stats['duplicates']} duplicates skipped"
+    )
+    if df is None:
+        st.write("No results found")
+    return df
+
+
 def get_channel_info(channel_url):
     channel_id = get_channel_id(channel_url)
     
-    youtube = get_service()
-    response = execute_api_request(
-        youtube.channels().list,
-        part="snippet",
-        id=channel_id
-    )
-    
-    if 'items' in response:
-        snippet = response['items'][0]['snippet']
-        data = {
-            "Metric": ["Title", "Description", "Published At"],
-            "Value": [snippet.get('title'), snippet.get('description'), snippet.get('publishedAt')]
-        }
-        df = pd.DataFrame(data)
+    df = run_analytics(analytics.channel_info, channel_id)
+    if df is not None:
         return df
     else:
         st.write(f"No data found for channel {channel_id}")
@@ -166,220 +130,204 @@ def get_playlists_from_channel(channel_url):
         st.write("Channel ID could not be retrieved.")
         return None
 
-    # Get YouTube service
-    youtube = get_service()
-    
-    # Retrieve playlists for the channel
-    response = execute_api_request(
-        youtube.playlists().list,
-        part="snippet",
-        channelId=channel_id,
-        maxResults=50  # Adjust as needed
-    )
+    # Retrieve every page of playlists for the channel
+    playlists = run_analytics(analytics.channel_playlists, channel_id)
     
-    if 'items' in response:
-        playlists = [{
-            "Title": item['snippet']['title'],
-            "Playlist ID": item['id']
-        } for item in response['items']]
-        
+    if playlists:
         return playlists
-    else:
+    elif playlists is not None:
         st.write(f"No playlists found for channel {channel_id}")
+    return None
+
+# Crawl every upload of a channel into a catalog saved as Parquet
+def get_channel_catalog(channel_url, max_videos=None):
+    channel_id = get_channel_id(channel_url)
+    if not channel_id:
+        st.write("Channel ID could not be retrieved.")
         return None
+    
+    progress = st.empty()
+    crawl = run_analytics(
+        analytics.channel_catalog, channel_id,
+        max_videos=max_videos,
+        output_path=data_path(f"catalog_{channel_id}.parquet"),
+        on_progress=lambda count: progress.write(f"{count:,} videos listed...")
+    )
+    if crawl is None:
+        return None
+    _, catalog_df, failures_df = crawl
+    if not failures_df.empty:
+        st.write(f"{len(failures_df)} videos could not be enriched")
+    return catalog_df
 
 def get_playlist_details(playlist_id):
-    youtube = get_service()
-    response = execute_api_request(
-        youtube.playlists().list,
-        part="snippet,contentDetails",
-        id=playlist_id
-    )
+    df = run_analytics(analytics.playlist_details, playlist_id)
     
-    if 'items' in response:
-        details = response['items'][0]
-        snippet = details['snippet']
-        content_details = details['contentDetails']
-        
-        # Parse publishedAt date
-        published_at = datetime.datetime.strptime(snippet.get('publishedAt'), '%Y-%m-%dT%H:%M:%SZ')
-        published_at_formatted = published_at.strftime('%B %d, %Y at %I:%M %p')
-        
-        data = {
-            "Metric": [
-                "Title",
-                "Description",
-                "Published At",
-                "Video Count"
-            ],
-            "Value": [
-                snippet.get('title'),
-                snippet.get('description'),
-                published_at_formatted,
-                content_details.get('itemCount'),
-            ]
-        }
-        
-        
-        
-        df = pd.DataFrame(data)
+    if df is not None:
         st.write(df)
-        
     else:
         st.write(f"No data found for playlist {playlist_id}")
         return None
 
 
 
-def get_video_comments(video_url, max_results=10):
-    video_id = extract_video_id(video_url)
-    youtube = get_service()
-    response = execute_api_request(
-        youtube.commentThreads().list,
-        part="snippet",
-        videoId=video_id,
-        maxResults=max_results
-    )
+def get_video_comments(video_url, max_results=10, include_replies=False):
+    df = run_analytics(analytics.video_comments, video_url, max_results, include_replies)
     
-    if 'items' in response:
-        comments = [{
-            "Comment": item['snippet']['topLevelComment']['snippet']['textDisplay'],
-            "Author": item['snippet']['topLevelComment']['snippet']['authorDisplayName'],
-            "Published At": item['snippet']['topLevelComment']['snippet']['publishedAt']
-        } for item in response['items']]
-        
-        df = pd.DataFrame(comments)
+    if df is not None:
         return df
     else:
-        st.write(f"No comments found for video {video_id}")
+        st.write(f"No comments found for video {extract_video_id(video_url)}")
         return None
 
 
-def get_video_details(video_url):
+def get_comment_insights(video_url, max_comments, include_replies=False):
+    insights = run_analytics(analytics.comment_insights, video_url, max_comments, include_replies)
+    if insights is None:
+        st.write(f"No comments found for video {extract_video_id(video_url)}")
+    return insights
+
+
+# Stream every comment of a video to Parquet files on the server, resuming
+# a previous export of the same video if it was interrupted and replacing
+# it if it finished
+def export_video_comments(video_url, include_replies=False):
     video_id = extract_video_id(video_url)
     youtube = get_service()
-    response = execute_api_request(
-        youtube.videos().list,
-        part="snippet,statistics,contentDetails",
-        id=video_id
-    )
+    if youtube is None:
+        return None
+    output_dir = data_path(os.path.join("comments", video_id))
+    progress = st.empty()
+    try:
+        return output_dir, ingest_comments(
+            youtube, video_id, output_dir,
+            include_replies=include_replies,
+            on_progress=lambda count: progress.write(f"{count:,} comments fetched..."),
+            refresh=True
+        )
+    except Exception as e:
+        st.error(f"API request failed: {e}")
+        return None
+
+
+def get_video_details(video_url):
+    df = run_analytics(analytics.video_details, video_url)
     
-    if 'items' in response:
-        details = response['items'][0]
-        snippet = details['snippet']
-        statistics = details['statistics']
-        content_details = details['contentDetails']
-        
-        # Parse publishedAt date
-        published_at = datetime.datetime.strptime(snippet.get('publishedAt'), '%Y-%m-%dT%H:%M:%SZ')
-        published_at_formatted = published_at.strftime('%B %d, %Y at %I:%M %p')
-        
-        data = {
-            "Metric": [
-                "Title",
-                "Description",
-                "Published At",
-                "Duration",
-                "View Count",
-                "Like Count",
-                "Dislike Count",
-                "Comment Count",
-                "Category"
-            ],
-            "Value": [
-                snippet.get('title'),
-                snippet.get('description'),
-                published_at_formatted,
-                content_details.get('duration'),
-                statistics.get('viewCount'),
-                statistics.get('likeCount'),
-                statistics.get('dislikeCount'),
-                statistics.get('commentCount'),
-                snippet.get('categoryId')
-            ]
-        }
-        
-        df = pd.DataFrame(data)
+    if df is not None:
         return df
     else:
-        st.write(f"No data found for video {video_id}")
+        st.write(f"No data found for video {extract_video_id(video_url)}")
 
 # Function to get view count from a video and estimate earnings
 def estimate_earnings(video_url):
-    video_id = extract_video_id(video_url)
-    youtube = get_service()
-    response = execute_api_request(
-        youtube.videos().list,
-        part="statistics",
-        id=video_id
-    )
+    # Earnings calculation using the selected industry's average CPI
+    estimated_earnings = run_analytics(analytics.estimate_earnings, video_url, selected_industry)
     
-    if 'items' in response:
-        stats = response['items'][0]['statistics']
-        view_count = int(stats.get('viewCount', 0))
-        
-        # Get average CPI for selected industry
-        cpi_min, cpi_max = industries[selected_industry]
-        average_cpi = (cpi_min + cpi_max) / 2
-        
-        # Earnings calculation using CPI
-        estimated_earnings = view_count * average_cpi
-        
+    if estimated_earnings is not None:
         # Plot earnings as a bar chart
         st.write("### Earnings Estimation")
         st.write(f"Estimated Earnings: ${estimated_earnings:.2f}")
         
         return estimated_earnings
     else:
-        st.write(f"No data found for video {video_id}")
+        st.write(f"No data found for video {extract_video_id(video_url)}")
         return None
 
 # Function to get video tags and rankings
 def get_video_tags(video_url):
-    video_id = extract_video_id(video_url)
-    youtube = get_service()
-    response = execute_api_request(
-        youtube.videos().list,
-        part="snippet,statistics",
-        id=video_id
-    )
+    df = run_analytics(analytics.video_tags, video_url)
     
-    if 'items' in response:
-        item = response['items'][0]
-        tags = item['snippet'].get('tags', [])
-        view_count = item['statistics'].get('viewCount', 0)
-        
-        # Create DataFrame
-        data = {
-            "Tag": tags,
-            "Ranking": [i + 1 for i in range(len(tags))],
-            "View Count": [format_number(int(view_count))] * len(tags)
-        }
-        df = pd.DataFrame(data)
-        
+    if df is not None:
+        df["View Count"] = df["View Count"].apply(format_number)
         st.write("### Video Tags and Rankings")
+        st.caption(f"Ranked by total views across {tag_index.stats()['videos']:,} indexed videos")
         return df 
     else:
-        st.write(f"No data found for video {video_id}")
-        return None
+        st.write(f"No data found for video {extract_video_id(video_url)}")
     
 # Function to get trending keywords based on region
 def get_trending_keywords(country):
-    pytrends = TrendReq()
-    
-    # Get trending searches for the specified region
-    trending_searches_df = pytrends.trending_searches(pn=country)
-    
-    # Simulate search volumes (you can implement your logic here)
-    trending_data = {
-        "Keyword": trending_searches_df[0].tolist(),
-        "Search Volume": [np.random.randint(100_000, 2_000_000) for _ in range(len(trending_searches_df))],
-        "Region": [country] * len(trending_searches_df)
-    }
-    
-    df = pd.DataFrame(trending_data)
-    df["Search Volume"] = df["Search Volume"].apply(format_number)
-    return df
+    try:
+        return analytics.trending_keywords(country)
+    except Exception as e:
+        st.error(f"Google Trends request failed: {e}")
+        return None
+
+
+JOB_LABELS = {"crawl_channel": "Channel crawl", "pull_comments": "Comment export", "refresh_watchlist": "Watchlist snapshot"}
+# Seconds between progress polls while a job is queued or running
+JOB_POLL_INTERVAL = 2
+
+
+# Jobs belong to the Google account, which survives token rotation and
+# signing in again. Without a profile the account's channel stands in.
+def job_owner():
+    user_info = st.session_state.get("user_info") or {}
+    if user_info.get("id") or user_info.get("email"):
+        return f"google:{user_info.get('id') or user_info['email']}"
+    if "job_owner" not in st.session_state:
+        youtube = get_service()
+        if youtube is None:
+            return None
+        try:
+            items = execute_request(youtube.channels().list, part="id", mine=True).get("items") or []
+        except Exception as e:
+            st.error(f"API request failed: {e}")
+            return None
+        st.session_state["job_owner"] = f"channel:{items[0]['id']}" if items else None
+    return st.session_state["job_owner"]
+
+
+# Hand a long crawl to the background workers instead of blocking the page
+def start_job(kind, params):
+    youtube = get_service()
+    owner = job_owner()
+    if youtube is None or owner is None:
+        if youtube is not None:
+            st.write("Background jobs need an account with a profile or a channel.")
+        return None
+    job_id = job_runner.submit(kind, params, youtube, owner=owner)
+    st.success(f"Started job #{job_id}. Follow it under Background Jobs.")
+    return job_id
+
+
+def show_job(job):
+    subject = job["params"].get("channel_id") or job["params"].get("video_id") or ""
+    st.write(f"**#{job['id']} {JOB_LABELS.get(job['kind'], job['kind'])}** {subject} ({job['status']})")
+    if job["total"]:
+        st.progress(min(job["progress"] / job["total"], 1.0), text=job["message"])
+    elif job["message"]:
+        st.caption(job["message"])
+    if job["error"]:
+        st.error(job["error"])
+    col1, col2 = st.columns(2)
+    # A full rerun decides again whether the panel needs polling
+    if job["status"] in ACTIVE and col1.button("Cancel", key=f"cancel_job_{job['id']}"):
+        job_runner.cancel(job["id"])
+        st.rerun()
+    if job["status"] in RESUMABLE and col1.button("Resume", key=f"resume_job_{job['id']}"):
+        youtube = get_service()
+        if youtube is not None:
+            job_runner.resume(job["id"], youtube)
+            st.rerun()
+    if job["status"] == DONE and job["kind"] == "crawl_channel" and col2.button("Show Catalog", key=f"show_job_{job['id']}"):
+        catalog_df = read_parts(os.path.join(job["result"]["output_dir"], "catalog"), CATALOG_COLUMNS)
+        st.write(catalog_df)
+        st.download_button("Download CSV", catalog_df.to_csv(index=False), f"catalog_{job['id']}.csv", "text/csv",
+                           key=f"download_job_{job['id']}")
+
+
+# The account's jobs; while any is active this runs as a fragment that
+# re-polls the job table every few seconds without rerunning the page
+def jobs_panel(owner, polling):
+    jobs = job_runner.jobs(owner=owner)
+    if not jobs:
+        st.write("No background jobs yet. Start one from Channel Catalog, Video Comments or Velocity Tracker.")
+    for job in jobs:
+        with st.container(border=True):
+            show_job(job)
+    if polling and not any(job["status"] in ACTIVE for job in jobs):
+        st.rerun()
 
 client_config = st.sidebar.file_uploader("Upload your client secret JSON file", type=["json"])
 if client_config:
@@ -387,28 +335,73 @@ if client_config:
 redirect_uri = "https://youtube-viral-chatbot-7szrdtxws3dzuyxgaqwoka.streamlit.app"
 
 # Local Storage Functions
-def ls_get(key):
-    unique_key = f"ls_get_{key}_{st.session_state.get('user_info', {}).get('email', 'default')}"  # Include email or a unique identifier
-    return st_js_blocking(f"return JSON.parse(localStorage.getItem('{key}'));", key=unique_key)
+# localStorage keys mirrored in session state
+BROWSER_STORAGE_KEYS = ("user_info", "credential_handle")
+
+# Read every mirrored key in one round trip, once per browser session.
+# Later reruns use the session state copy and never touch the JS bridge.
+def hydrate_browser_storage():
+    if "browser_storage" not in st.session_state:
+        keys = json.dumps(BROWSER_STORAGE_KEYS)
+        stored = st_js_blocking(
+            f"return Object.fromEntries({keys}.map(k => [k, JSON.parse(localStorage.getItem(k))]));",
+            key="ls_hydrate"
+        )
+        st.session_state["browser_storage"] = stored or {}
+    return st.session_state["browser_storage"]
 
-def ls_set(key, value, session_key=None):
-    json_data = json.dumps(value, ensure_ascii=False)
-    unique_key = f"ls_set_{key}_{st.session_state.get('user_info', {}).get('email', 'default')}"
-    st_js_blocking(f"localStorage.setItem('{key}', JSON.stringify({json_data}));", key=unique_key)
+def ls_get(key):
+    return hydrate_browser_storage().get(key)
+
+# Write through to localStorage only when the value changed. The write is
+# fire-and-forget: the script doesn't wait for the browser.
+def ls_set(key, value):
+    storage = hydrate_browser_storage()
+    if storage.get(key) == value:
+        return
+    storage[key] = value
+    writes = st.session_state["browser_storage_writes"] = st.session_state.get("browser_storage_writes", 0) + 1
+    if value is None:
+        code = f"localStorage.removeItem({json.dumps(key)});"
+    else:
+        code = f"localStorage.setItem({json.dumps(key)}, JSON.stringify({json.dumps(value, ensure_ascii=False)}));"
+    st_js(code, expect_result=False, key=f"ls_set_{writes}")
 
 # Initialize session with user info if it exists in local storage
 def init_session():
-    user_info = ls_get("user_info")  # Adjusted to call ls_get with a single argument
+    user_info = ls_get("user_info")
     if user_info:
         st.session_state["user_info"] = user_info
+    # The handle brings back this browser's credentials after a server restart
+    credential_handle = ls_get("credential_handle")
+    if credential_handle and "credential_handle" not in st.session_state:
+        st.session_state["credential_handle"] = credential_handle
+
+
+# The session's live credentials from the credential manager. Credentials
+# put in session state some other way are handed over to it first. Every
+# rerun goes through the manager so an active session is never let go as
+# idle, and always gets the one live object for its handle.
+def session_credentials():
+    credentials = st.session_state.get("credentials")
+    if credentials is not None and not isinstance(credentials, ManagedCredentials):
+        st.session_state["credential_handle"] = credential_manager.register(credentials)
+        ls_set("credential_handle", st.session_state["credential_handle"])
+    credentials = None
+    if st.session_state.get("credential_handle"):
+        credentials = credential_manager.get(st.session_state["credential_handle"])
+    st.session_state["credentials"] = credentials
+    return credentials
 
 # Authentication flow with Google OAuth
 # Updated auth_flow to save credentials
 def auth_flow():
     st.write("Welcome to My App!")
-    query_params = st.query_params()
+    if not client_config:
+        st.info("Upload your client secret JSON file to sign in.")
+        return
     # Get the authorization code from query parameters
-    auth_code = query_params.get("code", [None])[0]
+    auth_code = st.query_params.get("code")
     flow_instance = flow.Flow.from_client_config(
         client_config,
         scopes=[
@@ -424,8 +417,12 @@ def auth_flow():
 
     if auth_code:
         flow_instance.fetch_token(code=auth_code)
-        credentials = flow_instance.credentials
+        # The credential manager keeps them fresh and on disk from here on
+        credential_handle = credential_manager.register(flow_instance.credentials)
+        credentials = credential_manager.get(credential_handle)
+        st.session_state["credential_handle"] = credential_handle
         st.session_state["credentials"] = credentials  # Save credentials here
+        ls_set("credential_handle", credential_handle)
         st.write("Login Done")
 
         user_info_service = build("oauth2", "v2", credentials=credentials)
@@ -466,23 +463,15 @@ st.title("YouTube Viral ChatBot")
 
 # Updated get_service to handle missing credentials
 def get_service():
-    if "credentials" not in st.session_state or st.session_state["credentials"] is None:
+    credentials = session_credentials()
+    if credentials is None:
         st.error("Please sign in first.")
         return None
     try:
-        service = build("youtube", "v3", credentials=st.session_state["credentials"])
-        return service
+        return get_client(credentials)
     except Exception as e:
         st.error(f"Error building YouTube service: {e}")
         return None
-    
-def execute_api_request(client_library_function, **kwargs):
-    try:
-        response = client_library_function(**kwargs).execute()
-        return response
-    except Exception as e:
-        st.error(f"API request failed: {e}")
-        return None
 
 # # Load secrets from Streamlit Cloud
 # CLIENT_ID = st.secrets["general"]["CLIENT_ID"]
@@ -572,31 +561,6 @@ def execute_api_request(client_library_function, **kwargs):
 #         # Perform authentication
 #         auth_flow()
 
-st.image("https://raw.githubusercontent.com/CertifiedAuthur/Youtube-Viral-Bot/refs/heads/main/YoutubeViralChatbot.png", width=200)
-st.title("YouTube Viral ChatBot")
-
-# Updated get_service to handle missing credentials
-def get_service():
-    if "credentials" not in st.session_state or st.session_state["credentials"] is None:
-        st.error("Please sign in first.")
-        return None
-    try:
-        service = build("youtube", "v3", credentials=google.oauth2.credentials.Credentials(**st.session_state["credentials"]))
-        return service
-    except Exception as e:
-        st.error(f"Error building YouTube service: {e}")
-        return None
-    
-def execute_api_request(client_library_function, **kwargs):
-    try:
-        response = client_library_function(**kwargs).execute()
-        return response
-    except Exception as e:
-        st.error(f"API request failed: {e}")
-        return None
-
-if __name__ == "__main__":
-    main()
 
 # try:
     # CLIENT_ID = st.secrets["general"]["CLIENT_ID"]
@@ -652,10 +616,28 @@ if __name__ == "__main__":
 
 options = [
     "Public Channel Analytics", "Video Metrics", "YouTube Search", "Channel Information", "Playlist Details",
-    "Video Comments", "Video Details", "Earnings Estimation", "Video Tags and Rankings", "Trending Keywords"
+    "Video Comments", "Video Details", "Earnings Estimation", "Video Tags and Rankings", "Trending Keywords",
+    "Bulk Video Analytics", "Channel Catalog", "Velocity Tracker", "Tag Insights", "Channel Comparison",
+    "Background Jobs"
 ]
 
 selected_option = st.sidebar.selectbox("Choose an analysis type", options)
+# Every API call, lookup and render step of this run nests under one span
+run_span = tracer.start("streamlit.run", activate=True, root=True, option=selected_option)
+VIRAL_RANKING_COLUMNS = ["rank", "title", "channel_title", "view_count", "views_per_day", "engagement_rate", "viral_score"]
+# Filled in at the end of the run so it includes this run's API calls
+quota_panel = st.sidebar.container()
+
+# Results are remembered across reruns; this drops the session's own copies
+# (its results and private video snapshots) so the next request goes back
+# to YouTube. Shared public entries are left alone: they serve every user
+# and expire on their own short TTLs.
+if st.sidebar.button("Refresh Data"):
+    session_key = credential_key(st.session_state.get("credentials"))
+    if session_key is not None:
+        memo_cache.invalidate(user=session_key)
+        video_store.invalidate(scope=session_key)
+    st.sidebar.success("Cached results cleared")
 
 # Placeholder for the content based on the selected option
 if selected_option:
@@ -669,6 +651,12 @@ if selected_option == "Video Metrics":
     
 if selected_option == "YouTube Search":
     search_query = st.text_input("Enter Search Query", "")
+    deep = st.checkbox("Deep search (paginate and add statistics)")
+    if deep:
+        st.caption("Separate several queries with ';'. Each uncached page costs 100 quota units.")
+        deep_max_results = st.number_input("Max results", min_value=10, max_value=1000, value=200, step=50)
+        deep_quota_budget = st.number_input("Quota budget (units)", min_value=100, max_value=10_000, value=1000, step=100)
+        new_only = st.checkbox("Only results not shown earlier this session")
     
 if selected_option == "Channel Information":
     channel_url = st.text_input("Enter Channel Url for Info", "")
@@ -678,6 +666,9 @@ if selected_option == "Playlist Details":
     
 if selected_option == "Video Comments":
     video_url = st.text_input("Enter Video Url for Comments", "")
+    max_comments = st.number_input("Number of Comments", min_value=1, max_value=5000, value=10)
+    include_replies = st.checkbox("Include replies")
+    analysis_max_comments = st.number_input("Comments to Analyze", min_value=100, max_value=1_000_000, value=10_000, step=1000)
     
 if selected_option == "Video Details":
     video_url = st.text_input("Enter Video Url for Details", "")
@@ -692,6 +683,26 @@ if selected_option == "Trending Keywords":
 if selected_option  == "Video Tags and Rankings":
     video_url = st.text_input("Enter Video Url for Tags", "")
 
+if selected_option == "Bulk Video Analytics":
+    video_urls = st.text_area("Enter Video Urls or IDs (one per line)", "")
+
+if selected_option == "Channel Catalog":
+    channel_url = st.text_input("Enter Channel Url for Catalog", "")
+    max_videos = st.number_input("Maximum Videos (0 for all)", min_value=0, value=0, step=50)
+
+if selected_option == "Velocity Tracker":
+    watch_video_urls = st.text_area("Video Urls to Watch (one per line)", "")
+    watch_channel_urls = st.text_area("Channel Urls to Watch (one per line)", "")
+    velocity_kind = st.radio("Show", ["video", "channel"], horizontal=True)
+    velocity_window = st.number_input("Growth Window (hours)", min_value=1, value=24)
+
+if selected_option == "Channel Comparison":
+    compare_channel_urls = st.text_area("Enter Channel Urls, Handles or IDs (one per line)", "")
+
+if selected_option == "Tag Insights":
+    tag_niche = st.text_input("Niche Tag (empty for all indexed videos)", "")
+    tag_min_videos = st.number_input("Minimum Videos per Tag", min_value=1, value=5)
+
 
 
 # Public Channel Analytics
@@ -713,7 +724,12 @@ elif selected_option == "Video Metrics":
 elif selected_option == "YouTube Search":
     if st.button("Search"):
         with st.spinner("Searching..."):
-            if search_query:
+            if search_query and deep:
+                queries = [query for query in search_query.split(";") if query.strip()]
+                results_df = deep_search_youtube(queries, int(deep_max_results), int(deep_quota_budget), new_only)
+                st.success("Searched Successfully!")
+                st.write(results_df)
+            elif search_query:
                 results_df = search_youtube(search_query)
                 st.success("Searched Successfully!")
                 st.write(results_df)
@@ -761,9 +777,26 @@ elif selected_option == "Video Comments":
     if st.button("Get Comments"):
         with st.spinner("Retrieving comments..."):
             if video_url:
-                comments_df = get_video_comments(video_url)
+                comments_df = get_video_comments(video_url, max_comments, include_replies)
                 st.success("Retrieval Completed!")
                 st.write(comments_df)
+    if st.button("Export All Comments"):
+        with st.spinner("Exporting comments..."):
+            if video_url:
+                export = export_video_comments(video_url, include_replies)
+                if export:
+                    output_dir, checkpoint = export
+                    st.success(f"Exported {checkpoint['comments_written']:,} comments to {output_dir}")
+    if st.button("Analyze Comments"):
+        with st.spinner("Analyzing comments..."):
+            if video_url:
+                insights = get_comment_insights(video_url, analysis_max_comments, include_replies)
+                if insights:
+                    for title, insight_df in insights.items():
+                        st.write(f"### {title}")
+                        st.dataframe(insight_df, hide_index=True)
+    if st.button("Export in Background") and video_url:
+        start_job("pull_comments", {"video_id": extract_video_id(video_url), "include_replies": include_replies})
 
 elif selected_option == "Video Details":
     if st.button("Get Video Details"):
@@ -774,15 +807,7 @@ elif selected_option == "Video Details":
                 st.write(details_df)
 
 elif selected_option == "Earnings Estimation":
-    industries = {
-        "Retail": (0.10, 0.30),
-        "Finance": (0.20, 0.50),
-        "Technology": (0.15, 0.40),
-        "Healthcare": (0.25, 0.60),
-        "Entertainment": (0.05, 0.20)
-    }
-    
-    selected_industry = st.selectbox("Select Industry:", industries.keys())
+    selected_industry = st.selectbox("Select Industry:", analytics.INDUSTRY_CPI.keys())
     if st.button("Estimate Earnings"):
         with st.spinner("Retrieving earnings..."):
             earnings_df = estimate_earnings(video_url)
@@ -802,5 +827,177 @@ elif selected_option == "Video Tags and Rankings":
                 tags_df = get_video_tags(video_url)
                 st.success("Retrieval Completed!")
                 st.write(tags_df)
+
+elif selected_option == "Bulk Video Analytics":
+    if st.button("Analyze Videos"):
+        with st.spinner("Retrieving video analytics..."):
+            youtube = get_service()
+            if youtube and video_urls.strip():
+                videos_df, failures_df = get_videos_bulk(youtube, video_urls.split())
+                st.success(f"Retrieved {len(videos_df)} videos!")
+                st.write(videos_df)
+                st.download_button("Download CSV", videos_df.to_csv(index=False), "videos.csv", "text/csv")
+                if not videos_df.empty:
+                    st.write("### Top Viral Videos")
+                    st.write(rank_videos(videos_df, k=25)[VIRAL_RANKING_COLUMNS])
+                if not failures_df.empty:
+                    st.write(f"### Failed Videos ({len(failures_df)})")
+                    st.write(failures_df)
                 
 
+elif selected_option == "Channel Catalog":
+    if st.button("Crawl Channel"):
+        with st.spinner("Crawling channel uploads..."):
+            if channel_url:
+                catalog_df = get_channel_catalog(channel_url, max_videos or None)
+                if catalog_df is not None:
+                    st.success(f"Crawled {len(catalog_df):,} videos!")
+                    st.write(catalog_df)
+                    st.download_button("Download CSV", catalog_df.to_csv(index=False), "catalog.csv", "text/csv")
+                    if not catalog_df.empty:
+                        st.write("### Top Viral Videos")
+                        st.write(rank_videos(catalog_df, k=25)[VIRAL_RANKING_COLUMNS])
+    if st.button("Crawl in Background") and channel_url:
+        channel_id = get_channel_id(channel_url)
+        if channel_id:
+            start_job("crawl_channel", {"channel_id": channel_id, "max_videos": max_videos or None})
+        else:
+            st.write("Channel ID could not be retrieved.")
+
+elif selected_option == "Velocity Tracker":
+    if st.button("Add to Watchlist"):
+        video_ids = [extract_video_id(url) for url in watch_video_urls.split()]
+        channel_ids = [get_channel_id(url) for url in watch_channel_urls.split()]
+        watchlist.add("video", [video_id for video_id in video_ids if video_id])
+        watchlist.add("channel", [channel_id for channel_id in channel_ids if channel_id])
+    st.write(f"Watching {len(watchlist.ids('video'))} videos and {len(watchlist.ids('channel'))} channels")
+    
+    youtube = get_service() if session_credentials() else None
+    col1, col2, col3 = st.columns(3)
+    if col1.button("Start Collector", disabled=youtube is None or snapshot_collector.running):
+        snapshot_collector.start(youtube)
+    if col2.button("Snapshot Now", disabled=youtube is None):
+        with st.spinner("Taking snapshot..."):
+            snapshot_collector.collect_once(youtube)
+    if col3.button("Snapshot in Background", disabled=youtube is None):
+        start_job("refresh_watchlist", {})
+    if snapshot_collector.running:
+        st.write(f"Collector running every {snapshot_collector.interval // 60} minutes, last run {snapshot_collector.last_run}")
+    if snapshot_collector.last_error:
+        st.error(f"Last collection failed: {snapshot_collector.last_error}")
+    
+    metric = "views"
+    summary_df = snapshot_store.velocity_summary(
+        velocity_kind, metric, window=datetime.timedelta(hours=velocity_window)
+    )
+    if summary_df.empty:
+        st.write("No snapshots yet")
+    else:
+        st.write("### Views per Hour")
+        st.write(summary_df)
+        selected_id = st.selectbox("Velocity History", summary_df["id"])
+        history_df = pd.concat(snapshot_store.iter_velocity(
+            velocity_kind, metric, ids=[selected_id], window=datetime.timedelta(hours=velocity_window)
+        ))
+        with span("render.chart"):
+            st.line_chart(history_df.set_index("ts")[["per_hour"]])
+
+elif selected_option == "Channel Comparison":
+    if st.button("Compare Channels"):
+        with st.spinner("Retrieving channels..."):
+            if compare_channel_urls.strip():
+                comparison = run_analytics(analytics.compare_channels, compare_channel_urls.split())
+                if comparison is not None:
+                    channels_df, failures_df = comparison
+                    st.success(f"Compared {len(channels_df)} channels!")
+                    st.write(channels_df)
+                    st.download_button("Download CSV", channels_df.to_csv(index=False), "channels.csv", "text/csv")
+                    if not channels_df.empty:
+                        st.write("### Views per Video")
+                        with span("render.chart"):
+                            st.bar_chart(channels_df.set_index("title")["views_per_video"])
+                    if not failures_df.empty:
+                        st.write(f"### Failed Channels ({len(failures_df)})")
+                        st.write(failures_df)
+
+elif selected_option == "Tag Insights":
+    index_stats = tag_index.stats()
+    st.write(f"{index_stats['tags']:,} tags across {index_stats['videos']:,} indexed videos. "
+             "Videos are indexed as they are viewed, scored or crawled.")
+    niche = tag_niche.strip() or None
+    if niche:
+        st.write(f"### Tags Used with '{niche}'")
+        st.write(analytics.related_tags(niche))
+    else:
+        st.write("### Top Tags by Views")
+        st.write(analytics.top_tags(min_videos=tag_min_videos))
+    st.write("### Tags of the Fastest Videos")
+    st.caption("Correlation of each tag with views per day; lift compares its typical views per day with the niche's")
+    st.write(analytics.velocity_tags(niche=niche, min_videos=tag_min_videos))
+
+elif selected_option == "Background Jobs":
+    owner = job_owner() if session_credentials() else None
+    if owner is None:
+        st.write("Sign in to run background jobs.")
+    else:
+        polling = any(job["status"] in ACTIVE for job in job_runner.jobs(owner=owner))
+        st.fragment(jobs_panel, run_every=JOB_POLL_INTERVAL if polling else None)(owner, polling)
+
+
+tracer.end(run_span)
+
+# Quota usage panel, for the project this session's calls are billed to
+with quota_panel.expander("API Quota"):
+    quota_credentials = session_credentials()
+    quota_snapshot = quota_ledger.snapshot(project_key(quota_credentials) if quota_credentials is not None else None)
+    st.progress(
+        min(quota_snapshot["units"] / quota_snapshot["daily_limit"], 1.0),
+        text=f"{quota_snapshot['units']:,} / {quota_snapshot['daily_limit']:,} units used today"
+    )
+    if quota_snapshot["methods"]:
+        st.dataframe(pd.DataFrame([
+            {"Method": method, "Calls": usage["calls"], "Units": usage["units"]}
+            for method, usage in sorted(quota_snapshot["methods"].items(), key=lambda m: -m[1]["units"])
+        ]), hide_index=True)
+    st.download_button("Download Quota Metrics", quota_ledger.dump(), "quota.json", "application/json")
+
+
+# Performance panel: where this run's time went
+if st.sidebar.checkbox("Show performance panel"):
+    with st.sidebar.expander("Performance", expanded=True):
+        run_spans = [s for s in tracer.spans(trace_id=run_span.trace_id) if s is not run_span]
+        attributed = sum(s.duration for s in run_spans if s.parent_id == run_span.span_id)
+        st.write(f"Run: {run_span.duration_ms:,.0f} ms, "
+                 f"{(run_span.duration - attributed) * 1000:,.0f} ms outside traced steps (mostly rendering)")
+        if run_spans:
+            st.dataframe(pd.DataFrame([{
+                "Step": s.name,
+                "ms": round(s.duration_ms, 1),
+                "Method": s.attributes.get("method"),
+                "Cache": s.attributes.get("cache"),
+                "Bytes": s.attributes.get("bytes"),
+                "Status": s.error or s.status,
+            } for s in sorted(run_spans, key=lambda s: s.start_ns)]), hide_index=True)
+        st.write("Recent runs")
+        st.dataframe(pd.DataFrame([
+            {"Step": name, **{key: round(value, 1) for key, value in stats.items()}}
+            for name, stats in sorted(tracer.summary().items(), key=lambda item: -item[1]["total_ms"])
+        ]), hide_index=True)
+        st.write("Caches")
+        st.dataframe(pd.DataFrame([
+            {"Cache": name, **stats} for name, stats in [
+                ("Clients", client_registry.stats()),
+                ("API responses", response_cache.stats()),
+                ("Coalesced requests", single_flight.stats()),
+                ("Results", memo_cache.stats()),
+                ("Video snapshots", video_store.stats()),
+            ]
+        ]), hide_index=True)
+        breaker_stats = circuit_breakers.stats()
+        if breaker_stats:
+            st.write("Circuit breakers")
+            st.dataframe(pd.DataFrame([
+                {"Endpoint": endpoint, **stats} for endpoint, stats in breaker_stats.items()
+            ]), hide_index=True)
+        st.download_button("Download Spans (JSON lines)", tracer.to_jsonl(), "spans.jsonl", "application/x-ndjson")
+        st.download_button("Download Spans (OTLP)", tracer.to_otlp(), "spans.otlp.json", "application/json")
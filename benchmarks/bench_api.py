@@ -0,0 +1,247 @@
+# API cost benchmarks against the local stub
+#
+#   python -m benchmarks.bench_api                     # compare with baselines
+#   python -m benchmarks.bench_api --update-baselines  # record new baselines
+#   python -m benchmarks.bench_api --latency 0.1 --error-rate 0.02 --scenario video_views
+#
+# Every scenario runs the app's analytics functions against a fresh stub and
+# cold caches, and reports wall time, API calls, bytes received and quota
+# units. Exits nonzero when a scenario fails or regresses past its baseline.
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Keep the ledger, caches and stores out of the real data directory, and
+# don't let the daily quota or Trends pacing throttle the scenarios
+os.environ.setdefault("VIRALBOT_DATA_DIR", tempfile.mkdtemp(prefix="viralbot-bench-"))
+os.environ.setdefault("VIRALBOT_DAILY_QUOTA", "100000000")
+os.environ.setdefault("VIRALBOT_TRENDS_INTERVAL", "0")
+
+from benchmarks.stub_server import StubServer, channel_id, playlist_id, point_trends_at, video_id  # noqa: E402
+from viralbot import analytics  # noqa: E402
+from viralbot.memo import memo_cache  # noqa: E402
+from viralbot.quota import quota_cost  # noqa: E402
+from viralbot.response_cache import response_cache  # noqa: E402
+from viralbot.search import search_page_cache  # noqa: E402
+from viralbot.singleflight import single_flight  # noqa: E402
+from viralbot.trends import trends_client  # noqa: E402
+from viralbot.video_store import video_store  # noqa: E402
+from viralbot.youtube_api import ClientRegistry  # noqa: E402
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+# Calls and quota are deterministic; bytes and time get some slack
+BYTES_TOLERANCE = 1.05
+TIME_TOLERANCE = 1.5
+TIME_SLACK = 0.05
+
+VIDEOS = [f"https://www.youtube.com/watch?v={video_id(c, v)}" for c in range(4) for v in range(5)]
+
+
+def channel_views(youtube):
+    for c in range(5):
+        analytics.channel_analytics(youtube, channel_id(c))
+        analytics.channel_info(youtube, channel_id(c))
+        playlists = analytics.channel_playlists(youtube, channel_id(c))
+        for playlist in playlists[:3]:
+            analytics.playlist_details(youtube, playlist["Playlist ID"])
+
+
+def video_views(youtube):
+    for url in VIDEOS:
+        analytics.video_metrics(youtube, url)
+        analytics.video_details(youtube, url)
+        analytics.video_tags(youtube, url)
+        analytics.estimate_earnings(youtube, url, "Technology")
+
+
+# The same views twice, as after a widget-only rerun
+def rerun(youtube):
+    video_views(youtube)
+    video_views(youtube)
+    analytics.playlist_details(youtube, playlist_id(0, 0))
+    analytics.playlist_details(youtube, playlist_id(0, 0))
+
+
+def channel_compare(youtube):
+    # Handles need one lookup each the first time, then come from the index
+    references = [f"@channel{c}" if c % 2 else channel_id(c) for c in range(20)]
+    analytics.compare_channels(youtube, references)
+    memo_cache.clear()
+    analytics.compare_channels(youtube, references)
+
+
+# Many sessions open the same viral video and channel at the same moment
+def viral_burst(youtube, sessions=16):
+    barrier = threading.Barrier(sessions)
+
+    def session(_):
+        barrier.wait()
+        analytics.video_details(youtube, VIDEOS[0])
+        analytics.channel_info(youtube, channel_id(0))
+
+    with ThreadPoolExecutor(sessions) as pool:
+        list(pool.map(session, range(sessions)))
+
+
+def search(youtube):
+    for query in ["music", "gaming", "cooking", "news", "travel", "fitness", "science", "comedy", "tech", "art"]:
+        analytics.search_youtube(youtube, query, max_results=25)
+
+
+def deep_search(youtube):
+    seen = set()
+    analytics.deep_search(youtube, ["music", "gaming"], max_results=300, seen=seen)
+    # Repeat pages come from the page cache and repeat hits are dropped
+    analytics.deep_search(youtube, ["Music ", "cooking"], max_results=300, quota_budget=300, seen=seen)
+
+
+def comments(youtube):
+    for url in VIDEOS[:3]:
+        analytics.video_comments(youtube, url, max_results=1000)
+
+
+def bulk_score(youtube):
+    videos = [video_id(c, v) for c in range(4) for v in range(500)]
+    analytics.score_videos_bulk(youtube, videos, k=100)
+
+
+def channel_catalog(youtube):
+    for c in range(2):
+        analytics.channel_catalog(youtube, channel_id(c))
+
+
+def trending(youtube):
+    analytics.trending_keywords("united_states")
+
+
+SCENARIOS = {
+    "channel_views": channel_views,
+    "video_views": video_views,
+    "rerun": rerun,
+    "channel_compare": channel_compare,
+    "viral_burst": viral_burst,
+    "search": search,
+    "deep_search": deep_search,
+    "comments": comments,
+    "bulk_score": bulk_score,
+    "channel_catalog": channel_catalog,
+    "trending": trending,
+}
+
+
+def reset_caches():
+    memo_cache.clear()
+    video_store.invalidate()
+    response_cache.clear()
+    trends_client.clear()
+    search_page_cache.clear()
+    single_flight.clear()
+
+
+def run_scenario(name, server, youtube):
+    reset_caches()
+    server.stub.reset()
+    error = None
+    start = time.perf_counter()
+    try:
+        SCENARIOS[name](youtube)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    wall_time = time.perf_counter() - start
+    stats = server.stub.stats()
+    return {
+        "wall_time": round(wall_time, 4),
+        "calls": sum(stats["calls"].values()),
+        "bytes": sum(stats["bytes"].values()),
+        "quota_units": sum(
+            quota_cost(endpoint) * count
+            for endpoint, count in stats["calls"].items() if endpoint.startswith("youtube.")
+        ),
+        "errors": sum(stats["errors"].values()),
+        "by_endpoint": stats["calls"],
+        "error": error,
+    }
+
+
+def regressions(result, baseline, compare_time):
+    found = []
+    for metric in ("calls", "quota_units"):
+        if result[metric] > baseline[metric]:
+            found.append(f"{metric} {result[metric]:,} > {baseline[metric]:,}")
+    if result["bytes"] > baseline["bytes"] * BYTES_TOLERANCE:
+        found.append(f"bytes {result['bytes']:,} > {baseline['bytes']:,}")
+    if compare_time and result["wall_time"] > baseline["wall_time"] * TIME_TOLERANCE + TIME_SLACK:
+        found.append(f"wall_time {result['wall_time']:.3f}s > {baseline['wall_time']:.3f}s")
+    return found
+
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API cost benchmarks against a local stub")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="run only these scenarios")
+    parser.add_argument("--latency", type=float, default=0.01, help="stub latency per request in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--baselines", default=BASELINES_PATH)
+    parser.add_argument("--update-baselines", action="store_true")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    names = args.scenario or list(SCENARIOS)
+    with StubServer(latency=args.latency, error_rate=args.error_rate) as server:
+        point_trends_at(server.url)
+        youtube = ClientRegistry(api_endpoint=server.url).get(developer_key="benchmark")
+        results = {name: run_scenario(name, server, youtube) for name in names}
+
+    baselines = load_baselines(args.baselines)
+    if baselines is not None and baselines.get("error_rate", 0.0) != args.error_rate:
+        # Retries make injected errors cost extra calls; nothing to compare against
+        print(f"Baselines were recorded with error rate {baselines.get('error_rate', 0.0)}; not compared")
+        baselines = None
+    compare_time = baselines is not None and baselines.get("latency") == args.latency
+    failed = False
+    print(f"{'scenario':<16}{'time':>9}{'calls':>8}{'bytes':>12}{'quota':>8}  status")
+    for name, result in results.items():
+        status = "ok"
+        if result["error"]:
+            status, failed = f"FAILED {result['error']}", True
+        elif baselines and name in baselines["scenarios"] and not args.update_baselines:
+            found = regressions(result, baselines["scenarios"][name], compare_time)
+            if found:
+                status, failed = "REGRESSED " + "; ".join(found), True
+        print(f"{name:<16}{result['wall_time']:>8.3f}s{result['calls']:>8,}{result['bytes']:>12,}"
+              f"{result['quota_units']:>8,}  {status}")
+    if baselines and not compare_time and not args.update_baselines:
+        print(f"Baselines were recorded with latency {baselines.get('latency')}s; wall time not compared")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.update_baselines:
+        if failed:
+            sys.exit("Not updating baselines: a scenario failed")
+        scenarios = dict(baselines["scenarios"]) if baselines else {}
+        scenarios.update({
+            name: {metric: result[metric] for metric in ("wall_time", "calls", "bytes", "quota_units")}
+            for name, result in results.items()
+        })
+        with open(args.baselines, "w", encoding="utf-8") as f:
+            json.dump({"latency": args.latency, "error_rate": args.error_rate, "scenarios": scenarios},
+                      f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baselines written to {args.baselines}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
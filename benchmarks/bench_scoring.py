@@ -0,0 +1,49 @@
+# Throughput benchmark for the viral-score engine
+#
+#   python -m benchmarks.bench_scoring --rows 1000000
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from viralbot.scoring import rank_videos
+
+
+def synthetic_catalog(rows, channels, seed=0):
+    rng = np.random.default_rng(seed)
+    now = pd.Timestamp("2024-06-01", tz="UTC")
+    views = rng.lognormal(mean=9, sigma=2.5, size=rows).astype("int64")
+    return pd.DataFrame({
+        "video_id": pd.array(np.char.add("v", np.arange(rows).astype(str)), dtype="string"),
+        "channel_id": pd.array(np.char.add("UC", rng.integers(0, channels, rows).astype(str)), dtype="string"),
+        "published_at": now - pd.to_timedelta(rng.integers(3600, 5 * 365 * 86400, rows), unit="s"),
+        "view_count": pd.array(views, dtype="Int64"),
+        "like_count": pd.array((views * rng.uniform(0, 0.08, rows)).astype("int64"), dtype="Int64"),
+        "comment_count": pd.array((views * rng.uniform(0, 0.01, rows)).astype("int64"), dtype="Int64"),
+    }), now
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Viral-score engine throughput")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--channels", type=int, default=20_000)
+    parser.add_argument("--top", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    catalog, now = synthetic_catalog(args.rows, args.channels)
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        top = rank_videos(catalog, k=args.top, now=now)
+        timings.append(time.perf_counter() - start)
+
+    best = min(timings)
+    print(f"rows={args.rows:,} channels={args.channels:,} top={args.top}")
+    print(f"best {best:.3f}s  median {sorted(timings)[len(timings) // 2]:.3f}s  {args.rows / best:,.0f} rows/s")
+    print(top[["rank", "video_id", "channel_id", "view_count", "views_per_day", "viral_score"]].head(5).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
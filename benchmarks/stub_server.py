@@ -0,0 +1,446 @@
+# Local stand-in for the YouTube Data API and Google Trends
+#
+# Serves deterministic synthetic channels, videos, playlists, comments and
+# search results over HTTP, with optional latency and error injection, and
+# counts calls and bytes per endpoint. Point a client at it with
+# ClientRegistry(api_endpoint=server.url) and pytrends with point_trends_at.
+#
+#   python -m benchmarks.stub_server --port 8090 --latency 0.05
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+API_PREFIX = "/youtube/v3/"
+TRENDS_PREFIX = "/trends"
+PUBLISHED_AT = "2024-01-01T00:00:00Z"
+TRENDING = [
+    "eclipse", "playoffs", "election results", "new phone", "box office", "marathon",
+    "heat wave", "album release", "stock market", "world cup", "space launch", "recipe",
+    "game trailer", "concert tickets", "award show", "tax deadline", "storm", "tournament",
+    "movie review", "sale",
+]
+
+
+def _seed(*parts):
+    return int(hashlib.md5("|".join(map(str, parts)).encode()).hexdigest()[:8], 16)
+
+
+def channel_id(c):
+    return f"UC{c:022d}"
+
+
+def video_id(c, v):
+    return f"v{c:03d}{v:07d}"
+
+
+def playlist_id(c, p):
+    return f"PL{c:06d}{p:04d}"
+
+
+class StubYouTube:
+    # The synthetic world plus request accounting
+    def __init__(self, channels=20, videos_per_channel=500, playlists_per_channel=12,
+                 playlist_size=25, comments_per_video=300, search_results=500,
+                 latency=0.0, jitter=0.5, error_rate=0.0, error_status=500, seed=0):
+        self.channels = channels
+        self.videos_per_channel = videos_per_channel
+        self.playlists_per_channel = playlists_per_channel
+        self.playlist_size = playlist_size
+        self.comments_per_video = comments_per_video
+        self.search_results = search_results
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = Counter()
+            self.bytes = Counter()
+            self.errors = Counter()
+            self.not_modified = Counter()
+
+    def record(self, endpoint, size, status):
+        with self._lock:
+            self.calls[endpoint] += 1
+            self.bytes[endpoint] += size
+            if status == 304:
+                self.not_modified[endpoint] += 1
+            elif status >= 400:
+                self.errors[endpoint] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": dict(self.calls),
+                "bytes": dict(self.bytes),
+                "errors": dict(self.errors),
+                "not_modified": dict(self.not_modified),
+            }
+
+    def delay(self):
+        if self.latency > 0:
+            with self._lock:
+                spread = self._random.uniform(-self.jitter, self.jitter)
+            time.sleep(self.latency * (1 + spread))
+
+    def inject_error(self):
+        if self.error_rate <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    # --- lookups -------------------------------------------------------
+
+    def _channel_index(self, value):
+        if value.startswith("UC") and value[2:].isdigit():
+            c = int(value[2:])
+        elif value.lstrip("@").startswith("channel") and value.lstrip("@")[7:].isdigit():
+            c = int(value.lstrip("@")[7:])
+        else:
+            return None
+        return c if c < self.channels else None
+
+    def _video_index(self, value):
+        if len(value) != 11 or not value.startswith("v") or not value[1:].isdigit():
+            return None
+        c, v = int(value[1:4]), int(value[4:])
+        return (c, v) if c < self.channels and v < self.videos_per_channel else None
+
+    def channel(self, c):
+        seed = _seed("channel", c)
+        return {
+            "kind": "youtube#channel",
+            "id": channel_id(c),
+            "snippet": {
+                "title": f"Channel {c}",
+                "description": f"Synthetic channel {c}",
+                "customUrl": f"@channel{c}",
+                "publishedAt": PUBLISHED_AT,
+            },
+            "statistics": {
+                "viewCount": str(seed % 10_000_000 * 100),
+                "subscriberCount": str(seed % 5_000_000),
+                "videoCount": str(self.videos_per_channel),
+            },
+            "contentDetails": {"relatedPlaylists": {"uploads": "UU" + channel_id(c)[2:]}},
+        }
+
+    def video(self, c, v):
+        seed = _seed("video", c, v)
+        views = seed % 5_000_000
+        day = 1 + v % 28
+        return {
+            "kind": "youtube#video",
+            "id": video_id(c, v),
+            "snippet": {
+                "title": f"Video {v} of channel {c}",
+                "description": "Synthetic video",
+                "channelId": channel_id(c),
+                "channelTitle": f"Channel {c}",
+                "publishedAt": f"2024-{1 + v % 12:02d}-{day:02d}T12:00:00Z",
+                "categoryId": str(seed % 30),
+                "tags": [f"tag{(seed >> shift) % 200}" for shift in range(0, 15, 3)],
+            },
+            "statistics": {
+                "viewCount": str(views),
+                "likeCount": str(views // (20 + seed % 30)),
+                "commentCount": str(views // (200 + seed % 300)),
+            },
+            "contentDetails": {"duration": f"PT{seed % 30}M{seed % 60}S"},
+            "status": {"privacyStatus": "public"},
+        }
+
+    def playlist(self, c, p):
+        return {
+            "kind": "youtube#playlist",
+            "id": playlist_id(c, p),
+            "snippet": {
+                "title": f"Playlist {p} of channel {c}",
+                "description": "Synthetic playlist",
+                "channelId": channel_id(c),
+                "publishedAt": PUBLISHED_AT,
+            },
+            "contentDetails": {"itemCount": self.playlist_size},
+        }
+
+    def comment_thread(self, video, n):
+        text = f"comment {n} on {video}: " + ("great video " if n % 3 else "first! ") * (1 + n % 4)
+        comment = {
+            "id": f"c{video}{n}",
+            "snippet": {
+                "textDisplay": text,
+                "textOriginal": text,
+                "authorDisplayName": f"user{_seed(video, n) % 500}",
+                "authorChannelId": {"value": channel_id(n % 1000)},
+                "likeCount": _seed("likes", video, n) % 100,
+                "publishedAt": PUBLISHED_AT,
+                "updatedAt": PUBLISHED_AT,
+                "videoId": video,
+            },
+        }
+        return {
+            "kind": "youtube#commentThread",
+            "id": f"t{video}{n}",
+            "snippet": {"videoId": video, "topLevelComment": comment, "totalReplyCount": 0},
+        }
+
+    # --- endpoints -----------------------------------------------------
+
+    def paged(self, total, params, make, default_size=5, max_size=50):
+        size = min(int(params.get("maxResults", default_size)), max_size)
+        start = int(params.get("pageToken") or 0)
+        response = {
+            "items": [make(i) for i in range(start, min(start + size, total))],
+            "pageInfo": {"totalResults": total, "resultsPerPage": size},
+        }
+        if start + size < total:
+            response["nextPageToken"] = str(start + size)
+        return response
+
+    def channels_list(self, params):
+        lookup = params.get("id") or params.get("forHandle") or params.get("forUsername") or ""
+        indices = [self._channel_index(value) for value in lookup.split(",") if value]
+        return {"items": [self.channel(c) for c in indices if c is not None]}
+
+    def videos_list(self, params):
+        indices = [self._video_index(value) for value in params.get("id", "").split(",") if value]
+        return {"items": [self.video(*index) for index in indices if index is not None]}
+
+    def playlists_list(self, params):
+        if "id" in params:
+            items = []
+            for value in params["id"].split(","):
+                if value.startswith("PL") and value[2:].isdigit():
+                    c, p = int(value[2:8]), int(value[8:])
+                    if c < self.channels and p < self.playlists_per_channel:
+                        items.append(self.playlist(c, p))
+            return {"items": items}
+        c = self._channel_index(params.get("channelId", ""))
+        if c is None:
+            return {"items": []}
+        return self.paged(self.playlists_per_channel, params, lambda p: self.playlist(c, p))
+
+    def playlistItems_list(self, params):
+        value = params.get("playlistId", "")
+        if value.startswith("UU"):
+            c, total = self._channel_index("UC" + value[2:]), self.videos_per_channel
+            offset = 0
+        elif value.startswith("PL") and value[2:].isdigit():
+            c, total = int(value[2:8]), self.playlist_size
+            offset = int(value[8:]) * self.playlist_size
+        else:
+            c = None
+        if c is None or c >= self.channels:
+            return {"items": []}
+
+        def item(i):
+            v = (offset + i) % self.videos_per_channel
+            return {
+                "kind": "youtube#playlistItem",
+                "snippet": {"title": f"Video {v} of channel {c}", "position": i},
+                "contentDetails": {"videoId": video_id(c, v), "videoPublishedAt": PUBLISHED_AT},
+            }
+        return self.paged(total, params, item)
+
+    def search_list(self, params):
+        query = params.get("q", "")
+        kinds = ["video", "channel", "playlist"]
+
+        def item(i):
+            seed = _seed("search", query, i)
+            kind = kinds[seed % 10 % 3] if seed % 10 < 3 else "video"
+            c = seed % self.channels
+            ids = {
+                "video": ("videoId", video_id(c, seed % self.videos_per_channel)),
+                "channel": ("channelId", channel_id(c)),
+                "playlist": ("playlistId", playlist_id(c, seed % self.playlists_per_channel)),
+            }[kind]
+            return {
+                "kind": "youtube#searchResult",
+                "id": {"kind": f"youtube#{kind}", ids[0]: ids[1]},
+                "snippet": {
+                    "title": f"{query} result {i}",
+                    "description": f"Synthetic {kind} matching {query}",
+                    "channelId": channel_id(c),
+                    "channelTitle": f"Channel {c}",
+                    "publishedAt": PUBLISHED_AT,
+                },
+            }
+        return self.paged(self.search_results, params, item)
+
+    def commentThreads_list(self, params):
+        video = params.get("videoId", "")
+        if self._video_index(video) is None:
+            return {"items": []}
+        return self.paged(self.comments_per_video, params, lambda n: self.comment_thread(video, n),
+                          default_size=20, max_size=100)
+
+    def comments_list(self, params):
+        return {"items": []}
+
+    # Google Trends: token request, interest over time and trending searches
+    def trends(self, path, params):
+        if path.endswith("/api/explore"):
+            request = json.loads(params.get("req", "{}"))
+            widget_request = {"comparisonItem": request.get("comparisonItem", [])}
+            return ")]}'" + json.dumps({"widgets": [
+                {"id": "TIMESERIES", "token": "stub", "request": widget_request}
+            ]})
+        if path.endswith("/api/widgetdata/multiline"):
+            request = json.loads(params.get("req", "{}"))
+            keywords = [item.get("keyword", "") for item in request.get("comparisonItem", [])]
+            raw = [[_seed("trend", keyword, hour) % 50 + _seed("trend", keyword) % 200 for keyword in keywords]
+                   for hour in range(24)]
+            peak = max((max(row) for row in raw), default=1) or 1
+            timeline = [{
+                "time": str(1704067200 + hour * 3600),
+                "value": [round(value * 100 / peak) for value in row],
+            } for hour, row in enumerate(raw)]
+            return ")]}',\n" + json.dumps({"default": {"timelineData": timeline}})
+        if path.endswith("/hottrends/visualize/internal/data"):
+            return json.dumps({"united_states": TRENDING, "india": TRENDING[::-1]})
+        return None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_request()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        self.handle_request()
+
+    def send_body(self, status, body, endpoint, content_type="application/json", etag=None):
+        data = body.encode("utf-8") if body is not None else b""
+        self.server.stub.record(endpoint, len(data), status)
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        if status != 304:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if data:
+            self.wfile.write(data)
+
+    def handle_request(self):
+        stub = self.server.stub
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        stub.delay()
+
+        if url.path.startswith(TRENDS_PREFIX):
+            endpoint = "trends" + url.path[len(TRENDS_PREFIX):]
+            if url.path.endswith("/explore/"):
+                # pytrends fetches a cookie page first
+                return self.send_body(200, "", endpoint, content_type="text/html")
+            if stub.inject_error():
+                return self.send_body(429, "rate limited", endpoint, content_type="text/html")
+            body = stub.trends(url.path, params)
+            if body is None:
+                return self.send_body(404, "not found", endpoint, content_type="text/html")
+            return self.send_body(200, body, endpoint)
+
+        resource = url.path[len(API_PREFIX):] if url.path.startswith(API_PREFIX) else ""
+        endpoint = f"youtube.{resource}.list"
+        handler = getattr(stub, f"{resource}_list", None)
+        if handler is None:
+            return self.send_body(404, json.dumps({"error": {"code": 404, "message": "Not Found"}}), endpoint)
+        if stub.inject_error():
+            reason = "quotaExceeded" if stub.error_status == 403 else "backendError"
+            return self.send_body(stub.error_status, json.dumps({"error": {
+                "code": stub.error_status,
+                "message": f"Injected {reason}",
+                "errors": [{"reason": reason, "domain": "youtube", "message": f"Injected {reason}"}],
+            }}), endpoint)
+
+        body = json.dumps(dict(handler(params), kind=f"youtube#{resource}ListResponse"))
+        etag = '"' + hashlib.md5(body.encode("utf-8")).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            return self.send_body(304, None, endpoint, etag=etag)
+        return self.send_body(200, body, endpoint, etag=etag)
+
+
+class StubServer:
+    def __init__(self, host="127.0.0.1", port=0, **options):
+        self.stub = StubYouTube(**options)
+        self._server = ThreadingHTTPServer((host, port), StubHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self.stub
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# Send pytrends to the stub instead of trends.google.com (process-wide)
+def point_trends_at(url):
+    import pytrends.request
+
+    base = url.rstrip("/") + TRENDS_PREFIX
+    original = pytrends.request.BASE_TRENDS_URL
+    pytrends.request.BASE_TRENDS_URL = base
+    for name in dir(pytrends.request.TrendReq):
+        value = getattr(pytrends.request.TrendReq, name)
+        if name.endswith("_URL") and isinstance(value, str) and value.startswith(original):
+            setattr(pytrends.request.TrendReq, name, base + value[len(original):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local YouTube Data API and Google Trends stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="500 (backendError) or 403 (quotaExceeded)")
+    args = parser.parse_args()
+
+    server = StubServer(args.host, args.port, latency=args.latency,
+                        error_rate=args.error_rate, error_status=args.error_status)
+    print(f"Serving on {server.url} (set VIRALBOT_API_ENDPOINT to use it)")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
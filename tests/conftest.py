@@ -0,0 +1,75 @@
+# Shared fixtures. The data directory is pointed at a temporary one before
+# the package is imported, so the process-wide caches and indexes never
+# touch ~/.youtube_viral_bot.
+import os
+import tempfile
+
+os.environ["VIRALBOT_DATA_DIR"] = tempfile.mkdtemp(prefix="viralbot-tests-")
+
+import google.oauth2.credentials  # noqa: E402
+import pytest  # noqa: E402
+
+from benchmarks.stub_server import StubServer  # noqa: E402
+from viralbot.memo import memo_cache  # noqa: E402
+from viralbot.resilience import circuit_breakers  # noqa: E402
+from viralbot.response_cache import response_cache  # noqa: E402
+from viralbot.singleflight import single_flight  # noqa: E402
+from viralbot.tag_index import tag_index  # noqa: E402
+from viralbot.video_store import video_store  # noqa: E402
+from viralbot.youtube_api import ClientRegistry, client_registry  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def stub_server():
+    with StubServer() as server:
+        yield server
+
+
+# Every test starts from cold process-wide caches and zeroed stub counters
+@pytest.fixture(autouse=True)
+def clean_state(stub_server):
+    for cache in (response_cache, single_flight, tag_index, memo_cache, client_registry):
+        cache.clear()
+    video_store.invalidate()
+    circuit_breakers.reset()
+    stub_server.stub.reset()
+    yield
+
+
+@pytest.fixture
+def registry(stub_server):
+    registry = ClientRegistry(api_endpoint=stub_server.url)
+    yield registry
+    registry.clear()
+
+
+# Total calls the stub received, optionally for one endpoint
+@pytest.fixture
+def api_calls(stub_server):
+    def count(endpoint=None):
+        calls = stub_server.stub.stats()["calls"]
+        return calls.get(endpoint, 0) if endpoint else sum(calls.values())
+    return count
+
+
+# OAuth credentials for a named test user; the stub accepts any token
+def oauth_credentials(name, client_id="test-client"):
+    return google.oauth2.credentials.Credentials(
+        token=f"token-{name}", refresh_token=f"refresh-{name}", client_id=client_id
+    )
+
+
+# Make some of the stub's videos private: {(channel, video): "private"}
+@pytest.fixture
+def private_videos(stub_server, monkeypatch):
+    privacy = {}
+    video = stub_server.stub.video
+
+    def with_privacy(c, v):
+        item = video(c, v)
+        if (c, v) in privacy:
+            item["status"]["privacyStatus"] = privacy[(c, v)]
+        return item
+
+    monkeypatch.setattr(stub_server.stub, "video", with_privacy)
+    return privacy
@@ -0,0 +1,83 @@
+# Comment export checkpoints: resume after an interruption, refresh, since
+import datetime
+
+import pyarrow.parquet as pq
+import pytest
+
+from benchmarks.stub_server import video_id
+from viralbot.comments import ingest_comments, iter_comments, load_checkpoint
+
+VIDEO = video_id(0, 0)
+COMMENTS = 300  # the stub's comments per video, 100 per page
+
+
+class Interrupted(Exception):
+    pass
+
+
+def exported_ids(output_dir):
+    return pq.read_table(str(output_dir), columns=["comment_id"]).column("comment_id").to_pylist()
+
+
+def interrupt_after(pages):
+    seen = []
+
+    def on_progress(count):
+        seen.append(count)
+        if len(seen) == pages:
+            raise Interrupted()
+    return on_progress
+
+
+def test_interrupted_export_resumes_from_checkpoint(registry, api_calls, tmp_path):
+    youtube = registry.get(developer_key="key")
+    with pytest.raises(Interrupted):
+        ingest_comments(youtube, VIDEO, str(tmp_path), rows_per_file=100, on_progress=interrupt_after(1))
+    checkpoint = load_checkpoint(str(tmp_path))
+    assert checkpoint["comments_written"] == 100
+    assert not checkpoint["done"]
+
+    calls = api_calls()
+    checkpoint = ingest_comments(youtube, VIDEO, str(tmp_path), rows_per_file=100)
+    assert api_calls() - calls == 2
+    assert checkpoint["done"]
+    ids = exported_ids(tmp_path)
+    assert len(ids) == len(set(ids)) == COMMENTS
+
+
+def test_finished_export_is_kept_unless_refreshed(registry, api_calls, tmp_path):
+    youtube = registry.get(developer_key="key")
+    ingest_comments(youtube, VIDEO, str(tmp_path), max_comments=150)
+    calls = api_calls()
+    assert ingest_comments(youtube, VIDEO, str(tmp_path), max_comments=150)["done"]
+    assert api_calls() == calls
+
+    checkpoint = ingest_comments(youtube, VIDEO, str(tmp_path), max_comments=150, refresh=True)
+    assert checkpoint["comments_written"] == 150
+    assert len(exported_ids(tmp_path)) == 150
+
+
+def test_different_parameters_start_a_new_export(registry, tmp_path):
+    youtube = registry.get(developer_key="key")
+    ingest_comments(youtube, VIDEO, str(tmp_path), max_comments=150)
+    checkpoint = ingest_comments(youtube, VIDEO, str(tmp_path))
+    assert checkpoint["comments_written"] == COMMENTS
+    assert len(exported_ids(tmp_path)) == COMMENTS
+
+
+def test_export_refuses_another_videos_directory(registry, tmp_path):
+    youtube = registry.get(developer_key="key")
+    ingest_comments(youtube, VIDEO, str(tmp_path), max_comments=10)
+    with pytest.raises(ValueError):
+        ingest_comments(youtube, video_id(0, 1), str(tmp_path), max_comments=10)
+
+
+@pytest.mark.parametrize("since", [
+    datetime.datetime(2100, 1, 1),
+    datetime.datetime(2100, 1, 1, tzinfo=datetime.timezone.utc),
+    datetime.date(2100, 1, 1),
+    "2100-01-01T00:00:00",
+])
+def test_since_accepts_naive_and_aware_values(registry, since):
+    youtube = registry.get(developer_key="key")
+    assert list(iter_comments(youtube, VIDEO, since=since)) == []
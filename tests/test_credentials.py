@@ -0,0 +1,57 @@
+# CredentialManager lets idle credentials go, together with their client
+import pytest
+
+from viralbot.credentials import CredentialManager, CredentialStore
+from viralbot.youtube_api import client_registry
+
+INFO = {
+    "token": "token",
+    "refresh_token": "refresh",
+    "client_id": "client",
+    "client_secret": "secret",
+    "token_uri": "http://127.0.0.1:9/token",
+}
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = CredentialManager(store=CredentialStore(directory=str(tmp_path)), check_interval=3600)
+    yield manager
+    manager.stop()
+
+
+def test_get_returns_the_same_live_object(manager):
+    handle = manager.register(INFO)
+    assert manager.get(handle) is manager.get(handle)
+    assert manager.stats()["live"] == 1
+
+
+def test_idle_credentials_are_released_with_their_client(manager):
+    handle = manager.register(INFO)
+    credentials = manager.get(handle)
+    client_registry.get(credentials)
+    assert client_registry.stats()["clients"] == 1
+
+    manager.idle_timeout = 0
+    manager.refresh_due()
+    assert manager.stats()["live"] == 0
+    assert client_registry.stats()["clients"] == 0
+
+    # Restored from disk as a new object, which a rebuilt client shares
+    restored = manager.get(handle)
+    assert restored is not credentials
+    assert restored.refresh_token == "refresh"
+    assert client_registry.get(restored)._http.credentials is restored
+
+
+def test_recently_used_credentials_stay_live(manager):
+    handle = manager.register(INFO)
+    credentials = manager.get(handle)
+    manager.refresh_due()
+    assert manager.get(handle) is credentials
+
+
+def test_forget_removes_credentials_for_good(manager):
+    handle = manager.register(INFO)
+    manager.forget(handle)
+    assert manager.get(handle) is None
@@ -0,0 +1,91 @@
+# Results fetched with one user's OAuth credentials must never reach
+# another user; results fetched with an API key are public and shared
+from benchmarks.stub_server import video_id
+from viralbot.memo import MemoCache, memoize
+from viralbot.tag_index import tag_index
+from viralbot.video_batch import fetch_videos
+from viralbot.video_store import VideoSnapshotStore
+from viralbot.youtube_api import execute_request
+
+from .conftest import oauth_credentials
+
+PUBLIC, PRIVATE = video_id(0, 0), video_id(0, 1)
+
+
+def test_video_store_shares_public_videos_only(registry, api_calls, private_videos):
+    private_videos[(0, 1)] = "private"
+    alice = registry.get(oauth_credentials("alice"))
+    bob = registry.get(oauth_credentials("bob"))
+    store = VideoSnapshotStore()
+
+    store.get_many(alice, [PUBLIC, PRIVATE], ["snippet"])
+    calls = api_calls()
+    items, _ = store.get_many(bob, [PUBLIC], ["snippet"])
+    assert PUBLIC in items
+    assert api_calls() == calls
+
+    store.get(bob, PRIVATE, ["snippet"])
+    assert api_calls() == calls + 1
+
+
+def test_video_store_api_key_results_are_shared(registry, api_calls, private_videos):
+    private_videos[(0, 1)] = "private"
+    store = VideoSnapshotStore()
+    store.get(registry.get(developer_key="key-a"), PRIVATE, ["snippet"])
+    calls = api_calls()
+    store.get(registry.get(developer_key="key-b"), PRIVATE, ["snippet"])
+    assert api_calls() == calls
+
+
+def test_single_flight_is_scoped_by_credentials(registry, api_calls):
+    clients = [registry.get(oauth_credentials(name)) for name in ("alice", "bob")]
+    for youtube in clients:
+        execute_request(youtube.videos().list, part="snippet", id=PUBLIC)
+    assert api_calls() == 2
+
+    for key in ("key-a", "key-b"):
+        execute_request(registry.get(developer_key=key).videos().list, part="snippet", id=PUBLIC)
+    assert api_calls() == 3
+
+
+def test_single_flight_callers_get_their_own_copy(registry):
+    youtube = registry.get(developer_key="key")
+    first = execute_request(youtube.videos().list, part="snippet", id=PUBLIC)
+    first["items"][0]["snippet"]["title"] = "changed"
+    second = execute_request(youtube.videos().list, part="snippet", id=PUBLIC)
+    assert second["items"][0]["snippet"]["title"] != "changed"
+
+
+def test_memo_is_keyed_by_credentials(registry):
+    calls = []
+
+    @memoize(ttl=60, cache=MemoCache())
+    def lookup(youtube, video):
+        calls.append(video)
+        return {"video": video}
+
+    alice = registry.get(oauth_credentials("alice"))
+    bob = registry.get(oauth_credentials("bob"))
+    lookup(alice, PUBLIC)
+    lookup(alice, PUBLIC)
+    lookup(bob, PUBLIC)
+    assert len(calls) == 2
+
+
+def test_memo_hits_are_copies(registry):
+    @memoize(ttl=60, cache=MemoCache())
+    def lookup(youtube, video):
+        return {"tags": [video]}
+
+    youtube = registry.get(developer_key="key")
+    lookup(youtube, PUBLIC)["tags"].append("changed")
+    assert lookup(youtube, PUBLIC) == {"tags": [PUBLIC]}
+
+
+def test_tag_index_skips_private_videos_fetched_with_oauth(registry, private_videos):
+    private_videos[(0, 1)] = "private"
+    fetch_videos(registry.get(oauth_credentials("alice")), [PUBLIC, PRIVATE])
+    assert tag_index.stats()["videos"] == 1
+
+    fetch_videos(registry.get(developer_key="key"), [PUBLIC, PRIVATE])
+    assert tag_index.stats()["videos"] == 2
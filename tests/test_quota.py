@@ -0,0 +1,97 @@
+# Quota scheduler decisions and per-project ledger accounting
+import pytest
+
+from viralbot.quota import (
+    DEFER, HIGH, LOW, NORMAL, REJECT, RUN, QuotaDeferred, QuotaExceededError, QuotaLedger, QuotaScheduler,
+)
+
+SEARCH = "youtube.search.list"  # 100 units
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return QuotaLedger(daily_limit=1000, path=str(tmp_path / "quota.sqlite3"))
+
+
+@pytest.fixture
+def scheduler(ledger):
+    return QuotaScheduler(ledger, soft_limit=0.8, hard_limit=0.95)
+
+
+def spend(ledger, units, project=None):
+    ledger.record("youtube.videos.list", "user", units=units, project=project)
+
+
+def test_everything_runs_below_the_soft_limit(ledger, scheduler):
+    spend(ledger, 500)
+    assert [scheduler.decide(100, priority) for priority in (HIGH, NORMAL, LOW)] == [RUN, RUN, RUN]
+
+
+def test_low_priority_is_deferred_past_the_soft_limit(ledger, scheduler):
+    spend(ledger, 800)
+    assert [scheduler.decide(50, priority) for priority in (HIGH, NORMAL, LOW)] == [RUN, RUN, DEFER]
+
+
+def test_only_high_priority_runs_past_the_hard_limit(ledger, scheduler):
+    spend(ledger, 940)
+    assert [scheduler.decide(50, priority) for priority in (HIGH, NORMAL, LOW)] == [RUN, DEFER, REJECT]
+
+
+def test_nothing_runs_past_the_daily_limit(ledger, scheduler):
+    spend(ledger, 950)
+    assert scheduler.decide(100, HIGH) == REJECT
+
+
+def test_admit_raises_for_deferred_and_rejected_calls(ledger, scheduler):
+    spend(ledger, 860)
+    scheduler.admit(SEARCH, priority=HIGH)
+    with pytest.raises(QuotaDeferred):
+        scheduler.admit(SEARCH, priority=NORMAL)
+    with pytest.raises(QuotaExceededError) as error:
+        scheduler.admit(SEARCH, priority=LOW)
+    assert not isinstance(error.value, QuotaDeferred)
+    assert scheduler.stats() == {"deferred": 1, "rejected": 1, "pending": 0}
+
+
+def test_deferred_work_runs_once_budget_frees_up(ledger, scheduler):
+    spend(ledger, 850)
+    assert scheduler.schedule(lambda: "crawl", 50, LOW) == (DEFER, None)
+    assert scheduler.run_deferred() == []
+    ledger.daily_limit = 2000
+    assert scheduler.run_deferred() == ["crawl"]
+    assert scheduler.pending() == 0
+
+
+def test_budgets_and_exhaustion_are_per_project(ledger, scheduler):
+    spend(ledger, 950, project="a")
+    assert scheduler.decide(100, HIGH, project="a") == REJECT
+    assert scheduler.decide(100, HIGH, project="b") == RUN
+
+    ledger.mark_exhausted("b")
+    assert ledger.remaining("b") == 0
+    assert scheduler.decide(1, HIGH, project="b") == REJECT
+    assert scheduler.decide(1, HIGH, project="c") == RUN
+
+
+def test_deferred_work_waits_for_its_own_project(ledger, scheduler):
+    spend(ledger, 850, project="a")
+    spend(ledger, 850, project="b")
+    scheduler.schedule(lambda: "a", 50, LOW, project="a")
+    scheduler.schedule(lambda: "b", 50, LOW, project="b")
+    ledger.mark_exhausted("a")
+    scheduler.soft_limit = 1.0
+    assert scheduler.run_deferred() == ["b"]
+    assert scheduler.pending() == 1
+
+
+def test_ledger_writes_are_batched_and_survive_a_restart(tmp_path):
+    path = str(tmp_path / "quota.sqlite3")
+    ledger = QuotaLedger(path=path, flush_calls=3, flush_interval=3600)
+    for _ in range(2):
+        ledger.record(SEARCH, "user", project="a")
+    assert QuotaLedger(path=path).usage(project="a") == 0
+    ledger.record(SEARCH, "user", project="a")
+    ledger.record(SEARCH, "user", project="a")
+    assert QuotaLedger(path=path).usage(project="a") == 300
+    ledger.flush()
+    assert QuotaLedger(path=path).usage(project="a") == 400
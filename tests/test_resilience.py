@@ -0,0 +1,97 @@
+# Circuit breaker state transitions through call_with_retries
+import pytest
+
+from viralbot.resilience import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreakers, CircuitOpenError, RetryPolicy, call_with_retries,
+)
+
+ENDPOINT = "youtube.videos.list"
+
+
+@pytest.fixture
+def breakers():
+    return CircuitBreakers(failure_threshold=2, reset_timeout=60)
+
+
+def call(breakers, attempt):
+    return call_with_retries(attempt, ENDPOINT, policy=RetryPolicy(max_attempts=1), breakers=breakers)
+
+
+def unavailable():
+    raise ConnectionError("connection reset")
+
+
+def bad_request():
+    raise ValueError("bad request")
+
+
+def fail(breakers, attempt=unavailable, error=ConnectionError):
+    with pytest.raises(error):
+        call(breakers, attempt)
+
+
+def open_breaker(breakers):
+    fail(breakers)
+    fail(breakers)
+    breaker = breakers.get(ENDPOINT)
+    assert breaker.state == OPEN
+    return breaker
+
+
+def test_opens_after_threshold_and_fails_fast(breakers):
+    fail(breakers)
+    assert breakers.get(ENDPOINT).state == CLOSED
+    fail(breakers)
+    assert breakers.get(ENDPOINT).state == OPEN
+    attempts = []
+    fail(breakers, lambda: attempts.append(1), CircuitOpenError)
+    assert attempts == []
+
+
+def test_retries_count_as_one_failure(breakers):
+    policy = RetryPolicy(max_attempts=3, base_delay=0)
+    with pytest.raises(ConnectionError):
+        call_with_retries(unavailable, ENDPOINT, policy=policy, breakers=breakers)
+    assert breakers.get(ENDPOINT).stats()["failures"] == 1
+
+
+def test_successful_probe_closes(breakers):
+    breaker = open_breaker(breakers)
+    breaker.reset_timeout = 0
+    assert call(breakers, lambda: "ok") == "ok"
+    assert breaker.stats() == {"state": CLOSED, "failures": 0, "opened": 1}
+
+
+def test_failed_probe_reopens(breakers):
+    breaker = open_breaker(breakers)
+    breaker.reset_timeout = 0
+    fail(breakers)
+    assert breaker.state == OPEN
+    assert breaker.opened == 2
+
+
+def test_one_probe_at_a_time(breakers):
+    breaker = open_breaker(breakers)
+    breaker.reset_timeout = 0
+    assert breaker.before_call() is True
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.release_probe()
+    assert breaker.before_call() is True
+
+
+def test_non_retryable_errors_keep_the_failure_count(breakers):
+    fail(breakers)
+    fail(breakers, bad_request, ValueError)
+    assert breakers.get(ENDPOINT).stats() == {"state": CLOSED, "failures": 1, "opened": 0}
+
+
+def test_non_retryable_errors_release_the_probe(breakers):
+    breaker = open_breaker(breakers)
+    breaker.reset_timeout = 0
+    fail(breakers, bad_request, ValueError)
+    # Still half open, and the next call may probe
+    assert breaker.state == HALF_OPEN
+    assert call(breakers, lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
@@ -0,0 +1,2 @@
+# Analytics core of the YouTube Viral Bot, usable without Streamlit.
+# Submodules are imported on demand to keep startup fast.
@@ -0,0 +1,329 @@
+# Fetch and analysis functions behind the app's views
+#
+# Nothing here touches Streamlit: every function takes a YouTube client,
+# returns plain data (usually a DataFrame) and raises on API errors, so the
+# same code serves the web app, the CLI and batch jobs. None means the
+# channel, video or playlist has no data. Lookups are memoized per user, so
+# reruns and repeat views don't go back to the network.
+import datetime
+
+import pandas as pd
+
+from .catalog import crawl_channel
+from .channel_batch import CHANNEL_FAILURE_COLUMNS, get_channels_bulk
+from .channel_resolver import resolve_channel_id, resolve_channel_ids
+from .comment_analytics import analyze_comments
+from .comments import iter_comments
+from .memo import memoize
+from .scoring import rank_videos
+from .search import deep_search as _deep_search, search_page
+from .tag_index import tag_index
+from .trends import PN_TO_GEO, trends_client
+from .utils import extract_video_id
+from .video_batch import get_videos_bulk, to_frame
+from .video_store import video_store
+from .youtube_api import execute_request, iter_pages
+
+# Average cost per impression range (USD) by industry
+INDUSTRY_CPI = {
+    "Retail": (0.10, 0.30),
+    "Finance": (0.20, 0.50),
+    "Technology": (0.15, 0.40),
+    "Healthcare": (0.25, 0.60),
+    "Entertainment": (0.05, 0.20)
+}
+
+MINUTE = 60
+# Video lookups are keyed by ID, whatever URL form was entered
+VIDEO_KEY = {"video_url": lambda url: extract_video_id(url) or url.strip()}
+
+
+def _format_published_at(value):
+    published_at = datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ')
+    return published_at.strftime('%B %d, %Y at %I:%M %p')
+
+
+def _first_item(response):
+    items = response.get('items') or []
+    return items[0] if items else None
+
+
+# Read a video from the shared snapshot store, fetching only the parts
+# that are missing or stale
+def video_snapshot(youtube, video_url, parts):
+    video_id = extract_video_id(video_url)
+    item, failures = video_store.get(youtube, video_id, parts)
+    for failure in failures:
+        if failure["error"].startswith("API request failed"):
+            raise RuntimeError(failure["error"])
+    return video_id, item
+
+
+@memoize(ttl=10 * MINUTE)
+def channel_analytics(youtube, channel_id):
+    response = execute_request(youtube.channels().list, part="statistics", id=channel_id)
+    item = _first_item(response)
+    if item is None:
+        return None
+    stats = item['statistics']
+    return pd.DataFrame({
+        "Metric": ["Subscriber Count", "Total Views", "Total Videos"],
+        "Value": [int(stats.get('subscriberCount', 0)), int(stats.get('viewCount', 0)), int(stats.get('videoCount', 0))]
+    })
+
+
+@memoize(ttl=60 * MINUTE)
+def channel_info(youtube, channel_id):
+    response = execute_request(youtube.channels().list, part="snippet", id=channel_id)
+    item = _first_item(response)
+    if item is None:
+        return None
+    snippet = item['snippet']
+    return pd.DataFrame({
+        "Metric": ["Title", "Description", "Published At"],
+        "Value": [snippet.get('title'), snippet.get('description'), snippet.get('publishedAt')]
+    })
+
+
+# Side-by-side comparison of many channels given as URLs, handles or IDs:
+# references are resolved in bulk and channels fetched 50 per call.
+# Returns (channels_df, failures_df); channels_df keeps the input order.
+@memoize(ttl=10 * MINUTE)
+def compare_channels(youtube, channel_urls):
+    channel_urls = [url.strip() for url in channel_urls if url.strip()]
+    resolved = resolve_channel_ids(channel_urls, youtube)
+    inputs = {}
+    for url, channel_id in resolved.items():
+        if channel_id:
+            inputs.setdefault(channel_id, url)
+    channels_df, failures_df = get_channels_bulk(youtube, list(inputs))
+    channels_df.insert(0, "input", channels_df["channel_id"].map(inputs).astype("string"))
+    failures_df["input"] = failures_df["channel_id"].map(inputs).fillna(failures_df["input"]).astype("string")
+    unresolved = [{"input": url, "channel_id": None, "error": "Channel URL could not be resolved"}
+                  for url, channel_id in resolved.items() if not channel_id]
+    return channels_df, pd.concat([to_frame(unresolved, CHANNEL_FAILURE_COLUMNS), failures_df], ignore_index=True)
+
+
+@memoize(ttl=10 * MINUTE)
+def search_youtube(youtube, query, max_results=5):
+    # A full page costs the same quota as five results and is shared with
+    # deep_search through the page cache
+    response, _ = search_page(youtube, query)
+    items = response.get('items', [])[:max_results]
+    if not items:
+        return None
+    return pd.DataFrame([{
+        "Title": item['snippet']['title'],
+        "Type": item['id']['kind'].split('#')[-1],  # Extract video, channel, or playlist
+        "Description": item['snippet']['description']
+    } for item in items])
+
+
+# Paginated search over one or more queries with statistics for every hit.
+# Pages come from the search page cache, so it isn't memoized here.
+# Returns (results_df, stats) or (None, stats) when nothing matched.
+def deep_search(youtube, queries, max_results=200, quota_budget=None, seen=None):
+    df, stats = _deep_search(youtube, queries, max_results=max_results, quota_budget=quota_budget, seen=seen)
+    return (df if not df.empty else None), stats
+
+
+# Every playlist of a channel as [{"Title", "Playlist ID"}]
+@memoize(ttl=30 * MINUTE)
+def channel_playlists(youtube, channel_id):
+    return [{
+        "Title": item['snippet']['title'],
+        "Playlist ID": item['id']
+    } for response in iter_pages(
+        youtube.playlists().list,
+        part="snippet",
+        channelId=channel_id,
+        maxResults=50
+    ) for item in response.get('items', [])]
+
+
+@memoize(ttl=30 * MINUTE)
+def playlist_details(youtube, playlist_id):
+    response = execute_request(youtube.playlists().list, part="snippet,contentDetails", id=playlist_id)
+    item = _first_item(response)
+    if item is None:
+        return None
+    snippet = item['snippet']
+    return pd.DataFrame({
+        "Metric": ["Title", "Description", "Published At", "Video Count"],
+        "Value": [
+            snippet.get('title'),
+            snippet.get('description'),
+            _format_published_at(snippet.get('publishedAt')),
+            item['contentDetails'].get('itemCount'),
+        ]
+    })
+
+
+@memoize(ttl=5 * MINUTE, normalize=VIDEO_KEY)
+def video_metrics(youtube, video_url):
+    _, item = video_snapshot(youtube, video_url, ["statistics"])
+    if item is None:
+        return None
+    stats = item['statistics']
+    return pd.DataFrame({
+        "Metric": ["View Count", "Like Count", "Comment Count"],
+        "Value": [int(stats.get('viewCount', 0)), int(stats.get('likeCount', 0)), int(stats.get('commentCount', 0))]
+    })
+
+
+@memoize(ttl=5 * MINUTE, normalize=VIDEO_KEY)
+def video_details(youtube, video_url):
+    _, item = video_snapshot(youtube, video_url, ["snippet", "statistics", "contentDetails"])
+    if item is None:
+        return None
+    snippet = item['snippet']
+    statistics = item['statistics']
+    content_details = item['contentDetails']
+    return pd.DataFrame({
+        "Metric": [
+            "Title",
+            "Description",
+            "Published At",
+            "Duration",
+            "View Count",
+            "Like Count",
+            "Dislike Count",
+            "Comment Count",
+            "Category"
+        ],
+        "Value": [
+            snippet.get('title'),
+            snippet.get('description'),
+            _format_published_at(snippet.get('publishedAt')),
+            content_details.get('duration'),
+            statistics.get('viewCount'),
+            statistics.get('likeCount'),
+            statistics.get('dislikeCount'),
+            statistics.get('commentCount'),
+            snippet.get('categoryId')
+        ]
+    })
+
+
+# Earnings from the view count at the midpoint of the industry's CPI range
+@memoize(ttl=5 * MINUTE, normalize=VIDEO_KEY)
+def estimate_earnings(youtube, video_url, industry):
+    _, item = video_snapshot(youtube, video_url, ["statistics"])
+    if item is None:
+        return None
+    cpi_min, cpi_max = INDUSTRY_CPI[industry]
+    return int(item['statistics'].get('viewCount', 0)) * (cpi_min + cpi_max) / 2
+
+
+# The video's tags ranked by total views across every indexed video. Not
+# memoized: the snapshot is cached and rankings move as the index grows.
+def video_tags(youtube, video_url):
+    _, item = video_snapshot(youtube, video_url, ["snippet", "statistics"])
+    if item is None:
+        return None
+    rankings = tag_index.tag_rankings(item['snippet'].get('tags', []))
+    df = pd.DataFrame({
+        "Tag": [row['tag'] for row in rankings],
+        "Ranking": [row['rank'] for row in rankings],
+        "View Count": [row['total_views'] for row in rankings],
+        "Videos": [row['videos'] for row in rankings],
+        "Views/Day": [row['velocity'] for row in rankings]
+    })
+    return df.sort_values("Ranking", na_position="last", ignore_index=True)
+
+
+def _tag_frame(rows, columns):
+    return pd.DataFrame([{label: row[key] for key, label in columns.items()} for row in rows], columns=list(columns.values()))
+
+
+TAG_COLUMNS = {"tag": "Tag", "videos": "Videos", "total_views": "View Count", "velocity": "Views/Day"}
+
+
+# Local tag index queries; these cost no API quota
+def top_tags(limit=20, min_videos=1):
+    return _tag_frame(tag_index.top_tags(limit, min_videos), TAG_COLUMNS)
+
+
+def related_tags(tag, limit=20):
+    return _tag_frame(tag_index.co_occurring(tag, limit), {
+        "tag": "Tag", "videos_together": "Videos Together", "share": "Share", "jaccard": "Jaccard"
+    })
+
+
+def velocity_tags(niche=None, category_id=None, min_videos=5, limit=20):
+    rows = tag_index.velocity_tags(niche, category_id, min_videos, limit)
+    return _tag_frame(rows, dict(TAG_COLUMNS, lift="Velocity Lift", correlation="Correlation"))
+
+
+@memoize(ttl=5 * MINUTE, normalize=VIDEO_KEY)
+def video_comments(youtube, video_url, max_results=10, include_replies=False):
+    video_id = extract_video_id(video_url)
+    comments = [{
+        "Comment": row['text'],
+        "Author": row['author'],
+        "Published At": row['published_at'],
+        "Reply To": row['parent_id']
+    } for row in iter_comments(youtube, video_id, include_replies=include_replies, max_comments=max_results)]
+    return pd.DataFrame(comments) if comments else None
+
+
+# Keywords, phrases, near-duplicate (spam/bot) clusters and sentiment of a
+# video's comments, analyzed as the pages stream in. Returns a dict of
+# DataFrames, or None when the video has no comments.
+@memoize(ttl=10 * MINUTE, normalize=VIDEO_KEY)
+def comment_insights(youtube, video_url, max_comments=10_000, include_replies=False):
+    summary = analyze_comments(youtube, extract_video_id(video_url), include_replies=include_replies, max_comments=max_comments)
+    if not summary['comments']:
+        return None
+    ngrams = summary['ngrams']
+    sentiment = summary['sentiment']
+    return {
+        "Summary": pd.DataFrame({
+            "Metric": ["Comments", "Average Sentiment", "Positive", "Neutral", "Negative", "Near-Duplicates"],
+            "Value": [f"{summary['comments']:,}", f"{sentiment['mean']:+.3f}", f"{sentiment['positive']:,}",
+                      f"{sentiment['neutral']:,}", f"{sentiment['negative']:,}", f"{summary['duplicates']:,}"]
+        }),
+        "Keywords": pd.DataFrame(ngrams[1], columns=["Keyword", "Count"]),
+        "Phrases": pd.DataFrame(
+            sorted(ngrams[2] + ngrams[3], key=lambda item: -item[1]), columns=["Phrase", "Count"]
+        ),
+        "Duplicates": pd.DataFrame(summary['duplicate_clusters'], columns=["text", "comments", "authors"]).rename(
+            columns={"text": "Comment", "comments": "Copies", "authors": "Authors"}
+        ),
+    }
+
+
+# Trending searches for a country with their Google Trends interest
+@memoize(ttl=60 * MINUTE, public=True)
+def trending_keywords(country):
+    keywords = trends_client.trending_searches(pn=country)
+    # Interest relative to the reference term, comparable across keywords
+    interest = trends_client.interest(keywords, geo=PN_TO_GEO.get(country, ""))
+    df = pd.DataFrame({
+        "Keyword": keywords,
+        "Search Interest": [interest.get(keyword) for keyword in keywords],
+        "Region": [country] * len(keywords)
+    })
+    df = df.sort_values("Search Interest", ascending=False, na_position="last").reset_index(drop=True)
+    df["Search Interest"] = df["Search Interest"].round(1)
+    return df
+
+
+# Fetch any number of videos and score them all.
+# Returns (scored_df ranked by viral score, failures_df).
+def score_videos_bulk(youtube, videos, k=None):
+    videos_df, failures_df = get_videos_bulk(youtube, videos)
+    if videos_df.empty:
+        return videos_df, failures_df
+    return rank_videos(videos_df, k=k or len(videos_df)), failures_df
+
+
+# Crawl a channel by URL. Returns (channel_id, catalog_df, failures_df).
+def channel_catalog(youtube, channel_url, max_videos=None, output_path=None, on_progress=None):
+    channel_id = resolve_channel_id(channel_url, youtube)
+    if not channel_id:
+        raise ValueError(f"Could not resolve a channel from {channel_url}")
+    catalog_df, failures_df = crawl_channel(
+        youtube, channel_id, max_videos=max_videos, output_path=output_path, on_progress=on_progress
+    )
+    return channel_id, catalog_df, failures_df
@@ -0,0 +1,123 @@
+# Full channel catalog crawler
+#
+# Lists every upload through the channel's uploads playlist (50 videos per
+# playlistItems.list page, 1 unit each) instead of search.list (100 units
+# per page), and enriches each page with one batched videos.list call while
+# the next page is being listed.
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .fetch_engine import fetch_engine
+from .tag_index import tag_index
+from .video_batch import FAILURE_COLUMNS, MAX_IDS_PER_CALL, VIDEO_COLUMNS, to_frame, video_row
+from .youtube_api import execute_request, iter_pages, private_scope
+
+CATALOG_PARTS = "snippet,statistics,contentDetails,status"
+CATALOG_COLUMNS = dict(VIDEO_COLUMNS, position="Int64")
+
+
+def get_uploads_playlist_id(youtube, channel_id):
+    response = execute_request(youtube.channels().list, part="contentDetails", id=channel_id)
+    items = response.get("items") or []
+    if not items:
+        return None
+    return items[0]["contentDetails"]["relatedPlaylists"].get("uploads")
+
+
+# Yield lists of video IDs, one per playlistItems page
+def iter_playlist_video_ids(youtube, playlist_id, max_videos=None):
+    seen = 0
+    for response in iter_pages(
+        youtube.playlistItems().list,
+        part="contentDetails",
+        playlistId=playlist_id,
+        maxResults=MAX_IDS_PER_CALL
+    ):
+        video_ids = [item["contentDetails"]["videoId"] for item in response.get("items", [])]
+        if max_videos is not None:
+            video_ids = video_ids[:max_videos - seen]
+        seen += len(video_ids)
+        yield video_ids
+        if max_videos is not None and seen >= max_videos:
+            return
+
+
+# Yield (rows, failures, next_page_token) for each uploads page, enriched
+# before it is yielded, so a caller can checkpoint after every page and
+# resume later from next_page_token. Positions count on from `start`, and
+# max_videos caps the position rather than this call's output.
+def iter_catalog_pages(youtube, playlist_id, page_token=None, start=0, max_videos=None):
+    position = start
+    resume = {"pageToken": page_token} if page_token else {}
+    for page in iter_pages(
+        youtube.playlistItems().list,
+        part="contentDetails",
+        playlistId=playlist_id,
+        maxResults=MAX_IDS_PER_CALL,
+        **resume
+    ):
+        video_ids = [item["contentDetails"]["videoId"] for item in page.get("items", [])]
+        if max_videos is not None:
+            video_ids = video_ids[:max(max_videos - position, 0)]
+        items = {}
+        if video_ids:
+            response = execute_request(youtube.videos().list, part=CATALOG_PARTS, id=",".join(video_ids))
+            items = {item["id"]: item for item in response.get("items", [])}
+            tag_index.add_videos(items.values(), private_scope(getattr(youtube, "_http", None)))
+        rows, failures = [], []
+        for video_id in video_ids:
+            if video_id in items:
+                row = video_row(items[video_id])
+                row["position"] = position
+                rows.append(row)
+            else:
+                failures.append({"input": video_id, "video_id": video_id, "error": "Video not found or private"})
+            position += 1
+        yield rows, failures, page.get("nextPageToken")
+        if max_videos is not None and position >= max_videos:
+            return
+
+
+# Crawl a channel's uploads into a columnar catalog (newest first).
+# Returns (catalog_df, failures_df); writes Parquet when output_path is set.
+def crawl_channel(youtube, channel_id, max_videos=None, output_path=None, on_progress=None):
+    playlist_id = get_uploads_playlist_id(youtube, channel_id)
+    if not playlist_id:
+        raise ValueError(f"Channel {channel_id} not found")
+
+    # Enrichment for each page starts as soon as the page is listed
+    pending, listed, failures = [], 0, []
+    try:
+        for video_ids in iter_playlist_video_ids(youtube, playlist_id, max_videos):
+            if video_ids:
+                pending.append((video_ids, fetch_engine.submit(
+                    youtube.videos().list, part=CATALOG_PARTS, id=",".join(video_ids)
+                )))
+            listed += len(video_ids)
+            if on_progress:
+                on_progress(listed)
+    except Exception as e:
+        # Keep what was listed so far; the failure says where listing stopped
+        failures.append({"input": playlist_id, "video_id": None, "error": f"Listing stopped after {listed} videos: {e}"})
+
+    rows, position = [], 0
+    for video_ids, fetch in pending:
+        result = fetch.result()
+        items = {}
+        if result.ok:
+            items = {item["id"]: item for item in result.value.get("items", [])}
+            tag_index.add_videos(items.values(), private_scope(getattr(youtube, "_http", None)))
+        for video_id in video_ids:
+            if video_id in items:
+                row = video_row(items[video_id])
+                row["position"] = position
+                rows.append(row)
+            else:
+                error = f"API request failed: {result.error}" if not result.ok else "Video not found or private"
+                failures.append({"input": video_id, "video_id": video_id, "error": error})
+            position += 1
+
+    catalog = to_frame(rows, CATALOG_COLUMNS)
+    if output_path:
+        pq.write_table(pa.Table.from_pandas(catalog, preserve_index=False), output_path)
+    return catalog, to_frame(failures, FAILURE_COLUMNS)
@@ -0,0 +1,92 @@
+# Bulk channel lookups: up to 50 IDs per channels.list call
+import numpy as np
+import pandas as pd
+
+from .fetch_engine import fetch_all
+from .utils import chunked
+from .video_batch import to_frame
+
+MAX_IDS_PER_CALL = 50
+CHANNEL_PARTS = "snippet,statistics,contentDetails"
+
+CHANNEL_COLUMNS = {
+    "channel_id": "string",
+    "title": "string",
+    "custom_url": "string",
+    "country": "string",
+    "published_at": "datetime64[ns, UTC]",
+    "subscriber_count": "Int64",
+    "view_count": "Int64",
+    "video_count": "Int64",
+    "uploads_playlist_id": "string",
+}
+CHANNEL_FAILURE_COLUMNS = {"input": "string", "channel_id": "string", "error": "string"}
+
+
+# Fetch raw channel resources for many IDs. Returns ({id: item}, failures);
+# chunks run concurrently and a failed call only fails its own chunk.
+def fetch_channels(youtube, channel_ids, part=CHANNEL_PARTS):
+    channel_ids = list(dict.fromkeys(channel_ids))
+    chunks = list(chunked(channel_ids, MAX_IDS_PER_CALL))
+    results = fetch_all(
+        (youtube.channels().list, {"part": part, "id": ",".join(chunk)}) for chunk in chunks
+    )
+
+    items, failures = {}, []
+    for chunk, result in zip(chunks, results):
+        if not result.ok:
+            failures.extend({"input": channel_id, "channel_id": channel_id, "error": f"API request failed: {result.error}"} for channel_id in chunk)
+            continue
+
+        for item in result.value.get("items", []):
+            items[item["id"]] = item
+        failures.extend(
+            {"input": channel_id, "channel_id": channel_id, "error": "Channel not found"}
+            for channel_id in chunk if channel_id not in items
+        )
+    return items, failures
+
+
+def channel_row(item):
+    snippet = item.get("snippet", {})
+    statistics = item.get("statistics", {})
+    return {
+        "channel_id": item["id"],
+        "title": snippet.get("title"),
+        "custom_url": snippet.get("customUrl"),
+        "country": snippet.get("country"),
+        "published_at": snippet.get("publishedAt"),
+        # Hidden subscriber counts are reported as 0; treat them as unknown
+        "subscriber_count": None if statistics.get("hiddenSubscriberCount") else statistics.get("subscriberCount"),
+        "view_count": statistics.get("viewCount"),
+        "video_count": statistics.get("videoCount"),
+        "uploads_playlist_id": item.get("contentDetails", {}).get("relatedPlaylists", {}).get("uploads"),
+    }
+
+
+# Per-video, per-subscriber and per-day ratios for a channel frame. Zero
+# denominators give NaN rather than infinity.
+def add_channel_ratios(channels, now=None):
+    now = pd.Timestamp.now(tz="UTC") if now is None else pd.Timestamp(now)
+    df = channels.copy()
+    views = df["view_count"].astype("float64")
+    subscribers = df["subscriber_count"].astype("float64")
+    videos = df["video_count"].astype("float64")
+    age_days = ((now - df["published_at"]).dt.total_seconds() / 86400).clip(lower=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        df["age_days"] = age_days.round(1)
+        df["views_per_video"] = (views / videos.where(videos > 0)).round(1)
+        df["views_per_subscriber"] = (views / subscribers.where(subscribers > 0)).round(2)
+        df["subscribers_per_video"] = (subscribers / videos.where(videos > 0)).round(1)
+        df["videos_per_month"] = (videos / (age_days / 30.44)).round(2)
+        df["views_per_day"] = (views / age_days).round(1)
+    return df
+
+
+# Comparison table for many channel IDs: every channel in one frame with
+# derived ratios. Returns (channels_df, failures_df).
+def get_channels_bulk(youtube, channel_ids, part=CHANNEL_PARTS):
+    channel_ids = list(dict.fromkeys(channel_ids))
+    items, failures = fetch_channels(youtube, channel_ids, part=part)
+    rows = [channel_row(items[channel_id]) for channel_id in channel_ids if channel_id in items]
+    return add_channel_ratios(to_frame(rows, CHANNEL_COLUMNS)), to_frame(failures, CHANNEL_FAILURE_COLUMNS)
@@ -0,0 +1,298 @@
+# Channel URL -> channel ID resolution backed by a persistent on-disk index
+#
+# Channel, @handle and /user/ URLs are resolved through the API (or directly
+# from the URL). Only custom /c/ URLs still need the channel page, which is
+# streamed and abandoned as soon as the canonical link has been read.
+import concurrent.futures
+import contextvars
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import unquote, urlparse
+
+import requests
+
+from .fetch_engine import fetch_all
+from .utils import chunked, data_path
+from .tracing import span
+from .youtube_api import execute_request
+
+RESOLVER_TTL = 30 * 24 * 60 * 60
+MAX_ENTRIES = 50_000
+# last_used is only rewritten once it is this old
+LAST_USED_RESOLUTION = 24 * 60 * 60
+SCRAPE_TIMEOUT = (5, 15)
+SCRAPE_CHUNK_SIZE = 16 * 1024
+# Give up on pages that have not shown a canonical link by this point
+MAX_SCRAPE_BYTES = 2 * 1024 * 1024
+# Channel pages fetched at once when resolving many URLs
+MAX_CONCURRENT_SCRAPES = 8
+# SQLite caps the number of bound parameters per statement
+INDEX_BATCH_SIZE = 500
+
+_CHANNEL_ID_RE = re.compile(r"^UC[A-Za-z0-9_-]{22}$")
+_LINK_TAG_RE = re.compile(rb"<link\b[^>]*>", re.IGNORECASE)
+_CANONICAL_RE = re.compile(rb"""rel=["']?canonical["']?""", re.IGNORECASE)
+_HREF_RE = re.compile(rb"""href=["']([^"']+)["']""", re.IGNORECASE)
+
+_session = requests.Session()
+_session.headers.update({"User-Agent": "Mozilla/5.0", "Accept-Language": "en-US,en;q=0.8"})
+
+
+# Reduce the many spellings of a channel reference to (kind, value):
+# ("id", "UC..."), ("handle", "@name"), ("user", "name") or ("custom", url)
+def parse_channel_reference(channel_url):
+    reference = (channel_url or "").strip()
+    if _CHANNEL_ID_RE.match(reference):
+        return "id", reference
+    if reference.startswith("@"):
+        return "handle", reference.lower()
+
+    parsed = urlparse(reference if "://" in reference else f"https://{reference}")
+    parts = [unquote(p) for p in parsed.path.split("/") if p]
+    if not parts:
+        return None, None
+    if parts[0] == "channel" and len(parts) > 1 and _CHANNEL_ID_RE.match(parts[1]):
+        return "id", parts[1]
+    if parts[0].startswith("@"):
+        return "handle", parts[0].lower()
+    if parts[0] == "user" and len(parts) > 1:
+        return "user", parts[1].lower()
+    # /c/name and legacy vanity URLs can only be resolved from the page
+    path = "/".join(parts[:2]) if parts[0] == "c" else parts[0]
+    return "custom", f"https://www.youtube.com/{path}"
+
+
+class ChannelIndex:
+    # Persistent reference -> channel ID map with TTL and LRU eviction
+
+    def __init__(self, path=None, ttl=RESOLVER_TTL, max_entries=MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or data_path("channel_ids.sqlite3"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS channel_ids ("
+            " key TEXT PRIMARY KEY, channel_id TEXT NOT NULL,"
+            " resolved_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS channel_ids_last_used ON channel_ids (last_used)")
+        self._db.commit()
+
+    # Record use of the given keys. LRU order only needs day resolution, so
+    # most reads write nothing and skip the commit.
+    def _touch(self, used, now):
+        stale = [(now, key) for key, last_used in used if now - last_used >= LAST_USED_RESOLUTION]
+        if stale:
+            self._db.executemany("UPDATE channel_ids SET last_used = ? WHERE key = ?", stale)
+            self._db.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT channel_id, resolved_at, last_used FROM channel_ids WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM channel_ids WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._touch([(key, row[2])], now)
+            return row[0]
+
+    # {key: channel_id} for the keys that are indexed and fresh
+    def get_many(self, keys):
+        now = time.time()
+        found, used = {}, []
+        with self._lock:
+            for batch in chunked(list(dict.fromkeys(keys)), INDEX_BATCH_SIZE):
+                rows = self._db.execute(
+                    "SELECT key, channel_id, resolved_at, last_used FROM channel_ids"
+                    f" WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for key, channel_id, resolved_at, last_used in rows:
+                    if now - resolved_at <= self.ttl:
+                        found[key] = channel_id
+                        used.append((key, last_used))
+            self._touch(used, now)
+        return found
+
+    def put(self, key, channel_id):
+        self.put_many({key: channel_id})
+
+    def put_many(self, channel_ids):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO channel_ids (key, channel_id, resolved_at, last_used) VALUES (?, ?, ?, ?)",
+                [(key, channel_id, now, now) for key, channel_id in channel_ids.items()],
+            )
+            # Drop the least recently used entries once the index is full
+            self._db.execute(
+                "DELETE FROM channel_ids WHERE key IN ("
+                " SELECT key FROM channel_ids ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM channel_ids")
+            self._db.commit()
+
+
+# Read the channel page as a stream and stop once the canonical link shows up
+def scrape_channel_id(channel_url):
+    with span("channel.scrape", url=channel_url) as scrape:
+        return _scrape_channel_id(channel_url, scrape)
+
+
+def _scrape_channel_id(channel_url, scrape):
+    received = 0
+    try:
+        with _session.get(channel_url, stream=True, timeout=SCRAPE_TIMEOUT) as response:
+            response.raise_for_status()
+            buffer = b""
+            for chunk in response.iter_content(chunk_size=SCRAPE_CHUNK_SIZE):
+                buffer += chunk
+                received += len(chunk)
+                scrape.set(bytes=received)
+                for tag in _LINK_TAG_RE.findall(buffer):
+                    if _CANONICAL_RE.search(tag):
+                        href = _HREF_RE.search(tag)
+                        if href:
+                            return href.group(1).decode("utf-8", "replace").rstrip("/").split("/")[-1]
+                if b"</head>" in buffer or len(buffer) > MAX_SCRAPE_BYTES:
+                    return None
+                # Keep only the tail that may hold a partially received tag
+                buffer = buffer[-SCRAPE_CHUNK_SIZE:]
+    except requests.RequestException:
+        return None
+    return None
+
+
+# channels.list filters that resolve a reference for 1 quota unit
+_API_LOOKUPS = {"handle": "forHandle", "user": "forUsername"}
+
+
+def _page_url(kind, value):
+    if kind == "handle":
+        return f"https://www.youtube.com/{value}"
+    if kind == "user":
+        return f"https://www.youtube.com/user/{value}"
+    return value
+
+
+def _lookup_channel_id(youtube, **kwargs):
+    response = execute_request(youtube.channels().list, part="id", **kwargs)
+    items = response.get("items") or []
+    return items[0]["id"] if items else None
+
+
+class ChannelResolver:
+    def __init__(self, index=None):
+        self._index = index
+        self._index_lock = threading.Lock()
+
+    @property
+    def index(self):
+        # Opened lazily so importing the module never touches the disk
+        with self._index_lock:
+            if self._index is None:
+                self._index = ChannelIndex()
+            return self._index
+
+    def resolve(self, channel_url, youtube=None):
+        kind, value = parse_channel_reference(channel_url)
+        if kind is None:
+            return None
+        if kind == "id":
+            return value
+
+        with span("channel.resolve", kind=kind) as resolve:
+            key = f"{kind}:{value}"
+            channel_id = self.index.get(key)
+            if channel_id:
+                resolve.set(source="index")
+                return channel_id
+
+            channel_id = None
+            if youtube is not None and kind in _API_LOOKUPS:
+                resolve.set(source="api")
+                try:
+                    channel_id = _lookup_channel_id(youtube, **{_API_LOOKUPS[kind]: value})
+                except Exception:
+                    channel_id = None
+
+            if not channel_id:
+                resolve.set(source="scrape")
+                channel_id = scrape_channel_id(_page_url(kind, value))
+
+            if channel_id and _CHANNEL_ID_RE.match(channel_id):
+                self.index.put(key, channel_id)
+                return channel_id
+            resolve.set(source="unresolved")
+            return None
+
+    # Resolve many references at once: one index query for all of them,
+    # concurrent forHandle/forUsername lookups (the API takes one per call)
+    # and concurrent page scrapes for what is left.
+    # Returns {channel_url: channel_id or None}.
+    def resolve_many(self, channel_urls, youtube=None):
+        references = {url: parse_channel_reference(url) for url in dict.fromkeys(channel_urls)}
+        resolved = {url: value if kind == "id" else None for url, (kind, value) in references.items()}
+        pending = {f"{kind}:{value}": (kind, value) for kind, value in references.values() if kind not in (None, "id")}
+        if not pending:
+            return resolved
+
+        with span("channel.resolve_many", references=len(pending)) as resolve:
+            found = self.index.get_many(pending)
+            indexed = set(found)
+            resolve.set(index=len(found))
+
+            lookups = [key for key, (kind, _) in pending.items() if key not in found and kind in _API_LOOKUPS]
+            if youtube is not None and lookups:
+                results = fetch_all(
+                    (youtube.channels().list, {"part": "id", _API_LOOKUPS[pending[key][0]]: pending[key][1]})
+                    for key in lookups
+                )
+                for key, result in zip(lookups, results):
+                    if result.ok and result.value.get("items"):
+                        found[key] = result.value["items"][0]["id"]
+                resolve.set(api=len(lookups))
+
+            scrapes = [key for key in pending if key not in found]
+            if scrapes:
+                with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENT_SCRAPES) as pool:
+                    # Each scrape span nests under this one
+                    futures = {
+                        key: pool.submit(contextvars.copy_context().run, scrape_channel_id, _page_url(*pending[key]))
+                        for key in scrapes
+                    }
+                    for key, future in futures.items():
+                        found[key] = future.result()
+                resolve.set(scrape=len(scrapes))
+
+            fresh = {key: channel_id for key, channel_id in found.items() if channel_id and _CHANNEL_ID_RE.match(channel_id)}
+            self.index.put_many({key: channel_id for key, channel_id in fresh.items() if key not in indexed})
+            resolve.set(unresolved=len(pending) - len(fresh))
+
+        for url, (kind, value) in references.items():
+            if kind not in (None, "id"):
+                resolved[url] = fresh.get(f"{kind}:{value}")
+        return resolved
+
+
+channel_resolver = ChannelResolver()
+
+
+def resolve_channel_id(channel_url, youtube=None):
+    return channel_resolver.resolve(channel_url, youtube)
+
+
+def resolve_channel_ids(channel_urls, youtube=None):
+    return channel_resolver.resolve_many(channel_urls, youtube)
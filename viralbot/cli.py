@@ -0,0 +1,232 @@
+# Command line entry point for batch jobs
+#
+#   python -m viralbot score urls.txt -o scored.parquet --api-key KEY
+#   python -m viralbot crawl https://www.youtube.com/@handle -o catalog.parquet
+#   python -m viralbot compare competitors.txt -o channels.csv
+#   python -m viralbot comments VIDEO_URL -o comments/ --replies
+#   python -m viralbot comment-stats VIDEO_URL --max-comments 100000
+#   python -m viralbot trends united_states
+#   python -m viralbot tags --niche gaming
+#   python -m viralbot jobs --resume 12 --api-key KEY
+#
+# Only the standard library is imported up front; each command imports the
+# pieces it needs, so startup doesn't pay for pandas, the API client or
+# Streamlit.
+import argparse
+import os
+import sys
+
+
+def _client(args):
+    from .youtube_api import get_client
+
+    if args.credentials:
+        import google.oauth2.credentials
+
+        credentials = google.oauth2.credentials.Credentials.from_authorized_user_file(args.credentials)
+        return get_client(credentials)
+    if not args.api_key:
+        sys.exit("An API key (--api-key or YOUTUBE_API_KEY) or --credentials is required")
+    return get_client(developer_key=args.api_key)
+
+
+def _read_lines(path):
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    with stream:
+        return [line.strip() for line in stream if line.strip()]
+
+
+def _progress(label):
+    def report(count):
+        print(f"\r{count:,} {label}...", end="", file=sys.stderr, flush=True)
+    return report
+
+
+def _write_failures(failures_df, path):
+    if failures_df.empty:
+        return
+    if path:
+        failures_df.to_csv(path, index=False)
+    print(f"{len(failures_df):,} inputs failed" + (f", see {path}" if path else ""), file=sys.stderr)
+
+
+def score(args):
+    from .analytics import score_videos_bulk
+
+    scored_df, failures_df = score_videos_bulk(_client(args), _read_lines(args.input), k=args.top)
+    scored_df.to_parquet(args.output, index=False)
+    print(f"Scored {len(scored_df):,} videos into {args.output}", file=sys.stderr)
+    _write_failures(failures_df, args.failures)
+
+
+def crawl(args):
+    from .analytics import channel_catalog
+
+    channel_id, catalog_df, failures_df = channel_catalog(
+        _client(args), args.channel_url,
+        max_videos=args.max_videos,
+        output_path=args.output,
+        on_progress=_progress("videos listed")
+    )
+    print(f"\nCrawled {len(catalog_df):,} videos of {channel_id} into {args.output}", file=sys.stderr)
+    _write_failures(failures_df, args.failures)
+
+
+def compare(args):
+    from .analytics import compare_channels
+
+    channels_df, failures_df = compare_channels(_client(args), _read_lines(args.input))
+    channels_df.to_csv(args.output, index=False)
+    print(f"Compared {len(channels_df):,} channels into {args.output}", file=sys.stderr)
+    _write_failures(failures_df, args.failures)
+
+
+def comments(args):
+    from .comments import ingest_comments
+    from .utils import extract_video_id
+
+    video_id = extract_video_id(args.video_url)
+    checkpoint = ingest_comments(
+        _client(args), video_id, args.output,
+        include_replies=args.replies,
+        max_comments=args.max_comments,
+        on_progress=_progress("comments fetched"),
+        refresh=args.refresh
+    )
+    print(f"\nExported {checkpoint['comments_written']:,} comments to {args.output}", file=sys.stderr)
+
+
+def comment_stats(args):
+    from .comment_analytics import analyze_comments
+    from .utils import extract_video_id
+
+    summary = analyze_comments(
+        _client(args), extract_video_id(args.video_url),
+        include_replies=args.replies,
+        max_comments=args.max_comments,
+        on_progress=_progress("comments analyzed")
+    )
+    print(file=sys.stderr)
+    sentiment = summary["sentiment"]
+    print(f"{summary['comments']:,} comments, {summary['duplicates']:,} near-duplicates")
+    if summary["comments"]:
+        print(f"Sentiment {sentiment['mean']:+.3f}: {sentiment['positive']:,} positive, "
+              f"{sentiment['neutral']:,} neutral, {sentiment['negative']:,} negative")
+    for size, top in summary["ngrams"].items():
+        print(f"\nTop {size}-grams:")
+        for gram, count in top[:args.top]:
+            print(f"  {count:>8,}  {gram}")
+    if summary["duplicate_clusters"]:
+        print("\nRepeated comments:")
+        for cluster in summary["duplicate_clusters"][:args.top]:
+            print(f"  {cluster['comments']:>8,}  ({cluster['authors']} authors)  {cluster['text'][:80]}")
+
+
+def trends(args):
+    from .analytics import trending_keywords
+
+    df = trending_keywords(args.country)
+    if args.output:
+        df.to_csv(args.output, index=False)
+    else:
+        print(df.to_string(index=False))
+
+
+def tags(args):
+    from .analytics import related_tags, top_tags, velocity_tags
+
+    if args.related:
+        df = related_tags(args.related, limit=args.limit)
+    elif args.niche or args.category or args.velocity:
+        df = velocity_tags(niche=args.niche, category_id=args.category, min_videos=args.min_videos, limit=args.limit)
+    else:
+        df = top_tags(limit=args.limit, min_videos=args.min_videos)
+    print(df.to_string(index=False))
+
+
+# List background jobs, or cancel one, or resume one in the foreground
+def jobs(args):
+    from .jobs import job_runner
+
+    if args.cancel is not None:
+        job_runner.cancel(args.cancel)
+    if args.resume is not None:
+        if not job_runner.resume(args.resume, _client(args), wait=True):
+            sys.exit(f"Job {args.resume} is not failed, cancelled or interrupted")
+    for job in job_runner.jobs(limit=args.limit):
+        progress = f"{job['progress']:,}" + (f"/{job['total']:,}" if job["total"] else "")
+        print(f"{job['id']:>6}  {job['kind']:<18}{job['status']:<13}{progress:>14}  {job['error'] or job['message'] or ''}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="viralbot", description="YouTube Viral Bot batch jobs")
+    auth = argparse.ArgumentParser(add_help=False)
+    auth.add_argument("--api-key", default=os.environ.get("YOUTUBE_API_KEY"),
+                      help="YouTube Data API key (default: $YOUTUBE_API_KEY)")
+    auth.add_argument("--credentials", help="authorized user JSON file for OAuth access")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("score", parents=[auth], help="fetch and viral-score many videos")
+    command.add_argument("input", help="file with one video URL or ID per line, - for stdin")
+    command.add_argument("-o", "--output", required=True, help="Parquet file to write")
+    command.add_argument("--top", type=int, help="keep only the top N videos")
+    command.add_argument("--failures", help="CSV file for inputs that could not be fetched")
+    command.set_defaults(handler=score)
+
+    command = commands.add_parser("crawl", parents=[auth], help="crawl every upload of a channel")
+    command.add_argument("channel_url")
+    command.add_argument("-o", "--output", required=True, help="Parquet file to write")
+    command.add_argument("--max-videos", type=int)
+    command.add_argument("--failures", help="CSV file for videos that could not be enriched")
+    command.set_defaults(handler=crawl)
+
+    command = commands.add_parser("compare", parents=[auth], help="compare many channels side by side")
+    command.add_argument("input", help="file with one channel URL, handle or ID per line, - for stdin")
+    command.add_argument("-o", "--output", required=True, help="CSV file to write")
+    command.add_argument("--failures", help="CSV file for channels that could not be resolved or fetched")
+    command.set_defaults(handler=compare)
+
+    command = commands.add_parser("comments", parents=[auth], help="export all comments of a video")
+    command.add_argument("video_url")
+    command.add_argument("-o", "--output", required=True, help="directory for Parquet parts (resumable)")
+    command.add_argument("--replies", action="store_true", help="include replies")
+    command.add_argument("--max-comments", type=int)
+    command.add_argument("--refresh", action="store_true", help="export again even if the output holds a finished export")
+    command.set_defaults(handler=comments)
+
+    command = commands.add_parser("comment-stats", parents=[auth], help="keywords, duplicates and sentiment of a video's comments")
+    command.add_argument("video_url")
+    command.add_argument("--replies", action="store_true", help="include replies")
+    command.add_argument("--max-comments", type=int)
+    command.add_argument("--top", type=int, default=15, help="rows to print per section")
+    command.set_defaults(handler=comment_stats)
+
+    command = commands.add_parser("trends", help="trending searches with Google Trends interest")
+    command.add_argument("country", help="e.g. united_states, india")
+    command.add_argument("-o", "--output", help="CSV file to write instead of printing")
+    command.set_defaults(handler=trends)
+
+    command = commands.add_parser("tags", help="query the local tag index built from fetched videos")
+    command.add_argument("--related", metavar="TAG", help="tags that appear together with TAG")
+    command.add_argument("--velocity", action="store_true", help="tags most correlated with views per day")
+    command.add_argument("--niche", metavar="TAG", help="limit --velocity to videos tagged TAG")
+    command.add_argument("--category", help="limit --velocity to a video category ID")
+    command.add_argument("--min-videos", type=int, default=5)
+    command.add_argument("--limit", type=int, default=20)
+    command.set_defaults(handler=tags)
+
+    command = commands.add_parser("jobs", parents=[auth], help="list, cancel or resume background jobs")
+    command.add_argument("--cancel", type=int, metavar="ID")
+    command.add_argument("--resume", type=int, metavar="ID", help="continue from its last checkpoint")
+    command.add_argument("--limit", type=int, default=20)
+    command.set_defaults(handler=jobs)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
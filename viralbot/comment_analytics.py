@@ -0,0 +1,332 @@
+# Streaming comment text analytics
+#
+# CommentAnalyzer consumes comment rows a page at a time (as produced by
+# comments.iter_comment_pages) and keeps only bounded summaries, so a
+# million-comment video costs the same memory as a small one:
+#
+#   terms and n-grams   count-min sketches plus a small candidate set of
+#                       the current heavy hitters
+#   near-duplicates     MinHash signatures of word shingles, bucketed with
+#                       LSH; buckets and signatures are LRU-bounded, which
+#                       suits spam that arrives in bursts
+#   sentiment           lexicon score per comment with simple negation
+#
+# Work is done a page at a time: counts are aggregated with Counter before
+# touching the sketches, and the page's MinHash signatures come out of one
+# numpy pass over all of its shingles.
+import math
+import re
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from .comments import iter_comment_pages
+
+SKETCH_WIDTH = 1 << 16
+SKETCH_DEPTH = 4
+TOP_K = 50
+NGRAM_SIZES = (1, 2, 3)
+NUM_PERM = 64
+LSH_BANDS = 8
+DUPLICATE_THRESHOLD = 0.8
+SHINGLE_SIZE = 3
+# Shorter comments ("first", "nice video") are too generic to call duplicates
+MIN_DUPLICATE_TOKENS = 5
+MAX_SIGNATURES = 20_000
+MAX_CLUSTERS = 10_000
+MAX_CLUSTER_AUTHORS = 100
+SENTIMENT_NEUTRAL = 0.05
+
+_PRIME = (1 << 31) - 1
+_HASH_MASK = (1 << 32) - 1
+_TOKEN_RE = re.compile(r"[^\W_]+(?:'[^\W_]+)?|[\u2600-\u27bf\U0001f300-\U0001faff]")
+
+STOPWORDS = frozenset("""
+a an the and or but if then so of to in on at by for with from as is are was were be been being am
+i me my we our you your he him his she her it its they them their this that these those there here
+do does did doing have has had having not no just very too can will would should could what which who
+whom when where why how all any both each more most other some such only own same than s t don
+about into over after before again out up down off im ive its thats
+""".split())
+
+NEGATORS = frozenset(["not", "no", "never", "dont", "don't", "isnt", "isn't", "cant", "can't",
+                      "wasnt", "wasn't", "doesnt", "doesn't", "didnt", "didn't", "aint", "ain't"])
+NEGATION_WINDOW = 3
+
+# Small valence lexicon (-3..3) tuned for video comments
+SENTIMENT_LEXICON = {
+    "love": 3, "loved": 3, "loving": 3, "amazing": 3, "awesome": 3, "incredible": 3, "masterpiece": 3,
+    "best": 3, "excellent": 3, "fantastic": 3, "perfect": 3, "brilliant": 3, "legend": 3, "goat": 2,
+    "great": 2, "good": 2, "nice": 2, "beautiful": 2, "cool": 2, "funny": 2, "helpful": 2, "useful": 2,
+    "enjoyed": 2, "enjoy": 2, "thanks": 2, "thank": 2, "wow": 2, "fire": 2, "underrated": 1, "like": 1,
+    "liked": 1, "interesting": 1, "fun": 2, "happy": 2, "glad": 2, "recommend": 2, "wholesome": 2,
+    "hate": -3, "hated": -3, "terrible": -3, "awful": -3, "worst": -3, "garbage": -3, "trash": -3,
+    "disgusting": -3, "scam": -3, "bad": -2, "boring": -2, "stupid": -2, "annoying": -2, "cringe": -2,
+    "sad": -2, "fake": -2, "clickbait": -2, "waste": -2, "useless": -2, "wrong": -2, "dislike": -2,
+    "disappointed": -2, "disappointing": -2, "misleading": -2, "overrated": -1, "meh": -1, "confusing": -1,
+    "\u2764": 3, "\U0001f60d": 3, "\U0001f525": 2, "\U0001f44d": 2, "\U0001f602": 1, "\U0001f44f": 2,
+    "\U0001f621": -3, "\U0001f44e": -2, "\U0001f622": -1, "\U0001f92e": -3,
+}
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+# 32-bit key hashes. hash() is salted per process, which is fine for
+# sketches that live in memory for one stream.
+def _hashes(keys):
+    return np.fromiter((hash(key) & _HASH_MASK for key in keys), dtype=np.uint64, count=len(keys))
+
+
+def _hash_family(count, seed):
+    rng = np.random.default_rng(seed)
+    return rng.integers(1, _PRIME, count, dtype=np.uint64), rng.integers(0, _PRIME, count, dtype=np.uint64)
+
+
+class CountMinSketch:
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH, seed=0):
+        self.width = width
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self._a, self._b = _hash_family(depth, seed)
+
+    def _columns(self, keys):
+        hashes = _hashes(keys)
+        return (self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME % self.width
+
+    # Add counts and return the keys' updated estimates
+    def add(self, keys, counts):
+        columns = self._columns(keys)
+        counts = np.asarray(counts, dtype=np.int64)
+        for row in range(len(self.table)):
+            np.add.at(self.table[row], columns[row], counts)
+        return self._estimate(columns)
+
+    def estimate(self, keys):
+        return self._estimate(self._columns(keys))
+
+    def _estimate(self, columns):
+        return self.table[np.arange(len(self.table))[:, None], columns].min(axis=0)
+
+
+class HeavyHitters:
+    # Top-K keys over a stream: a count-min sketch holds every count, and
+    # only keys whose estimate beats the current K-th best are tracked
+
+    def __init__(self, k=TOP_K, width=SKETCH_WIDTH, depth=SKETCH_DEPTH, seed=0):
+        self.k = k
+        self.total = 0
+        self.sketch = CountMinSketch(width, depth, seed)
+        self._candidates = {}
+        self._floor = 0
+
+    def update(self, counts):
+        if not counts:
+            return
+        keys = list(counts)
+        estimates = self.sketch.add(keys, [counts[key] for key in keys])
+        self.total += sum(counts.values())
+        for key, estimate in zip(keys, estimates.tolist()):
+            if key in self._candidates or estimate > self._floor:
+                self._candidates[key] = estimate
+        if len(self._candidates) > 2 * self.k:
+            kept = sorted(self._candidates.items(), key=lambda item: -item[1])[:self.k]
+            self._candidates = dict(kept)
+            self._floor = kept[-1][1]
+
+    # [(key, estimated count), ...], most frequent first
+    def top(self, n=None):
+        return sorted(self._candidates.items(), key=lambda item: -item[1])[:n or self.k]
+
+
+class NearDuplicateDetector:
+    # MinHash + LSH over word shingles. add_rows() returns, per comment, the
+    # cluster it joins (the ID of the first comment like it) or None.
+
+    def __init__(self, num_perm=NUM_PERM, bands=LSH_BANDS, threshold=DUPLICATE_THRESHOLD,
+                 shingle_size=SHINGLE_SIZE, min_tokens=MIN_DUPLICATE_TOKENS,
+                 max_signatures=MAX_SIGNATURES, max_clusters=MAX_CLUSTERS, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.bands = bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.min_tokens = min_tokens
+        self.max_signatures = max_signatures
+        self.max_clusters = max_clusters
+        self.duplicates = 0
+        self._a, self._b = _hash_family(num_perm, seed)
+        self._band_mix = _hash_family(num_perm // bands, seed + 1)[0]
+        self._band_salt = _hash_family(bands, seed + 2)[0]
+        self._signatures = OrderedDict()  # first comment ID -> signature
+        self._buckets = OrderedDict()     # band key -> first comment ID
+        self.clusters = {}                # first comment ID -> {"text", "comments", "authors"}
+
+    # One signature row per token list (each must have at least one token)
+    def signatures(self, token_lists):
+        hashes, sizes = [], []
+        for tokens in token_lists:
+            size = min(self.shingle_size, len(tokens))
+            shingles = {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+            hashes.extend(shingles)
+            sizes.append(len(shingles))
+        values = (_hashes(hashes)[:, None] * self._a[None, :] + self._b[None, :]) % _PRIME
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        return np.minimum.reduceat(values, starts, axis=0).astype(np.uint32)
+
+    # One integer key per LSH band, salted by band so bands never collide
+    def band_keys(self, signatures):
+        bands = signatures.astype(np.uint64).reshape(len(signatures), self.bands, -1)
+        return ((bands * self._band_mix).sum(axis=2) + self._band_salt).tolist()
+
+    def add_rows(self, comment_ids, token_lists, texts, authors):
+        results = [None] * len(comment_ids)
+        eligible = [i for i, tokens in enumerate(token_lists) if len(tokens) >= self.min_tokens]
+        if not eligible:
+            return results
+        signatures = self.signatures([token_lists[i] for i in eligible])
+        for i, signature, keys in zip(eligible, signatures, self.band_keys(signatures)):
+            results[i] = self._add(comment_ids[i], signature, keys, texts[i], authors[i])
+        return results
+
+    def _add(self, comment_id, signature, keys, text, author):
+        for key in keys:
+            first_id = self._buckets.get(key)
+            candidate = self._signatures.get(first_id)
+            if candidate is not None and np.mean(candidate == signature) >= self.threshold:
+                self._signatures.move_to_end(first_id)
+                # Point this variant's bands at the cluster too, which also
+                # keeps an active cluster's buckets from aging out
+                self._remember(keys, first_id)
+                self._join(first_id, text, author)
+                return first_id
+
+        self._signatures[comment_id] = signature.copy()
+        self._remember(keys, comment_id)
+        while len(self._signatures) > self.max_signatures:
+            self._signatures.popitem(last=False)
+        return None
+
+    def _remember(self, keys, first_id):
+        for key in keys:
+            self._buckets[key] = first_id
+            self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_signatures * self.bands:
+            self._buckets.popitem(last=False)
+
+    def _join(self, first_id, text, author):
+        self.duplicates += 1
+        cluster = self.clusters.get(first_id)
+        if cluster is None:
+            # The first comment of the cluster counts too
+            cluster = self.clusters[first_id] = {"text": text, "comments": 1, "authors": set()}
+            self.duplicates += 1
+        cluster["comments"] += 1
+        if author and len(cluster["authors"]) < MAX_CLUSTER_AUTHORS:
+            cluster["authors"].add(author)
+        if len(self.clusters) > self.max_clusters:
+            smallest = sorted(self.clusters, key=lambda key: self.clusters[key]["comments"])
+            for key in smallest[:len(self.clusters) - self.max_clusters // 2]:
+                del self.clusters[key]
+
+    def top_clusters(self, n=20):
+        clusters = sorted(self.clusters.items(), key=lambda item: -item[1]["comments"])[:n]
+        return [{
+            "first_comment_id": first_id,
+            "text": cluster["text"],
+            "comments": cluster["comments"],
+            "authors": len(cluster["authors"]),
+        } for first_id, cluster in clusters]
+
+
+# Lexicon score squashed into [-1, 1]; negators flip the next few words
+def sentiment_score(tokens):
+    total, negate_until = 0.0, -1
+    for position, token in enumerate(tokens):
+        if token in NEGATORS:
+            negate_until = position + NEGATION_WINDOW
+            continue
+        valence = SENTIMENT_LEXICON.get(token)
+        if valence:
+            total += -valence if position <= negate_until else valence
+    return total / math.sqrt(total * total + 15)
+
+
+def _ngrams(tokens, size):
+    if size == 1:
+        return [token for token in tokens if token not in STOPWORDS and len(token) > 1]
+    # Drop n-grams that start or end on a stopword ("of the", "is a")
+    return [
+        " ".join(gram) for gram in zip(*(tokens[i:] for i in range(size)))
+        if gram[0] not in STOPWORDS and gram[-1] not in STOPWORDS
+    ]
+
+
+class CommentAnalyzer:
+    def __init__(self, top_k=TOP_K, ngram_sizes=NGRAM_SIZES, detector=None):
+        self.comments = 0
+        self.tokens = 0
+        self.ngrams = {size: HeavyHitters(top_k, seed=size) for size in ngram_sizes}
+        self.detector = detector or NearDuplicateDetector()
+        self.sentiment_total = 0.0
+        self.sentiment_counts = Counter()
+
+    # Analyze one page of comment rows. Returns a list of per-row
+    # annotations: {"sentiment": score, "duplicate_of": comment ID or None}.
+    def add_rows(self, rows):
+        counts = {size: Counter() for size in self.ngrams}
+        token_lists, scores = [], []
+        for row in rows:
+            tokens = tokenize(row.get("text"))
+            token_lists.append(tokens)
+            self.comments += 1
+            self.tokens += len(tokens)
+            for size, counter in counts.items():
+                counter.update(_ngrams(tokens, size))
+
+            score = sentiment_score(tokens)
+            self.sentiment_total += score
+            self.sentiment_counts[
+                "positive" if score > SENTIMENT_NEUTRAL else "negative" if score < -SENTIMENT_NEUTRAL else "neutral"
+            ] += 1
+            scores.append(score)
+
+        for size, counter in counts.items():
+            self.ngrams[size].update(counter)
+        duplicates = self.detector.add_rows(
+            [row.get("comment_id") for row in rows], token_lists,
+            [row.get("text") for row in rows],
+            [row.get("author_channel_id") or row.get("author") for row in rows],
+        )
+        return [{"sentiment": score, "duplicate_of": duplicate_of} for score, duplicate_of in zip(scores, duplicates)]
+
+    def summary(self, top_n=TOP_K):
+        return {
+            "comments": self.comments,
+            "tokens": self.tokens,
+            "ngrams": {size: hitters.top(top_n) for size, hitters in self.ngrams.items()},
+            "duplicates": self.detector.duplicates,
+            "duplicate_clusters": self.detector.top_clusters(),
+            "sentiment": {
+                "mean": self.sentiment_total / self.comments if self.comments else None,
+                **{label: self.sentiment_counts[label] for label in ("positive", "neutral", "negative")},
+            },
+        }
+
+
+# Analyze a video's comments as the pages arrive. Only the analyzer's
+# bounded state is kept; on_progress(count) is called after every page.
+def analyze_comments(youtube, video_id, include_replies=False, max_comments=None,
+                     since=None, time_budget=None, analyzer=None, on_progress=None):
+    analyzer = analyzer or CommentAnalyzer()
+    for rows, _ in iter_comment_pages(
+        youtube, video_id,
+        include_replies=include_replies,
+        max_comments=max_comments,
+        since=since,
+        time_budget=time_budget,
+    ):
+        analyzer.add_rows(rows)
+        if on_progress:
+            on_progress(analyzer.comments)
+    return analyzer.summary()
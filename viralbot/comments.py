@@ -0,0 +1,244 @@
+# Paginated comment ingestion
+#
+# Comment threads are streamed a page (100 threads) at a time. Callers can
+# stop early by count, date or time budget, and ingest_comments writes pages
+# to Parquet part files as it goes, checkpointing the next page token so an
+# interrupted run resumes where it stopped. The checkpoint records the
+# export's parameters, so asking for a different export, or a refresh of a
+# finished one, starts over instead.
+import datetime
+import glob
+import json
+import os
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .youtube_api import execute_request
+
+COMMENT_PAGE_SIZE = 100
+# Rows buffered before a Parquet part file is written
+ROWS_PER_FILE = 10_000
+CHECKPOINT_FILE = "_checkpoint.json"
+
+COMMENT_SCHEMA = pa.schema([
+    ("comment_id", pa.string()),
+    ("thread_id", pa.string()),
+    ("parent_id", pa.string()),
+    ("video_id", pa.string()),
+    ("author", pa.string()),
+    ("author_channel_id", pa.string()),
+    ("text", pa.string()),
+    ("like_count", pa.int64()),
+    ("reply_count", pa.int64()),
+    ("published_at", pa.timestamp("s", tz="UTC")),
+    ("updated_at", pa.timestamp("s", tz="UTC")),
+])
+
+
+def parse_timestamp(value):
+    if not value:
+        return None
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+# Comment timestamps are UTC-aware, so `since` is made comparable with them:
+# naive datetimes (and ISO strings without an offset) are taken as UTC, and
+# a date as its midnight UTC
+def to_utc(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = parse_timestamp(value)
+    elif not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    if value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(datetime.timezone.utc)
+
+
+def _comment_row(comment, video_id, thread_id, reply_count=None):
+    snippet = comment["snippet"]
+    return {
+        "comment_id": comment["id"],
+        "thread_id": thread_id,
+        "parent_id": snippet.get("parentId"),
+        "video_id": video_id,
+        "author": snippet.get("authorDisplayName"),
+        "author_channel_id": (snippet.get("authorChannelId") or {}).get("value"),
+        "text": snippet.get("textDisplay"),
+        "like_count": snippet.get("likeCount"),
+        "reply_count": reply_count,
+        "published_at": parse_timestamp(snippet.get("publishedAt")),
+        "updated_at": parse_timestamp(snippet.get("updatedAt")),
+    }
+
+
+# All replies to one thread, following pagination
+def iter_replies(youtube, thread_id, video_id):
+    page_token = None
+    while True:
+        kwargs = {"part": "snippet", "parentId": thread_id, "maxResults": COMMENT_PAGE_SIZE, "textFormat": "plainText"}
+        if page_token:
+            kwargs["pageToken"] = page_token
+        response = execute_request(youtube.comments().list, **kwargs)
+        for reply in response.get("items", []):
+            yield _comment_row(reply, video_id, thread_id)
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return
+
+
+# Yield (rows, next_page_token) per commentThreads page. Threads come newest
+# first, so `since` stops the stream at the first older top-level comment.
+# `time_budget` (seconds) is checked before each page is requested.
+def iter_comment_pages(youtube, video_id, include_replies=False, max_comments=None,
+                       since=None, time_budget=None, page_token=None):
+    since = to_utc(since)
+    deadline = time.monotonic() + time_budget if time_budget else None
+    remaining = max_comments
+    while True:
+        if deadline is not None and time.monotonic() > deadline:
+            return
+        kwargs = {
+            "part": "snippet,replies" if include_replies else "snippet",
+            "videoId": video_id,
+            "maxResults": COMMENT_PAGE_SIZE,
+            "order": "time",
+            "textFormat": "plainText",
+        }
+        if page_token:
+            kwargs["pageToken"] = page_token
+        response = execute_request(youtube.commentThreads().list, **kwargs)
+
+        rows, reached_since = [], False
+        for thread in response.get("items", []):
+            reply_count = thread["snippet"].get("totalReplyCount", 0)
+            row = _comment_row(thread["snippet"]["topLevelComment"], video_id, thread["id"], reply_count)
+            if since is not None and row["published_at"] < since:
+                reached_since = True
+                break
+            rows.append(row)
+            if include_replies and reply_count:
+                # Threads only embed a few replies; page the rest when needed
+                inline = thread.get("replies", {}).get("comments", [])
+                if len(inline) >= reply_count:
+                    rows.extend(_comment_row(reply, video_id, thread["id"]) for reply in inline)
+                else:
+                    rows.extend(iter_replies(youtube, thread["id"], video_id))
+
+        if remaining is not None:
+            rows = rows[:remaining]
+            remaining -= len(rows)
+
+        page_token = response.get("nextPageToken")
+        if reached_since or remaining == 0:
+            page_token = None
+        yield rows, page_token
+        if not page_token:
+            return
+
+
+def iter_comments(youtube, video_id, **kwargs):
+    for rows, _ in iter_comment_pages(youtube, video_id, **kwargs):
+        yield from rows
+
+
+def load_checkpoint(output_dir):
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_checkpoint(output_dir, checkpoint):
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(path + ".tmp", path)
+
+
+# Remove a previous export's part files and checkpoint
+def _clear_export(output_dir):
+    for path in glob.glob(os.path.join(output_dir, "part-*.parquet")):
+        os.remove(path)
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+# Stream every comment of a video into output_dir as Parquet part files.
+# Memory stays bounded by rows_per_file; rerunning with the same parameters
+# after an interruption continues from the last checkpointed page token.
+# A finished export is returned as is unless refresh is set, which exports
+# the comments again; different parameters always start a new export.
+def ingest_comments(youtube, video_id, output_dir, include_replies=False, max_comments=None,
+                    since=None, time_budget=None, rows_per_file=ROWS_PER_FILE, on_progress=None, refresh=False):
+    os.makedirs(output_dir, exist_ok=True)
+    since = to_utc(since)
+    params = {
+        "include_replies": include_replies,
+        "max_comments": max_comments,
+        "since": since.isoformat() if since is not None else None,
+    }
+    checkpoint = load_checkpoint(output_dir)
+    if checkpoint is not None:
+        if checkpoint["video_id"] != video_id:
+            raise ValueError(f"{output_dir} holds comments for video {checkpoint['video_id']}")
+        if checkpoint.get("params") != params or (refresh and checkpoint["done"]):
+            _clear_export(output_dir)
+            checkpoint = None
+    if checkpoint is None:
+        checkpoint = {
+            "video_id": video_id,
+            "params": params,
+            "next_page_token": None,
+            "comments_written": 0,
+            "files": 0,
+            "done": False,
+        }
+    if checkpoint["done"]:
+        return checkpoint
+
+    if max_comments is not None:
+        max_comments = max(max_comments - checkpoint["comments_written"], 0)
+        if max_comments == 0:
+            checkpoint["done"] = True
+            _save_checkpoint(output_dir, checkpoint)
+            return checkpoint
+
+    buffer = []
+
+    def flush(next_page_token):
+        if buffer:
+            table = pa.Table.from_pylist(buffer, schema=COMMENT_SCHEMA)
+            pq.write_table(table, os.path.join(output_dir, f"part-{checkpoint['files']:05d}.parquet"))
+            checkpoint["files"] += 1
+            checkpoint["comments_written"] += len(buffer)
+            buffer.clear()
+        checkpoint["next_page_token"] = next_page_token
+        _save_checkpoint(output_dir, checkpoint)
+
+    pages = iter_comment_pages(
+        youtube, video_id,
+        include_replies=include_replies,
+        max_comments=max_comments,
+        since=since,
+        time_budget=time_budget,
+        page_token=checkpoint["next_page_token"],
+    )
+    next_page_token = checkpoint["next_page_token"]
+    for rows, next_page_token in pages:
+        buffer.extend(rows)
+        # Only flush on page boundaries so the checkpoint always matches disk
+        if len(buffer) >= rows_per_file:
+            flush(next_page_token)
+        if next_page_token is None:
+            checkpoint["done"] = True
+        if on_progress:
+            on_progress(checkpoint["comments_written"] + len(buffer))
+
+    flush(next_page_token)
+    return checkpoint
@@ -0,0 +1,301 @@
+# Shared OAuth credentials with proactive refresh
+#
+# Every signed-in browser gets an opaque handle. The manager keeps one live
+# Credentials object per handle, shared by all reruns and by the pooled
+# transports of its YouTube client, so a refresh updates the token everyone
+# uses. A background thread refreshes tokens shortly before they expire,
+# and each object serializes its own refreshes: callers that find a refresh
+# in flight wait for it instead of hitting the token endpoint again.
+# Handles nobody has used for a while are dropped from memory rather than
+# refreshed, together with the cached client built on them, so the next
+# get() restores one object from disk that the new client shares.
+#
+# Refresh tokens are persisted Fernet-encrypted, one 0600 file per handle
+# (named by the handle's hash, so the files alone don't reveal handles), so
+# sessions survive a server restart. The key comes from
+# VIRALBOT_CREDENTIALS_KEY or a generated 0600 key file in the data
+# directory.
+import datetime
+import hashlib
+import json
+import os
+import secrets
+import threading
+import time
+
+import google.auth.exceptions
+import google.auth.transport.requests
+import google.oauth2.credentials
+from cryptography.fernet import Fernet, InvalidToken
+
+from .utils import data_path
+from .youtube_api import client_registry
+
+# Refresh this long before expiry, checking this often
+REFRESH_MARGIN = 5 * 60
+CHECK_INTERVAL = 60
+# Live credentials unused for this long are let go
+IDLE_TIMEOUT = 60 * 60
+# Persisted fields; access tokens are short-lived and never written to disk
+PERSISTED_FIELDS = ("refresh_token", "client_id", "client_secret", "token_uri", "scopes")
+
+
+def _utcnow():
+    # google-auth keeps expiry as a naive UTC datetime
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def handle_id(handle):
+    return hashlib.sha256(handle.encode("utf-8")).hexdigest()
+
+
+class ManagedCredentials(google.oauth2.credentials.Credentials):
+    # Credentials whose refreshes are serialized. A caller that waited for
+    # another refresh finds a fresh token and returns without a round trip.
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._refresh_lock = threading.Lock()
+        self.refreshes = 0
+
+    def expires_within(self, seconds):
+        if not self.token:
+            return True
+        if self.expiry is None:
+            return False
+        return self.expiry - _utcnow() <= datetime.timedelta(seconds=seconds)
+
+    # Refresh unless the token is valid for at least `margin` more seconds
+    def refresh(self, request, margin=0):
+        with self._refresh_lock:
+            if self.valid and not self.expires_within(margin):
+                return
+            super().refresh(request)
+            self.refreshes += 1
+
+    # The lock can't be pickled or deep-copied; copies get their own
+    def __getstate__(self):
+        state = super().__getstate__()
+        state.pop("_refresh_lock", None)
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self._refresh_lock = threading.Lock()
+        self.refreshes = state.get("refreshes", 0)
+
+    @classmethod
+    def from_info(cls, info):
+        expiry = info.get("expiry")
+        if isinstance(expiry, str):
+            expiry = datetime.datetime.fromisoformat(expiry.rstrip("Z"))
+        return cls(
+            token=info.get("token"),
+            refresh_token=info.get("refresh_token"),
+            token_uri=info.get("token_uri"),
+            client_id=info.get("client_id"),
+            client_secret=info.get("client_secret"),
+            scopes=info.get("scopes"),
+            expiry=expiry,
+        )
+
+
+# Credentials (object or dict form) as a plain dict
+def to_info(credentials):
+    if isinstance(credentials, dict):
+        return dict(credentials)
+    return json.loads(credentials.to_json())
+
+
+class CredentialStore:
+    # Encrypted refresh tokens on disk, one file per handle
+
+    def __init__(self, directory=None, key=None):
+        self._directory = directory
+        self._key = key or os.environ.get("VIRALBOT_CREDENTIALS_KEY")
+        self._fernet = None
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self):
+        if self._directory is None:
+            self._directory = data_path("credentials")
+        os.makedirs(self._directory, mode=0o700, exist_ok=True)
+        return self._directory
+
+    @property
+    def fernet(self):
+        # The key is read or generated on first use so importing the module
+        # never touches the disk
+        with self._lock:
+            if self._fernet is None:
+                self._fernet = Fernet(self._key or self._load_key())
+            return self._fernet
+
+    def _load_key(self):
+        path = data_path("credentials.key")
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            with open(path, "rb") as f:
+                return f.read().strip()
+        key = Fernet.generate_key()
+        with os.fdopen(fd, "wb") as f:
+            f.write(key)
+        return key
+
+    def _path(self, handle):
+        return os.path.join(self.directory, handle_id(handle) + ".bin")
+
+    def save(self, handle, info):
+        payload = {field: info.get(field) for field in PERSISTED_FIELDS}
+        token = self.fernet.encrypt(json.dumps(payload).encode("utf-8"))
+        path = self._path(handle)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(token)
+        os.replace(tmp, path)
+
+    def load(self, handle):
+        try:
+            with open(self._path(handle), "rb") as f:
+                return json.loads(self.fernet.decrypt(f.read()))
+        except (FileNotFoundError, InvalidToken):
+            # Unknown handle, or a file written under another key
+            return None
+
+    def delete(self, handle):
+        try:
+            os.remove(self._path(handle))
+        except FileNotFoundError:
+            pass
+
+
+class CredentialManager:
+    def __init__(self, store=None, refresh_margin=REFRESH_MARGIN, check_interval=CHECK_INTERVAL,
+                 idle_timeout=IDLE_TIMEOUT):
+        self.store = store or CredentialStore()
+        self.refresh_margin = refresh_margin
+        self.check_interval = check_interval
+        self.idle_timeout = idle_timeout
+        self.failures = 0
+        self.last_error = None
+        self._live = {}  # handle_id -> (handle, ManagedCredentials)
+        self._last_used = {}  # handle_id -> monotonic time of the last get()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    # Take over credentials from a fresh sign-in (a Credentials object or
+    # its dict form). Returns the handle for the browser to keep.
+    def register(self, credentials):
+        handle = secrets.token_urlsafe(32)
+        info = to_info(credentials)
+        managed = ManagedCredentials.from_info(info)
+        if info.get("refresh_token"):
+            self.store.save(handle, info)
+        with self._lock:
+            self._live[handle_id(handle)] = (handle, managed)
+            self._last_used[handle_id(handle)] = time.monotonic()
+        self._ensure_refresher()
+        return handle
+
+    # The live credentials for a handle, restored from disk after a restart.
+    # None when the handle is unknown or was revoked.
+    def get(self, handle):
+        key = handle_id(handle)
+        with self._lock:
+            entry = self._live.get(key)
+            if entry is not None:
+                self._last_used[key] = time.monotonic()
+                return entry[1]
+        info = self.store.load(handle)
+        if info is None:
+            return None
+        managed = ManagedCredentials.from_info(info)
+        with self._lock:
+            # Another rerun may have restored it while we read the file
+            _, managed = self._live.setdefault(key, (handle, managed))
+            self._last_used[key] = time.monotonic()
+        self._ensure_refresher()
+        return managed
+
+    def forget(self, handle):
+        self._release(handle_id(handle))
+        self.store.delete(handle)
+
+    # Drop a live entry and the client whose transports hold its object,
+    # unless it has been used since idle_before
+    def _release(self, key, idle_before=None):
+        with self._lock:
+            if idle_before is not None and self._last_used.get(key, 0) >= idle_before:
+                return
+            entry = self._live.pop(key, None)
+            self._last_used.pop(key, None)
+        if entry is not None:
+            client_registry.evict(entry[1])
+
+    # Refresh every token expiring within the margin. Credentials whose
+    # refresh token was revoked are dropped, and idle ones are let go
+    # (their files stay on disk).
+    def refresh_due(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            idle = [key for key, last_used in self._last_used.items() if last_used < cutoff]
+        for key in idle:
+            self._release(key, idle_before=cutoff)
+        with self._lock:
+            entries = list(self._live.values())
+        request = google.auth.transport.requests.Request()
+        for handle, credentials in entries:
+            if not credentials.refresh_token or not credentials.expires_within(self.refresh_margin):
+                continue
+            old_refresh_token = credentials.refresh_token
+            try:
+                credentials.refresh(request, margin=self.refresh_margin)
+            except google.auth.exceptions.RefreshError as e:
+                self.failures += 1
+                self.last_error = str(e)
+                self.forget(handle)
+                continue
+            except google.auth.exceptions.TransportError as e:
+                # Try again on the next pass
+                self.failures += 1
+                self.last_error = str(e)
+                continue
+            if credentials.refresh_token != old_refresh_token:
+                self.store.save(handle, to_info(credentials))
+
+    def _ensure_refresher(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="credential-refresher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.refresh_due()
+            except Exception as e:
+                self.last_error = str(e)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self):
+        with self._lock:
+            live = [credentials for _, credentials in self._live.values()]
+        return {
+            "live": len(live),
+            "refreshes": sum(credentials.refreshes for credentials in live),
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+credential_manager = CredentialManager()
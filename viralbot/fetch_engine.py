@@ -0,0 +1,130 @@
+# Concurrent fetch engine for YouTube Data API calls
+#
+# execute_request runs one call at a time on the caller's thread. The engine
+# fans a list of calls out over a bounded thread pool (googleapiclient is
+# synchronous) and hands results back in the order the calls were given,
+# with a per-request deadline measured from when each call actually starts.
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+import time
+
+from .resilience import DeadlineExceeded
+from .youtube_api import execute_request
+
+MAX_CONCURRENCY = 8
+# Seconds a single call may run once a worker has picked it up
+REQUEST_DEADLINE = 30
+
+
+class FetchResult:
+    def __init__(self, value=None, error=None, elapsed=0.0):
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return f"FetchResult(ok={self.ok}, elapsed={self.elapsed:.3f})"
+
+
+class _Call:
+    def __init__(self, client_library_function, kwargs):
+        self.client_library_function = client_library_function
+        self.kwargs = kwargs
+        self.started = threading.Event()
+        self.started_at = None
+
+    def run(self):
+        self.started_at = time.monotonic()
+        self.started.set()
+        return execute_request(self.client_library_function, **self.kwargs)
+
+
+class PendingFetch:
+    def __init__(self, collect):
+        self._collect = collect
+        self._result = None
+
+    def result(self):
+        if self._result is None:
+            self._result = self._collect()
+        return self._result
+
+
+class FetchEngine:
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, deadline=REQUEST_DEADLINE):
+        self.max_concurrency = max_concurrency
+        self.deadline = deadline
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="youtube-fetch"
+        )
+
+    def _submit(self, call):
+        # Workers see the caller's context variables (user, trace, ...)
+        context = contextvars.copy_context()
+        return self._executor.submit(context.run, call.run)
+
+    def _collect(self, call, future, deadline):
+        # Time spent queued behind other calls doesn't count against the deadline
+        while not call.started.wait(0.05):
+            if future.done():
+                break
+        try:
+            remaining = deadline
+            if call.started_at is not None:
+                remaining = call.started_at + deadline - time.monotonic()
+            value = future.result(timeout=max(remaining, 0))
+            return FetchResult(value, elapsed=time.monotonic() - call.started_at)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            return FetchResult(error=DeadlineExceeded(f"Request exceeded its {deadline}s deadline"), elapsed=deadline)
+        except Exception as e:
+            elapsed = time.monotonic() - call.started_at if call.started_at else 0.0
+            return FetchResult(error=e, elapsed=elapsed)
+
+    # Start one call in the background; .result() returns its FetchResult
+    def submit(self, client_library_function, deadline=None, **kwargs):
+        deadline = deadline or self.deadline
+        call = _Call(client_library_function, kwargs)
+        future = self._submit(call)
+        return PendingFetch(lambda: self._collect(call, future, deadline))
+
+    # Run (client_library_function, kwargs) pairs concurrently. Returns one
+    # FetchResult per call, in input order; failures never raise.
+    def map(self, calls, deadline=None):
+        pending = [self.submit(fn, deadline, **kwargs) for fn, kwargs in calls]
+        return [fetch.result() for fetch in pending]
+
+    # asyncio flavour of map for callers that already run an event loop
+    async def gather(self, calls, deadline=None):
+        deadline = deadline or self.deadline
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(fn, kwargs):
+            async with semaphore:
+                started = time.monotonic()
+                future = asyncio.wrap_future(self._submit(_Call(fn, kwargs)))
+                try:
+                    value = await asyncio.wait_for(future, deadline)
+                    return FetchResult(value, elapsed=time.monotonic() - started)
+                except asyncio.TimeoutError:
+                    return FetchResult(error=DeadlineExceeded(f"Request exceeded its {deadline}s deadline"), elapsed=deadline)
+                except Exception as e:
+                    return FetchResult(error=e, elapsed=time.monotonic() - started)
+
+        return await asyncio.gather(*(run(fn, kwargs) for fn, kwargs in calls))
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+fetch_engine = FetchEngine()
+
+
+def fetch_all(calls, deadline=None):
+    return fetch_engine.map(calls, deadline=deadline)
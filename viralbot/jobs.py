@@ -0,0 +1,386 @@
+# Background jobs with progress, checkpoints and resume
+#
+# Long crawls run on a small pool of local worker threads instead of the
+# Streamlit script thread. Each job is a row in SQLite holding its kind,
+# parameters, status, progress and last checkpoint (a page token or
+# cursor), so any rerun or session can poll it, and an interrupted job
+# continues from its last checkpoint when resumed. Cancelling is
+# cooperative: handlers notice it whenever they report progress. Jobs
+# never leave this machine; there is no broker.
+import glob
+import json
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .catalog import CATALOG_COLUMNS, get_uploads_playlist_id, iter_catalog_pages
+from .comments import ingest_comments
+from .quota import LOW, quota_priority
+from .utils import data_path
+from .velocity import snapshot_collector
+from .video_batch import FAILURE_COLUMNS, to_frame
+
+JOB_WORKERS = int(os.environ.get("VIRALBOT_JOB_WORKERS", "2"))
+# How often a running job looks for a cancel made by another process
+CANCEL_POLL_INTERVAL = 2.0
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED, INTERRUPTED = (
+    "queued", "running", "done", "failed", "cancelled", "interrupted"
+)
+ACTIVE = (QUEUED, RUNNING)
+RESUMABLE = (FAILED, CANCELLED, INTERRUPTED)
+JSON_FIELDS = ("params", "checkpoint", "result")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobContext:
+    # Handed to a job handler: its parameters, last checkpoint and the
+    # means to report progress. Reporting raises JobCancelled once the job
+    # has been cancelled.
+
+    def __init__(self, runner, job):
+        self.runner = runner
+        self.job_id = job["id"]
+        self.params = job["params"]
+        self.checkpoint = job["checkpoint"]
+        self._cancel = threading.Event()
+        self._polled = time.monotonic()
+
+    @property
+    def cancelled(self):
+        if not self._cancel.is_set() and time.monotonic() - self._polled >= CANCEL_POLL_INTERVAL:
+            self._polled = time.monotonic()
+            if self.runner._cancel_requested(self.job_id):
+                self._cancel.set()
+        return self._cancel.is_set()
+
+    def check(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+    def progress(self, done, total=None, message=None):
+        self.runner._update(self.job_id, progress=done, total=total, message=message)
+        self.check()
+
+    # Persist the point to resume from; call it once the work before it is
+    # safely written
+    def save(self, checkpoint, done=None, total=None, message=None):
+        self.checkpoint = checkpoint
+        self.runner._update(self.job_id, checkpoint=checkpoint, progress=done, total=total, message=message)
+        self.check()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobRunner:
+    def __init__(self, path=None, workers=JOB_WORKERS, handlers=None):
+        self.workers = workers
+        self.handlers = handlers if handlers is not None else JOB_HANDLERS
+        self._path = path
+        self._db = None
+        self._token = secrets.token_hex(8)
+        self._queue = queue.Queue()
+        self._clients = {}   # job id -> client for queued jobs
+        self._running = {}   # job id -> JobContext
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self._path or data_path("jobs.sqlite3"), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, owner TEXT, params TEXT NOT NULL,"
+                " status TEXT NOT NULL, progress INTEGER NOT NULL DEFAULT 0, total INTEGER, message TEXT,"
+                " checkpoint TEXT, result TEXT, error TEXT, cancel_requested INTEGER NOT NULL DEFAULT 0,"
+                " pid INTEGER, runner TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_owner ON jobs (owner, id)")
+            self._db.commit()
+            self._recover()
+        return self._db
+
+    # Jobs left active by a process that is gone can't continue on their
+    # own: they need a client, which only a session can supply
+    def _recover(self):
+        rows = self._db.execute(
+            "SELECT id, pid FROM jobs WHERE status IN (?, ?) AND (runner IS NULL OR runner != ?)",
+            (*ACTIVE, self._token)
+        ).fetchall()
+        stale = [job_id for job_id, pid in rows if pid is None or pid == os.getpid() or not _alive(pid)]
+        self._db.executemany(
+            "UPDATE jobs SET status = ?, message = ?, updated_at = ? WHERE id = ?",
+            [(INTERRUPTED, "Interrupted by a restart", time.time(), job_id) for job_id in stale],
+        )
+        self._db.commit()
+
+    def _update(self, job_id, **fields):
+        fields = {name: value for name, value in fields.items() if value is not None}
+        for name in JSON_FIELDS:
+            if name in fields:
+                fields[name] = json.dumps(fields[name])
+        fields["updated_at"] = time.time()
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?",
+                (*fields.values(), job_id),
+            )
+            db.commit()
+
+    def _cancel_requested(self, job_id):
+        with self._lock:
+            row = self._connect().execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    # Claim a queued job for this process; False if someone else has it
+    def _claim(self, job_id):
+        with self._lock:
+            db = self._connect()
+            claimed = db.execute(
+                "UPDATE jobs SET status = ?, pid = ?, runner = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, os.getpid(), self._token, time.time(), job_id, QUEUED),
+            ).rowcount
+            db.commit()
+            return claimed == 1
+
+    def submit(self, kind, params, youtube, owner=None):
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind {kind}")
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            job_id = db.execute(
+                "INSERT INTO jobs (kind, owner, params, status, pid, runner, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, owner, json.dumps(params), QUEUED, os.getpid(), self._token, now, now),
+            ).lastrowid
+            db.commit()
+        self._enqueue(job_id, youtube)
+        return job_id
+
+    # Queue a failed, cancelled or interrupted job again; it continues from
+    # its last checkpoint. With wait=True it runs on the calling thread.
+    def resume(self, job_id, youtube, wait=False):
+        with self._lock:
+            db = self._connect()
+            resumed = db.execute(
+                "UPDATE jobs SET status = ?, cancel_requested = 0, error = NULL, message = NULL,"
+                " pid = ?, runner = ?, updated_at = ? WHERE id = ? AND status IN (?, ?, ?)",
+                (QUEUED, os.getpid(), self._token, time.time(), job_id, *RESUMABLE),
+            ).rowcount
+            db.commit()
+        if not resumed:
+            return False
+        if wait:
+            self.run(job_id, youtube)
+        else:
+            self._enqueue(job_id, youtube)
+        return True
+
+    def cancel(self, job_id):
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, QUEUED),
+            )
+            db.execute(
+                "UPDATE jobs SET cancel_requested = 1, message = ?, updated_at = ? WHERE id = ? AND status = ?",
+                ("Cancelling...", time.time(), job_id, RUNNING),
+            )
+            db.commit()
+            context = self._running.get(job_id)
+        if context is not None:
+            context._cancel.set()
+
+    def _enqueue(self, job_id, youtube):
+        with self._lock:
+            self._clients[job_id] = youtube
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        self._queue.put(job_id)
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                youtube = self._clients.pop(job_id, None)
+            try:
+                self.run(job_id, youtube)
+            except Exception:
+                # run() records failures on the job itself
+                pass
+
+    # Run a queued job to completion on the calling thread
+    def run(self, job_id, youtube):
+        if not self._claim(job_id):
+            return self.get(job_id)
+        job = self.get(job_id)
+        context = JobContext(self, job)
+        with self._lock:
+            self._running[job_id] = context
+        try:
+            # Background work yields to interactive requests
+            with quota_priority(LOW):
+                result = self.handlers[job["kind"]](youtube, context)
+        except JobCancelled:
+            self._update(job_id, status=CANCELLED, message="Cancelled")
+        except Exception as e:
+            self._update(job_id, status=FAILED, error=f"{type(e).__name__}: {e}", message="Failed; resume to continue")
+        else:
+            self._update(job_id, status=DONE, result=result or {})
+        finally:
+            with self._lock:
+                self._running.pop(job_id, None)
+        return self.get(job_id)
+
+    def _row(self, cursor, row):
+        job = {column[0]: value for column, value in zip(cursor.description, row)}
+        for name in JSON_FIELDS:
+            job[name] = json.loads(job[name]) if job[name] else ({} if name == "params" else None)
+        job["checkpoint"] = job["checkpoint"] or {}
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            cursor = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+            return self._row(cursor, row) if row else None
+
+    # Most recent jobs first, optionally only one owner's
+    def jobs(self, owner=None, limit=50):
+        with self._lock:
+            if owner is None:
+                cursor = self._connect().execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+            else:
+                cursor = self._connect().execute(
+                    "SELECT * FROM jobs WHERE owner = ? ORDER BY id DESC LIMIT ?", (owner, limit)
+                )
+            return [self._row(cursor, row) for row in cursor.fetchall()]
+
+    # Drop finished jobs older than max_age seconds (their output files stay)
+    def prune(self, max_age):
+        with self._lock:
+            db = self._connect()
+            removed = db.execute(
+                "DELETE FROM jobs WHERE status NOT IN (?, ?) AND updated_at < ?", (*ACTIVE, time.time() - max_age)
+            ).rowcount
+            db.commit()
+            return removed
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            return {
+                "workers": sum(thread.is_alive() for thread in self._threads),
+                "queued": counts.get(QUEUED, 0),
+                "running": counts.get(RUNNING, 0),
+                "done": counts.get(DONE, 0),
+                "failed": counts.get(FAILED, 0),
+                "interrupted": counts.get(INTERRUPTED, 0),
+            }
+
+
+def job_output_dir(job_id):
+    return data_path(os.path.join("jobs", str(job_id)))
+
+
+# Read the Parquet parts a job wrote to a directory as one frame
+def read_parts(directory, columns):
+    paths = sorted(glob.glob(os.path.join(directory, "part-*.parquet")))
+    if not paths:
+        return to_frame([], columns)
+    return pa.concat_tables([pq.read_table(path) for path in paths]).to_pandas()
+
+
+def _write_part(directory, index, rows, columns):
+    os.makedirs(directory, exist_ok=True)
+    table = pa.Table.from_pandas(to_frame(rows, columns), preserve_index=False)
+    pq.write_table(table, os.path.join(directory, f"part-{index:05d}.parquet"))
+
+
+# Crawl a channel's uploads into Parquet parts, one per uploads page, and
+# checkpoint the next page token after each
+def crawl_channel_job(youtube, context):
+    params = context.params
+    output_dir = params.get("output_dir") or job_output_dir(context.job_id)
+    max_videos = params.get("max_videos")
+    checkpoint = context.checkpoint or {"playlist_id": None, "next_page_token": None, "listed": 0, "videos": 0,
+                                        "failures": 0, "files": 0}
+    if checkpoint["playlist_id"] is None:
+        checkpoint["playlist_id"] = get_uploads_playlist_id(youtube, params["channel_id"])
+        if not checkpoint["playlist_id"]:
+            raise ValueError(f"Channel {params['channel_id']} not found")
+        context.save(checkpoint, done=0, total=max_videos)
+
+    if max_videos is None or checkpoint["listed"] < max_videos:
+        pages = iter_catalog_pages(
+            youtube, checkpoint["playlist_id"], checkpoint["next_page_token"],
+            start=checkpoint["listed"], max_videos=max_videos
+        )
+        for rows, failures, next_page_token in pages:
+            if rows:
+                _write_part(os.path.join(output_dir, "catalog"), checkpoint["files"], rows, CATALOG_COLUMNS)
+            if failures:
+                _write_part(os.path.join(output_dir, "failures"), checkpoint["files"], failures, FAILURE_COLUMNS)
+            checkpoint["files"] += 1
+            checkpoint["listed"] += len(rows) + len(failures)
+            checkpoint["videos"] += len(rows)
+            checkpoint["failures"] += len(failures)
+            checkpoint["next_page_token"] = next_page_token
+            context.save(checkpoint, done=checkpoint["listed"], total=max_videos,
+                         message=f"{checkpoint['listed']:,} videos crawled")
+    return {"output_dir": output_dir, "videos": checkpoint["videos"], "failures": checkpoint["failures"]}
+
+
+# Export every comment of a video. ingest_comments keeps its own checkpoint
+# beside the parts, so a resumed job continues from the last flushed page.
+def pull_comments_job(youtube, context):
+    params = context.params
+    output_dir = params.get("output_dir") or job_output_dir(context.job_id)
+    max_comments = params.get("max_comments")
+    checkpoint = ingest_comments(
+        youtube, params["video_id"], output_dir,
+        include_replies=params.get("include_replies", False),
+        max_comments=max_comments,
+        on_progress=lambda count: context.progress(count, max_comments, f"{count:,} comments fetched"),
+    )
+    return {"output_dir": output_dir, "comments": checkpoint["comments_written"], "files": checkpoint["files"]}
+
+
+# Take one statistics snapshot of everything on the watchlist
+def refresh_watchlist_job(youtube, context):
+    context.progress(0, 1, "Snapshotting watchlist")
+    counts = snapshot_collector.collect_once(youtube)
+    context.progress(1, 1, f"{counts['video']:,} videos and {counts['channel']:,} channels snapshotted")
+    return counts
+
+
+JOB_HANDLERS = {
+    "crawl_channel": crawl_channel_job,
+    "pull_comments": pull_comments_job,
+    "refresh_watchlist": refresh_watchlist_job,
+}
+
+job_runner = JobRunner()
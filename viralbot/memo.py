@@ -0,0 +1,181 @@
+# Memoized results shared across Streamlit reruns and sessions
+#
+# Entries are keyed by function, the caller's credential identity and the
+# normalized arguments, so one user's private data is never served to
+# another. Each function has its own TTL and the whole cache stays under a
+# memory cap, evicting least recently used entries first.
+import functools
+import inspect
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from .tracing import span
+
+MAX_MEMO_BYTES = 128 * 1024 * 1024
+
+
+# Credential key of a client built by youtube_api.get_client
+def client_identity(youtube):
+    return getattr(getattr(youtube, "_http", None), "key", None)
+
+
+def normalize_argument(value):
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize_argument(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize_argument(v)) for k, v in value.items()))
+    return value
+
+
+def _is_frame(value):
+    return hasattr(value, "memory_usage") and hasattr(value, "copy")
+
+
+def _sizeof(value):
+    if _is_frame(value):
+        return int(value.memory_usage(deep=True).sum())
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+# Callers add columns to returned frames, so never hand out the cached one,
+# including frames inside tuples, lists and dicts
+def _copy(value):
+    if _is_frame(value):
+        return value.copy()
+    if isinstance(value, tuple):
+        return tuple(_copy(item) for item in value)
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    return value
+
+
+class _Entry:
+    def __init__(self, value, expires_at, size, user, function):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.user = user
+        self.function = function
+
+
+class MemoCache:
+    def __init__(self, max_bytes=MAX_MEMO_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    # (hit, value); a memoized value may itself be None
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry.value
+
+    def put(self, key, value, ttl, user=None, function=None):
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = _Entry(value, time.monotonic() + ttl, size, user, function)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    # Drop a user's entries, optionally only those of one function
+    def invalidate(self, user=None, function=None):
+        with self._lock:
+            keys = [
+                key for key, entry in self._entries.items()
+                if entry.user == user and (function is None or entry.function == function)
+            ]
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+
+memo_cache = MemoCache()
+
+
+# Memoize a function whose first argument is a YouTube client. Results are
+# only shared between callers using the same credentials; calls without an
+# identifiable client run uncached unless the function only reads public
+# data (public=True). normalize maps argument names to key functions.
+def memoize(ttl, normalize=None, public=False, cache=None):
+    normalize = normalize or {}
+
+    def decorator(function):
+        signature = inspect.signature(function)
+        name = f"{function.__module__}.{function.__qualname__}"
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            user = client_identity(arguments.pop("youtube", None))
+            if user is None and not public:
+                return function(*args, **kwargs)
+
+            store = cache or memo_cache
+            key = (name, user, tuple(
+                (argument, normalize.get(argument, normalize_argument)(value))
+                for argument, value in arguments.items()
+            ))
+            with span(name, cache="miss") as call:
+                hit, value = store.get(key)
+                if hit:
+                    call.set(cache="hit")
+                    return _copy(value)
+                value = function(*args, **kwargs)
+                store.put(key, value, ttl, user, name)
+                return _copy(value)
+
+        wrapper.memo_name = name
+        wrapper.ttl = ttl
+        return wrapper
+    return decorator
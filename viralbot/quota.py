@@ -0,0 +1,331 @@
+# YouTube Data API quota accounting and a quota-aware scheduler
+#
+# Every call is charged to a ledger by project, method and credential, per
+# quota day. The daily quota belongs to the Google Cloud project a call is
+# billed to (the OAuth client, or the developer key's project), so each
+# project has its own budget and its own exhaustion flag. Quota days roll
+# over at midnight Pacific time, like the API's own counter. The scheduler
+# checks the ledger before work starts and runs, defers or rejects it
+# depending on its priority and how much of its project's daily budget is
+# left.
+import atexit
+import contextlib
+import contextvars
+import datetime
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .utils import data_path
+
+try:
+    from zoneinfo import ZoneInfo
+    QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+except Exception:
+    QUOTA_TIMEZONE = datetime.timezone(datetime.timedelta(hours=-8))
+
+# Daily units per project
+DAILY_QUOTA = int(os.environ.get("VIRALBOT_DAILY_QUOTA", 10_000))
+DEFAULT_PROJECT = "default"
+# Ledger writes are batched: pending counts are written once this many
+# calls or seconds have accumulated, on a day change and at exit
+FLUSH_CALLS = 100
+FLUSH_INTERVAL = 5.0
+
+# Units per method, from the YouTube Data API quota calculator.
+# Unlisted list methods cost 1 and unlisted write methods cost 50.
+QUOTA_COSTS = {
+    "youtube.search.list": 100,
+    "youtube.videos.insert": 1600,
+    "youtube.videos.rate": 50,
+    "youtube.captions.list": 50,
+    "youtube.captions.insert": 400,
+    "youtube.captions.update": 450,
+    "youtube.captions.download": 200,
+    "youtube.thumbnails.set": 50,
+    "youtube.liveBroadcasts.list": 5,
+    "youtube.liveStreams.list": 5,
+}
+READ_COST = 1
+WRITE_COST = 50
+
+# Scheduler priorities, most important first
+HIGH, NORMAL, LOW = 0, 1, 2
+RUN, DEFER, REJECT = "run", "defer", "reject"
+
+_priority = contextvars.ContextVar("quota_priority", default=NORMAL)
+
+
+class QuotaExceededError(Exception):
+    pass
+
+
+class QuotaDeferred(QuotaExceededError):
+    pass
+
+
+def quota_cost(method):
+    if method in QUOTA_COSTS:
+        return QUOTA_COSTS[method]
+    return READ_COST if method and method.endswith(".list") else WRITE_COST
+
+
+def quota_day(now=None):
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return now.astimezone(QUOTA_TIMEZONE).date().isoformat()
+
+
+# Run a block of API calls at another priority, e.g. background crawls at LOW
+@contextlib.contextmanager
+def quota_priority(priority):
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+class QuotaLedger:
+    # Units and calls per (quota day, project, credential, method), persisted
+    # in SQLite so a restart doesn't forget what has already been spent today.
+    # daily_limit applies to each project separately. Counting happens in
+    # memory; a crash loses at most the last unflushed batch.
+
+    def __init__(self, daily_limit=DAILY_QUOTA, path=None, flush_calls=FLUSH_CALLS, flush_interval=FLUSH_INTERVAL):
+        self.daily_limit = daily_limit
+        self.flush_calls = flush_calls
+        self.flush_interval = flush_interval
+        self._path = path
+        self._db = None
+        self._lock = threading.Lock()
+        self._day = None
+        self._usage = {}  # (project, user, method) -> [units, calls]
+        self._exhausted = set()  # projects
+        self._pending = {}  # (day, project, user, method) -> [units, calls] not yet written
+        self._pending_calls = 0
+        self._flushed_at = time.monotonic()
+        atexit.register(self.flush)
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self._path or data_path("quota.sqlite3"), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS project_usage ("
+                " day TEXT NOT NULL, project TEXT NOT NULL, user TEXT NOT NULL, method TEXT NOT NULL,"
+                " units INTEGER NOT NULL, calls INTEGER NOT NULL,"
+                " PRIMARY KEY (day, project, user, method))"
+            )
+            self._db.commit()
+        return self._db
+
+    # Daily reset: switching quota day reloads (normally empty) counters
+    def _roll(self):
+        day = quota_day()
+        if day != self._day:
+            self._flush()
+            rows = self._connect().execute(
+                "SELECT project, user, method, units, calls FROM project_usage WHERE day = ?", (day,)
+            ).fetchall()
+            self._day = day
+            self._usage = {(project, user, method): [units, calls] for project, user, method, units, calls in rows}
+            self._exhausted = set()
+
+    def record(self, method, user=None, units=None, project=None):
+        units = quota_cost(method) if units is None else units
+        user = user or "anonymous"
+        project = project or DEFAULT_PROJECT
+        with self._lock:
+            self._roll()
+            for counts, key in ((self._usage, (project, user, method)), (self._pending, (self._day, project, user, method))):
+                entry = counts.setdefault(key, [0, 0])
+                entry[0] += units
+                entry[1] += 1
+            self._pending_calls += 1
+            if self._pending_calls >= self.flush_calls or time.monotonic() - self._flushed_at >= self.flush_interval:
+                self._flush()
+        return units
+
+    # Write pending counts in one transaction
+    def _flush(self):
+        self._flushed_at = time.monotonic()
+        if not self._pending:
+            return
+        pending, self._pending, self._pending_calls = self._pending, {}, 0
+        db = self._connect()
+        with db:
+            db.executemany(
+                "INSERT INTO project_usage (day, project, user, method, units, calls) VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (day, project, user, method) DO UPDATE SET"
+                " units = units + excluded.units, calls = calls + excluded.calls",
+                [key + tuple(counts) for key, counts in pending.items()],
+            )
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    # The API said quotaExceeded: treat the rest of the project's day as spent
+    def mark_exhausted(self, project=None):
+        with self._lock:
+            self._roll()
+            self._exhausted.add(project or DEFAULT_PROJECT)
+
+    # Units spent today by a project, optionally by one credential in it
+    def usage(self, user=None, project=None):
+        project = project or DEFAULT_PROJECT
+        with self._lock:
+            self._roll()
+            used = sum(
+                units for (p, u, _), (units, _) in self._usage.items()
+                if p == project and (user is None or u == user)
+            )
+            if project in self._exhausted and user is None:
+                return max(self.daily_limit, used)
+            return used
+
+    def remaining(self, project=None):
+        return max(self.daily_limit - self.usage(project=project), 0)
+
+    # Today's usage for one project, or with project=None summed over all
+    # of them (with "projects" breaking it down)
+    def snapshot(self, project=None):
+        with self._lock:
+            self._roll()
+            projects, users, methods = {}, {}, {}
+            for (p, user, method), (units, calls) in self._usage.items():
+                projects.setdefault(p, {"units": 0, "calls": 0, "exhausted": p in self._exhausted})
+                projects[p]["units"] += units
+                projects[p]["calls"] += calls
+                if project is not None and p != project:
+                    continue
+                users.setdefault(user, {"units": 0, "calls": 0, "methods": {}})
+                users[user]["units"] += units
+                users[user]["calls"] += calls
+                users[user]["methods"].setdefault(method, {"units": 0, "calls": 0})
+                users[user]["methods"][method]["units"] += units
+                users[user]["methods"][method]["calls"] += calls
+                methods.setdefault(method, {"units": 0, "calls": 0})
+                methods[method]["units"] += units
+                methods[method]["calls"] += calls
+            snapshot = {
+                "day": self._day,
+                "daily_limit": self.daily_limit,
+                "units": sum(user["units"] for user in users.values()),
+                "methods": methods,
+                "users": users,
+            }
+            if project is None:
+                snapshot["exhausted"] = bool(self._exhausted)
+                snapshot["projects"] = projects
+            else:
+                snapshot["project"] = project
+                snapshot["exhausted"] = project in self._exhausted
+            return snapshot
+
+    def dump(self):
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+
+class QuotaScheduler:
+    # Below soft_limit everything runs. Between soft and hard limits LOW
+    # priority work is deferred. Past the hard limit only HIGH priority work
+    # runs, NORMAL is deferred and LOW is rejected. Nothing runs once the
+    # daily limit (or an optional per-credential budget) would be exceeded.
+    # Limits apply to the project the work is billed to.
+
+    def __init__(self, ledger, soft_limit=0.8, hard_limit=0.95, user_budget=None):
+        self.ledger = ledger
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit
+        self.user_budget = user_budget
+        self.rejected = 0
+        self.deferred = 0
+        self._queue = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def decide(self, units, priority=NORMAL, user=None, project=None):
+        limit = self.ledger.daily_limit
+        used = self.ledger.usage(project=project) + units
+        if used > limit:
+            return REJECT
+        if self.user_budget is not None and (
+            self.ledger.usage(user or "anonymous", project) + units > self.user_budget
+        ):
+            return REJECT
+        if used > limit * self.hard_limit:
+            return RUN if priority == HIGH else DEFER if priority == NORMAL else REJECT
+        if used > limit * self.soft_limit:
+            return DEFER if priority == LOW else RUN
+        return RUN
+
+    # Gate for a single API call, used by execute_request
+    def admit(self, method, user=None, priority=None, project=None):
+        priority = current_priority() if priority is None else priority
+        decision = self.decide(quota_cost(method), priority, user, project)
+        if decision == RUN:
+            return
+        with self._lock:
+            if decision == DEFER:
+                self.deferred += 1
+            else:
+                self.rejected += 1
+        used, limit = self.ledger.usage(project=project), self.ledger.daily_limit
+        if decision == DEFER:
+            raise QuotaDeferred(f"Deferred {method}: {used:,}/{limit:,} quota units used today")
+        raise QuotaExceededError(f"Rejected {method}: {used:,}/{limit:,} quota units used today")
+
+    # Run a unit of work costing roughly `units`, or queue it until budget
+    # frees up. Returns (decision, result).
+    def schedule(self, work, units, priority=NORMAL, user=None, project=None):
+        decision = self.decide(units, priority, user, project)
+        if decision == RUN:
+            return RUN, work()
+        with self._lock:
+            if decision == DEFER:
+                self.deferred += 1
+                heapq.heappush(self._queue, (priority, next(self._sequence), work, units, user, project))
+            else:
+                self.rejected += 1
+        return decision, None
+
+    # Run queued work, highest priority first, while its project's budget
+    # allows; work for a project that is out of budget stays queued
+    def run_deferred(self):
+        results, blocked = [], set()
+        while True:
+            with self._lock:
+                entry = None
+                for queued in sorted(self._queue):
+                    priority, _, _, units, user, project = queued
+                    if project in blocked:
+                        continue
+                    if self.decide(units, priority, user, project) == RUN:
+                        entry = queued
+                        break
+                    blocked.add(project)
+                if entry is None:
+                    break
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+            results.append(entry[2]())
+        return results
+
+    def pending(self):
+        with self._lock:
+            return len(self._queue)
+
+    def stats(self):
+        return {"deferred": self.deferred, "rejected": self.rejected, "pending": self.pending()}
+
+
+quota_ledger = QuotaLedger()
+quota_scheduler = QuotaScheduler(quota_ledger)
@@ -0,0 +1,203 @@
+# Retries, backoff and circuit breaking for API calls
+#
+# Errors are classified as retryable (5xx, 429, rate limits, dropped
+# connections, timeouts) or terminal (bad requests, auth, quota, not found).
+# Retryable errors are retried with exponential backoff and full jitter
+# within a per-request deadline. Each endpoint has a circuit breaker: after
+# repeated requests fail for retryable reasons it opens and calls fail fast
+# until a cool-down lets a single probe through.
+import http.client
+import random
+import threading
+import time
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RETRYABLE_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "backendError", "internalError"}
+TERMINAL_REASONS = {"quotaExceeded", "dailyLimitExceeded", "forbidden", "keyInvalid"}
+
+MAX_ATTEMPTS = 4
+BASE_DELAY = 0.5
+MAX_DELAY = 8.0
+# Seconds a request may take including retries; an attempt already in
+# flight is bounded by the HTTP timeout
+REQUEST_DEADLINE = 30
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, endpoint, retry_after):
+        super().__init__(f"{endpoint} is failing; retry in {retry_after:.0f}s")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+# Reasons attached to an API error response, e.g. {"quotaExceeded"}
+def error_reasons(error):
+    details = getattr(error, "error_details", None)
+    if not isinstance(details, list):
+        return set()
+    return {detail.get("reason") for detail in details if isinstance(detail, dict)}
+
+
+def is_retryable(error):
+    status = getattr(getattr(error, "resp", None), "status", None)
+    if status is not None:
+        reasons = error_reasons(error)
+        if reasons & TERMINAL_REASONS:
+            return False
+        if reasons & RETRYABLE_REASONS:
+            return True
+        return int(status) in RETRYABLE_STATUSES
+    if isinstance(error, (DeadlineExceeded, CircuitOpenError)):
+        return False
+    return isinstance(error, (TimeoutError, ConnectionError, http.client.HTTPException))
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=MAX_ATTEMPTS, base_delay=BASE_DELAY, max_delay=MAX_DELAY, seed=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._random = random.Random(seed)
+
+    # Full jitter: anywhere between 0 and the exponential cap
+    def delay(self, retry):
+        return self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+
+class CircuitBreaker:
+    def __init__(self, endpoint, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    # Raise CircuitOpenError unless a call may go through now. Returns True
+    # when the call is the half-open probe.
+    def before_call(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+            retry_after = self._opened_at + self.reset_timeout - time.monotonic()
+            if self.state == OPEN and retry_after <= 0:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                # One probe at a time decides whether the endpoint is back
+                self._probing = True
+                return True
+            raise CircuitOpenError(self.endpoint, max(retry_after, 0))
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opened += 1
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    # A probe that ended without an outcome (interrupted, killed, or failed
+    # for reasons that say nothing about the endpoint) lets the next call
+    # probe instead, leaving the state and failure count as they were
+    def release_probe(self):
+        with self._lock:
+            self._probing = False
+
+    @property
+    def is_open(self):
+        return self.state == OPEN
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "failures": self.failures, "opened": self.opened}
+
+
+class CircuitBreakers:
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, endpoint):
+        with self._lock:
+            breaker = self._breakers.get(endpoint)
+            if breaker is None:
+                breaker = CircuitBreaker(endpoint, self.failure_threshold, self.reset_timeout)
+                self._breakers[endpoint] = breaker
+            return breaker
+
+    def reset(self):
+        with self._lock:
+            self._breakers.clear()
+
+    def stats(self):
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.endpoint: breaker.stats() for breaker in breakers}
+
+
+retry_policy = RetryPolicy()
+circuit_breakers = CircuitBreakers()
+
+
+# Run attempt() until it succeeds, fails terminally, runs out of attempts
+# or would overrun the deadline. on_retry(retry, error, delay) is called
+# before each backoff sleep. The breaker sees one outcome per request, not
+# one per attempt.
+def call_with_retries(attempt, endpoint, policy=None, breakers=None, deadline=REQUEST_DEADLINE, on_retry=None):
+    policy = policy or retry_policy
+    breaker = (breakers or circuit_breakers).get(endpoint)
+    probe = breaker.before_call()
+    recorded = False
+    expires = time.monotonic() + deadline
+    retry = 0
+    try:
+        while True:
+            try:
+                result = attempt()
+            except Exception as e:
+                if not is_retryable(e):
+                    # Neither a sign the endpoint is down nor that it is back;
+                    # the request itself was at fault. Recorded as no outcome.
+                    raise
+                delay = policy.delay(retry)
+                if retry + 1 >= policy.max_attempts or breaker.is_open:
+                    recorded = True
+                    breaker.record_failure()
+                    raise
+                if time.monotonic() + delay >= expires:
+                    recorded = True
+                    breaker.record_failure()
+                    raise DeadlineExceeded(f"{endpoint} did not succeed within {deadline}s: {e}") from e
+                retry += 1
+                if on_retry:
+                    on_retry(retry, e, delay)
+                time.sleep(delay)
+                continue
+            recorded = True
+            breaker.record_success()
+            return result
+    finally:
+        if probe and not recorded:
+            breaker.release_probe()
@@ -0,0 +1,180 @@
+# On-disk API response cache revalidated with ETags
+#
+# Responses are stored in SQLite keyed by API method and normalized query
+# parameters, together with the ETag the API sent. Repeat requests go out
+# with If-None-Match; a 304 is answered from the local copy, which is kept
+# parsed in memory so hot entries skip JSON decoding as well as the download.
+# The in-memory copy is the cache's own: callers get copies of it.
+import contextlib
+import copy
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlparse
+
+from .utils import data_path
+
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+MEMORY_ENTRIES = 1024
+# Responses scoped to the signed-in user are never written to disk
+PRIVATE_PARAMETERS = {"mine", "myRating", "managedByMe", "mySubscribers", "forMine", "home"}
+# Never part of the cache key (and never stored)
+IGNORED_PARAMETERS = {"key", "alt", "prettyPrint", "quotaUser"}
+
+_bypass = contextvars.ContextVar("response_cache_bypass", default=False)
+
+
+class CachedResponse:
+    def __init__(self, etag, response, size):
+        self.etag = etag
+        self.response = response
+        self.size = size
+
+
+def normalized_parameters(request):
+    query = parse_qsl(urlparse(request.uri).query, keep_blank_values=True)
+    return sorted((name, value) for name, value in query if name not in IGNORED_PARAMETERS)
+
+
+def is_public_request(request):
+    return request.method == "GET" and not any(
+        name in PRIVATE_PARAMETERS for name, _ in normalized_parameters(request)
+    )
+
+
+def cache_key(request):
+    material = json.dumps([request.methodId, normalized_parameters(request)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+# Skip the cache for a block of code (tests, forced refreshes)
+@contextlib.contextmanager
+def bypass_response_cache():
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def response_cache_bypassed():
+    return _bypass.get()
+
+
+class ResponseCache:
+    def __init__(self, path=None, max_bytes=MAX_CACHE_BYTES, memory_entries=MEMORY_ENTRIES, enabled=None):
+        if enabled is None:
+            enabled = os.environ.get("VIRALBOT_RESPONSE_CACHE", "1") != "0"
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._path = path
+        self._db = None
+        self._total_bytes = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self._path or data_path("responses.sqlite3"), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, method TEXT NOT NULL, etag TEXT NOT NULL,"
+                " body BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            self._db.commit()
+            self._total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        return self._db
+
+    def active(self, request):
+        return self.enabled and not _bypass.get() and is_public_request(request)
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+            row = self._connect().execute("SELECT etag, body, size FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            entry = CachedResponse(row[0], json.loads(zlib.decompress(row[1])), row[2])
+            self._remember(key, entry)
+            return entry
+
+    def put(self, key, method, etag, response, content):
+        body = zlib.compress(content if isinstance(content, bytes) else content.encode("utf-8"))
+        with self._lock:
+            # Not the caller's dict, which it may go on to change
+            self._remember(key, CachedResponse(etag, copy.deepcopy(response), len(body)))
+            db = self._connect()
+            previous = db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._total_bytes += len(body) - (previous[0] if previous else 0)
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, method, etag, body, size, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, method, etag, body, len(body), time.time()),
+            )
+            self._evict(db)
+            db.commit()
+
+    # A 304 confirmed the entry is current
+    def touch(self, key):
+        with self._lock:
+            self.hits += 1
+            db = self._connect()
+            db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            db.commit()
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    # Drop least recently used rows until the cache fits in max_bytes
+    def _evict(self, db):
+        if self._total_bytes <= self.max_bytes:
+            return
+        for key, size in db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._memory.pop(key, None)
+            self.evictions += 1
+            self._total_bytes -= size
+            if self._total_bytes <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._connect().execute("DELETE FROM responses")
+            self._db.commit()
+            self._total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "bytes": self._total_bytes,
+            }
+
+
+response_cache = ResponseCache()
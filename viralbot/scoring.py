@@ -0,0 +1,114 @@
+# Vectorized viral-score engine for whole video catalogs
+#
+# Works on catalog frames shaped like video_batch.VIDEO_COLUMNS. Every
+# metric is computed with whole-column numpy operations (no per-row Python),
+# channel statistics are gathered with bincount over factorized channel IDs,
+# and the top K rows are picked with argpartition instead of a full sort.
+import numpy as np
+import pandas as pd
+
+# Younger videos are treated as this old so views/day doesn't explode
+MIN_AGE_DAYS = 1 / 24
+SCORE_WEIGHTS = {
+    "channel_z": 0.5,  # outperforming the channel's own videos
+    "global_z": 0.3,   # outperforming the catalog as a whole
+    "engagement_z": 0.2,
+}
+SCORE_COLUMNS = [
+    "age_days", "views_per_day", "like_rate", "comment_rate", "engagement_rate",
+    "channel_z", "global_z", "engagement_z", "viral_score",
+]
+
+
+def _floats(series):
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _zscore(values):
+    finite = np.isfinite(values)
+    if not finite.any():
+        return np.zeros_like(values)
+    mean = values[finite].mean()
+    std = values[finite].std()
+    if std == 0:
+        return np.where(finite, 0.0, np.nan)
+    return (values - mean) / std
+
+
+# z-score of each value against the other values in its group
+def _group_zscore(codes, values):
+    finite = np.isfinite(values) & (codes >= 0)
+    safe_codes = np.where(finite, codes, 0)
+    groups = codes.max() + 1 if len(codes) else 0
+    weights = finite.astype("float64")
+    filled = np.where(finite, values, 0.0)
+    counts = np.bincount(safe_codes, weights=weights, minlength=groups)
+    sums = np.bincount(safe_codes, weights=filled, minlength=groups)
+    squares = np.bincount(safe_codes, weights=filled * filled, minlength=groups)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = sums / counts
+        std = np.sqrt(np.maximum(squares / counts - mean * mean, 0.0))
+        z = (values - mean[safe_codes]) / std[safe_codes]
+    # Single-video channels and flat channels carry no signal
+    return np.where(finite & (std[safe_codes] > 0), z, 0.0)
+
+
+# Add engagement, views/day, z-scores and a combined viral_score
+def score_videos(catalog, now=None, weights=None):
+    weights = dict(SCORE_WEIGHTS, **(weights or {}))
+    now = pd.Timestamp.now(tz="UTC") if now is None else pd.Timestamp(now)
+    if now.tzinfo is None:
+        now = now.tz_localize("UTC")
+
+    views = _floats(catalog["view_count"])
+    likes = np.nan_to_num(_floats(catalog["like_count"]))
+    comments = np.nan_to_num(_floats(catalog["comment_count"]))
+    published = pd.to_datetime(catalog["published_at"], utc=True).to_numpy(dtype="datetime64[ns]")
+
+    age_days = (now.tz_convert(None).to_datetime64() - published) / np.timedelta64(1, "D")
+    age_days = np.maximum(age_days.astype("float64"), MIN_AGE_DAYS)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        views_per_day = views / age_days
+        like_rate = np.where(views > 0, likes / views, 0.0)
+        comment_rate = np.where(views > 0, comments / views, 0.0)
+    engagement_rate = like_rate + comment_rate
+
+    log_velocity = np.log1p(views_per_day)
+    channel_codes, _ = pd.factorize(catalog["channel_id"], use_na_sentinel=True)
+    channel_z = _group_zscore(channel_codes, log_velocity)
+    global_z = _zscore(log_velocity)
+    engagement_z = _zscore(engagement_rate)
+
+    viral_score = (
+        weights["channel_z"] * channel_z
+        + weights["global_z"] * global_z
+        + weights["engagement_z"] * engagement_z
+    )
+    viral_score = np.where(np.isfinite(views), viral_score, np.nan)
+
+    scored = catalog.copy(deep=False)
+    for name, values in zip(SCORE_COLUMNS, (
+        age_days, views_per_day, like_rate, comment_rate, engagement_rate,
+        channel_z, global_z, engagement_z, viral_score,
+    )):
+        scored[name] = values
+    return scored
+
+
+# Positions of the k largest values, largest first, NaN last
+def top_k_indices(values, k):
+    values = np.where(np.isnan(values), -np.inf, values)
+    k = min(k, len(values))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-values, k - 1)[:k]
+    return candidates[np.argsort(-values[candidates], kind="stable")]
+
+
+# Score a catalog and return its top K videos ranked by viral_score
+def rank_videos(catalog, k=100, now=None, weights=None, by="viral_score"):
+    scored = score_videos(catalog, now=now, weights=weights)
+    top = scored.iloc[top_k_indices(scored[by].to_numpy(dtype="float64"), k)].reset_index(drop=True)
+    top.insert(0, "rank", np.arange(1, len(top) + 1))
+    return top
@@ -0,0 +1,274 @@
+# Deep search: paginated, de-duplicated and enriched with statistics
+#
+# search.list costs 100 quota units per page, so every page is asked for at
+# the 50-result maximum, kept in an on-disk page cache keyed by the
+# normalized query, filters and page token, and paging stops at a result or
+# quota budget. Hits are de-duplicated across pages and queries, then video,
+# channel and playlist hits are enriched with 50-ID batched lookups (1 unit
+# each) instead of one call per result.
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+from .channel_batch import fetch_channels
+from .fetch_engine import fetch_all
+from .quota import quota_cost
+from .response_cache import PRIVATE_PARAMETERS
+from .utils import chunked, data_path, parse_duration
+from .video_batch import MAX_IDS_PER_CALL, fetch_videos, to_frame
+from .youtube_api import execute_request
+
+SEARCH_METHOD = "youtube.search.list"
+SEARCH_PAGE_SIZE = 50
+SEARCH_TYPES = "video,channel,playlist"
+PAGE_TTL = 30 * 60
+MAX_CACHED_PAGES = 20_000
+
+SEARCH_COLUMNS = {
+    "rank": "Int64",
+    "query": "string",
+    "kind": "string",
+    "id": "string",
+    "title": "string",
+    "description": "string",
+    "channel_id": "string",
+    "channel_title": "string",
+    "published_at": "datetime64[ns, UTC]",
+    "view_count": "Int64",
+    "like_count": "Int64",
+    "comment_count": "Int64",
+    "duration_seconds": "Int64",
+    "subscriber_count": "Int64",
+    "video_count": "Int64",
+    "item_count": "Int64",
+}
+
+_ID_FIELDS = {"video": "videoId", "channel": "channelId", "playlist": "playlistId"}
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query):
+    return _WHITESPACE_RE.sub(" ", (query or "").strip().lower())
+
+
+def page_key(query, filters, page_token, page_size):
+    material = json.dumps([normalize_query(query), sorted(filters.items()), page_token or "", page_size])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class SearchPageCache:
+    # Persistent search.list pages with a TTL and LRU eviction
+
+    def __init__(self, path=None, ttl=PAGE_TTL, max_pages=MAX_CACHED_PAGES):
+        self.ttl = ttl
+        self.max_pages = max_pages
+        self.hits = 0
+        self.misses = 0
+        self._path = path
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # Opened lazily so importing the module never touches the disk
+        if self._db is None:
+            self._db = sqlite3.connect(self._path or data_path("search_pages.sqlite3"), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS search_pages ("
+                " key TEXT PRIMARY KEY, response TEXT NOT NULL,"
+                " fetched_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS search_pages_last_used ON search_pages (last_used)")
+            self._db.commit()
+        return self._db
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            row = db.execute("SELECT response, fetched_at FROM search_pages WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            db.execute("UPDATE search_pages SET last_used = ? WHERE key = ?", (now, key))
+            db.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, key, response):
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO search_pages (key, response, fetched_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(response), now, now),
+            )
+            db.execute(
+                "DELETE FROM search_pages WHERE key IN ("
+                " SELECT key FROM search_pages ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_pages,),
+            )
+            db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM search_pages")
+            self._db.commit()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+search_page_cache = SearchPageCache()
+
+
+# One search.list page, from the page cache when possible. With fetch=False
+# only the cache is consulted. Returns (response or None, cached).
+def search_page(youtube, query, page_token=None, page_size=SEARCH_PAGE_SIZE, fetch=True, **filters):
+    filters.setdefault("type", SEARCH_TYPES)
+    cacheable = not any(name in PRIVATE_PARAMETERS for name in filters)
+    key = page_key(query, filters, page_token, page_size)
+    if cacheable:
+        response = search_page_cache.get(key)
+        if response is not None:
+            return response, True
+    if not fetch:
+        return None, False
+
+    kwargs = dict(filters, part="snippet", q=query, maxResults=page_size)
+    if page_token:
+        kwargs["pageToken"] = page_token
+    response = execute_request(youtube.search().list, **kwargs)
+    if cacheable:
+        search_page_cache.put(key, response)
+    return response, False
+
+
+def search_hit(item):
+    kind = item["id"]["kind"].split("#")[-1]
+    snippet = item.get("snippet", {})
+    return {
+        "kind": kind,
+        "id": item["id"].get(_ID_FIELDS.get(kind, ""), ""),
+        "title": snippet.get("title"),
+        "description": snippet.get("description"),
+        "channel_id": snippet.get("channelId"),
+        "channel_title": snippet.get("channelTitle"),
+        "published_at": snippet.get("publishedAt"),
+    }
+
+
+# Fetch raw playlist resources for many IDs, 50 per call, the same way
+# fetch_channels does. Returns ({id: item}, failures).
+def fetch_playlists(youtube, playlist_ids, part="contentDetails"):
+    playlist_ids = list(dict.fromkeys(playlist_ids))
+    chunks = list(chunked(playlist_ids, MAX_IDS_PER_CALL))
+    results = fetch_all(
+        (youtube.playlists().list, {"part": part, "id": ",".join(chunk), "maxResults": MAX_IDS_PER_CALL})
+        for chunk in chunks
+    )
+
+    items, failures = {}, []
+    for chunk, result in zip(chunks, results):
+        if not result.ok:
+            failures.extend({"input": playlist_id, "playlist_id": playlist_id, "error": f"API request failed: {result.error}"} for playlist_id in chunk)
+            continue
+
+        for item in result.value.get("items", []):
+            items[item["id"]] = item
+    return items, failures
+
+
+# Add statistics to hits in place with one batched call per 50 IDs of a kind
+def enrich_hits(youtube, hits):
+    ids = {kind: [hit["id"] for hit in hits if hit["kind"] == kind] for kind in _ID_FIELDS}
+    videos = fetch_videos(youtube, ids["video"], part="statistics,contentDetails")[0] if ids["video"] else {}
+    channels = fetch_channels(youtube, ids["channel"], part="statistics")[0] if ids["channel"] else {}
+    playlists = fetch_playlists(youtube, ids["playlist"])[0] if ids["playlist"] else {}
+
+    for hit in hits:
+        if hit["kind"] == "video" and hit["id"] in videos:
+            video = videos[hit["id"]]
+            statistics = video.get("statistics", {})
+            hit["view_count"] = statistics.get("viewCount")
+            hit["like_count"] = statistics.get("likeCount")
+            hit["comment_count"] = statistics.get("commentCount")
+            hit["duration_seconds"] = parse_duration(video.get("contentDetails", {}).get("duration"))
+        elif hit["kind"] == "channel" and hit["id"] in channels:
+            statistics = channels[hit["id"]].get("statistics", {})
+            hit["view_count"] = statistics.get("viewCount")
+            hit["subscriber_count"] = statistics.get("subscriberCount")
+            hit["video_count"] = statistics.get("videoCount")
+        elif hit["kind"] == "playlist" and hit["id"] in playlists:
+            hit["item_count"] = playlists[hit["id"]].get("contentDetails", {}).get("itemCount")
+    return hits
+
+
+class SearchStats:
+    def __init__(self):
+        self.pages = 0
+        self.cached_pages = 0
+        self.quota_units = 0
+        self.duplicates = 0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+# Page through one query until max_results new hits, the last page or a
+# page the quota budget can't pay for (cached pages are free). Hits already
+# in `seen` (a set of (kind, id)) are skipped; `seen` is updated in place.
+def iter_search_hits(youtube, query, max_results=200, quota_budget=None, seen=None, stats=None, **filters):
+    seen = set() if seen is None else seen
+    stats = stats or SearchStats()
+    page_cost = quota_cost(SEARCH_METHOD)
+    page_token, found = None, 0
+    while found < max_results:
+        affordable = quota_budget is None or stats.quota_units + page_cost <= quota_budget
+        response, cached = search_page(youtube, query, page_token, fetch=affordable, **filters)
+        if response is None:
+            return
+        if not cached:
+            stats.quota_units += page_cost
+        stats.pages += 1
+        stats.cached_pages += cached
+        for item in response.get("items", []):
+            hit = search_hit(item)
+            key = (hit["kind"], hit["id"])
+            if key in seen:
+                stats.duplicates += 1
+                continue
+            seen.add(key)
+            hit["query"] = query
+            found += 1
+            yield hit
+            if found >= max_results:
+                return
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return
+
+
+# Deep search over one or more queries; the budgets apply to the whole call.
+# Pass the same `seen` set to later calls to drop hits already returned.
+# Returns (results_df ranked in search order, stats dict).
+def deep_search(youtube, queries, max_results=200, quota_budget=None, enrich=True, seen=None, **filters):
+    if isinstance(queries, str):
+        queries = [queries]
+    queries = list({normalize_query(query): query.strip() for query in queries if query.strip()}.values())
+    seen = set() if seen is None else seen
+    stats, hits = SearchStats(), []
+    for query in queries:
+        hits.extend(iter_search_hits(
+            youtube, query, max_results=max_results - len(hits),
+            quota_budget=quota_budget, seen=seen, stats=stats, **filters
+        ))
+        if len(hits) >= max_results:
+            break
+    if enrich and hits:
+        enrich_hits(youtube, hits)
+    for rank, hit in enumerate(hits, start=1):
+        hit["rank"] = rank
+    return to_frame(hits, SEARCH_COLUMNS), stats.as_dict()
@@ -0,0 +1,118 @@
+# Process-wide coalescing of identical public API requests
+#
+# When many sessions open the same viral video or channel at once, they all
+# issue the same videos.list or channels.list call. The first caller for a
+# key runs it; callers arriving while it is in flight wait and share its
+# result (or its error), and callers arriving shortly after get the result
+# for a few seconds without another round trip. Only public requests are
+# coalesced, and callers scope the key by credentials wherever a response
+# could hold private data, so it is never handed to another user. Every
+# caller gets its own copy of the result, so one can't mutate another's.
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# How long a finished result is shared, in seconds
+RESULT_TTL = float(os.environ.get("VIRALBOT_SINGLE_FLIGHT_TTL", "5"))
+MAX_RESULTS = 1024
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, ttl=RESULT_TTL, max_results=MAX_RESULTS, enabled=None):
+        if enabled is None:
+            enabled = os.environ.get("VIRALBOT_SINGLE_FLIGHT", "1") != "0"
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_results = max_results
+        self.executions = 0
+        self.coalesced = 0
+        self.recent_hits = 0
+        self.errors = 0
+        self._calls = {}
+        self._results = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    # Run function() once for all concurrent callers with the same key.
+    # Returns (value, shared); shared is False for the caller that ran it.
+    def do(self, key, function):
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                if result[0] > time.monotonic():
+                    self.recent_hits += 1
+                    return copy.deepcopy(result[1]), True
+                del self._results[key]
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.value), True
+
+        try:
+            value = function()
+            # Waiters and later callers copy from a snapshot the leader
+            # never sees, so its own changes stay its own
+            call.value = copy.deepcopy(value)
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        else:
+            if self.ttl > 0:
+                self._remember(key, call.value)
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return value, False
+
+    def _remember(self, key, value):
+        with self._lock:
+            now = time.monotonic()
+            self._results[key] = (now + self.ttl, value)
+            self._results.move_to_end(key)
+            while self._results and (
+                len(self._results) > self.max_results or next(iter(self._results.values()))[0] <= now
+            ):
+                self._results.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+    def stats(self):
+        with self._lock:
+            shared = self.coalesced + self.recent_hits
+            requests = self.executions + shared
+            return {
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "recent_hits": self.recent_hits,
+                "errors": self.errors,
+                "in_flight": len(self._calls),
+                "entries": len(self._results),
+                "coalescing_ratio": shared / requests if requests else 0.0,
+            }
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,349 @@
+# Persistent tag -> videos inverted index
+#
+# Every videos.list item that passes through the app (single lookups, bulk
+# scoring, catalog crawls, search enrichment) is folded in incrementally:
+# the video's old contribution is subtracted and the new one added, so
+# per-tag aggregates are always current and the common questions are index
+# lookups rather than scans:
+#
+#   top tags by total views          tag_stats ordered by total_views
+#   a tag's overall rank             tag_ranks, a snapshot of that order
+#   tags that appear together        video_tags joined on video_id
+#   tags that go with fast videos    point-biserial correlation of each tag
+#                                    with log(1 + views/day) in a niche
+#
+# Velocity is measured when a video is ingested and refreshed whenever its
+# statistics are fetched again.
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from .scoring import MIN_AGE_DAYS
+from .utils import data_path
+
+DAY = 24 * 60 * 60
+MIN_VIDEOS = 5
+# How stale the tag rank snapshot may get while videos keep arriving, in seconds
+RANK_REFRESH = 60
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS videos ("
+    " video_id TEXT PRIMARY KEY, channel_id TEXT, category_id TEXT,"
+    " published_at REAL, view_count INTEGER NOT NULL, velocity REAL NOT NULL, updated_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS videos_category ON videos (category_id)",
+    "CREATE TABLE IF NOT EXISTS tags (tag_id INTEGER PRIMARY KEY, tag TEXT NOT NULL UNIQUE)",
+    "CREATE TABLE IF NOT EXISTS video_tags ("
+    " tag_id INTEGER NOT NULL, video_id TEXT NOT NULL, PRIMARY KEY (tag_id, video_id)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS video_tags_video ON video_tags (video_id, tag_id)",
+    # Running sums per tag; key 0 in totals holds the same sums over all videos
+    "CREATE TABLE IF NOT EXISTS tag_stats ("
+    " tag_id INTEGER PRIMARY KEY, videos INTEGER NOT NULL, total_views INTEGER NOT NULL,"
+    " sum_velocity REAL NOT NULL, sum_velocity_sq REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS tag_stats_views ON tag_stats (total_views)",
+    "CREATE INDEX IF NOT EXISTS tag_stats_videos ON tag_stats (videos)",
+    "CREATE TABLE IF NOT EXISTS tag_ranks (tag_id INTEGER PRIMARY KEY, rank INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS totals ("
+    " id INTEGER PRIMARY KEY, videos INTEGER NOT NULL, total_views INTEGER NOT NULL,"
+    " sum_velocity REAL NOT NULL, sum_velocity_sq REAL NOT NULL)",
+)
+
+
+def normalize_tag(tag):
+    return _WHITESPACE_RE.sub(" ", (tag or "").strip().lower())
+
+
+def _timestamp(published_at):
+    if not published_at:
+        return None
+    return datetime.fromisoformat(published_at.replace("Z", "+00:00")).timestamp()
+
+
+# log(1 + views/day), the same velocity the viral score uses
+def log_velocity(view_count, published_at, now):
+    if published_at is None:
+        return 0.0
+    age_days = max((now - published_at) / DAY, MIN_AGE_DAYS)
+    return math.log1p(view_count / age_days)
+
+
+# Correlation between having a tag and velocity over a population of n
+# videos with velocity sum s and sum of squares ss, of which n1 carry the
+# tag with velocity sum s1
+def point_biserial(n, s, ss, n1, s1):
+    n0 = n - n1
+    variance = ss / n - (s / n) ** 2 if n else 0.0
+    if n1 <= 0 or n0 <= 0 or variance <= 0:
+        return 0.0
+    return (s1 / n1 - (s - s1) / n0) / math.sqrt(variance) * math.sqrt(n1 * n0) / n
+
+
+class TagIndex:
+    def __init__(self, path=None, enabled=None):
+        if enabled is None:
+            enabled = os.environ.get("VIRALBOT_TAG_INDEX", "1") != "0"
+        self.enabled = enabled
+        self._path = path
+        self._db = None
+        self._lock = threading.Lock()
+        self._ranks_dirty = True
+        self._ranked_at = None
+
+    def _connect(self):
+        # Opened lazily so importing the module never touches the disk
+        if self._db is None:
+            self._db = sqlite3.connect(self._path or data_path("tag_index.sqlite3"), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SCHEMA:
+                self._db.execute(statement)
+            self._db.commit()
+        return self._db
+
+    def _tag_ids(self, db, tags):
+        tags = [tag for tag in dict.fromkeys(normalize_tag(tag) for tag in tags) if tag]
+        db.executemany("INSERT OR IGNORE INTO tags (tag) VALUES (?)", [(tag,) for tag in tags])
+        return [db.execute("SELECT tag_id FROM tags WHERE tag = ?", (tag,)).fetchone()[0] for tag in tags]
+
+    # Add (or with negative values, remove) videos to the tags' running sums
+    def _add(self, db, tag_ids, videos, views, velocity, velocity_sq):
+        values = (videos, views, velocity, velocity_sq)
+        db.executemany(
+            "INSERT INTO tag_stats (tag_id, videos, total_views, sum_velocity, sum_velocity_sq) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT (tag_id) DO UPDATE SET videos = videos + excluded.videos,"
+            " total_views = total_views + excluded.total_views, sum_velocity = sum_velocity + excluded.sum_velocity,"
+            " sum_velocity_sq = sum_velocity_sq + excluded.sum_velocity_sq",
+            [(tag_id,) + values for tag_id in tag_ids],
+        )
+        db.execute(
+            "INSERT INTO totals (id, videos, total_views, sum_velocity, sum_velocity_sq) VALUES (0, ?, ?, ?, ?)"
+            " ON CONFLICT (id) DO UPDATE SET videos = videos + excluded.videos,"
+            " total_views = total_views + excluded.total_views, sum_velocity = sum_velocity + excluded.sum_velocity,"
+            " sum_velocity_sq = sum_velocity_sq + excluded.sum_velocity_sq",
+            values,
+        )
+
+    def _ingest(self, db, item, now, public_only):
+        video_id = item["id"]
+        snippet, statistics = item.get("snippet"), item.get("statistics")
+        status = item.get("status")
+        if public_only and status is not None and status.get("privacyStatus") != "public":
+            return False
+        old = db.execute(
+            "SELECT channel_id, category_id, published_at, view_count, velocity FROM videos WHERE video_id = ?",
+            (video_id,),
+        ).fetchone()
+        # A statistics-only refresh can only update a video indexed before,
+        # and an item of unknown privacy only a video that was public then
+        if old is None and (snippet is None or statistics is None or (public_only and status is None)):
+            return False
+
+        old_tag_ids = []
+        if old is not None:
+            old_tag_ids = [row[0] for row in db.execute("SELECT tag_id FROM video_tags WHERE video_id = ?", (video_id,))]
+            self._add(db, old_tag_ids, -1, -old[3], -old[4], -old[4] * old[4])
+
+        if snippet is not None:
+            channel_id, category_id = snippet.get("channelId"), snippet.get("categoryId")
+            published_at = _timestamp(snippet.get("publishedAt"))
+            tag_ids = self._tag_ids(db, snippet.get("tags", []))
+        else:
+            channel_id, category_id, published_at = old[:3]
+            tag_ids = old_tag_ids
+        view_count = int(statistics.get("viewCount", 0)) if statistics is not None else old[3]
+        velocity = log_velocity(view_count, published_at, now)
+
+        db.execute(
+            "INSERT OR REPLACE INTO videos (video_id, channel_id, category_id, published_at, view_count, velocity, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (video_id, channel_id, category_id, published_at, view_count, velocity, now),
+        )
+        if tag_ids != old_tag_ids:
+            db.execute("DELETE FROM video_tags WHERE video_id = ?", (video_id,))
+            db.executemany("INSERT INTO video_tags (tag_id, video_id) VALUES (?, ?)", [(tag_id, video_id) for tag_id in tag_ids])
+        self._add(db, tag_ids, 1, view_count, velocity, velocity * velocity)
+        db.executemany("DELETE FROM tag_stats WHERE tag_id = ? AND videos <= 0", [(tag_id,) for tag_id in old_tag_ids])
+        return True
+
+    # Fold videos.list items into the index. Items need snippet and
+    # statistics the first time a video is seen; later items may carry
+    # either part. The index is shared by every user, so items fetched with
+    # a user's credentials (scope from private_scope) need the status part
+    # and are only indexed when public. Returns the number of videos
+    # indexed or updated.
+    def add_videos(self, items, scope=None):
+        if not self.enabled:
+            return 0
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            with db:
+                indexed = sum(self._ingest(db, item, now, scope is not None) for item in items)
+            if indexed:
+                self._ranks_dirty = True
+            return indexed
+
+    def _rows(self, sql, parameters=()):
+        with self._lock:
+            return self._connect().execute(sql, parameters).fetchall()
+
+    # Most viewed tags: [{tag, videos, total_views, velocity}, ...]
+    def top_tags(self, limit=20, min_videos=1):
+        rows = self._rows(
+            "SELECT tags.tag, s.videos, s.total_views, s.sum_velocity FROM tag_stats s"
+            " JOIN tags ON tags.tag_id = s.tag_id WHERE s.videos >= ?"
+            " ORDER BY s.total_views DESC LIMIT ?",
+            (min_videos, limit),
+        )
+        return [self._tag_row(*row) for row in rows]
+
+    # Rebuild the rank snapshot in one pass over the total_views order, at
+    # most every RANK_REFRESH seconds and only after the index changed
+    def _refresh_ranks(self, db):
+        now = time.monotonic()
+        if not self._ranks_dirty or (self._ranked_at is not None and now - self._ranked_at < RANK_REFRESH):
+            return
+        with db:
+            db.execute("DELETE FROM tag_ranks")
+            db.execute(
+                "INSERT INTO tag_ranks (tag_id, rank)"
+                " SELECT tag_id, RANK() OVER (ORDER BY total_views DESC) FROM tag_stats"
+            )
+        self._ranks_dirty = False
+        self._ranked_at = now
+
+    # Aggregates and overall rank (by total views) for specific tags, in
+    # the order given; tags not in the index get rank None. Ranks come from
+    # the snapshot, so they may lag new videos by up to RANK_REFRESH.
+    def tag_rankings(self, tags):
+        names = list(dict.fromkeys(normalize_tag(tag) for tag in tags))
+        with self._lock:
+            db = self._connect()
+            self._refresh_ranks(db)
+            found = {}
+            if names:
+                for tag, videos, total_views, sum_velocity, rank in db.execute(
+                    "SELECT tags.tag, s.videos, s.total_views, s.sum_velocity, r.rank FROM tags"
+                    " JOIN tag_stats s ON s.tag_id = tags.tag_id LEFT JOIN tag_ranks r ON r.tag_id = tags.tag_id"
+                    f" WHERE tags.tag IN ({', '.join('?' * len(names))})",
+                    names,
+                ):
+                    if rank is None:
+                        # New since the snapshot: count the tags above it on the index
+                        rank = db.execute("SELECT COUNT(*) + 1 FROM tag_stats WHERE total_views > ?", (total_views,)).fetchone()[0]
+                    found[tag] = (videos, total_views, sum_velocity, rank)
+
+        results = []
+        for tag in tags:
+            row = found.get(normalize_tag(tag))
+            if row:
+                videos, total_views, sum_velocity, rank = row
+                results.append(dict(self._tag_row(tag, videos, total_views, sum_velocity), rank=rank))
+            else:
+                results.append({"tag": tag, "videos": 0, "total_views": 0, "velocity": None, "rank": None})
+        return results
+
+    # Tags that appear on the same videos as `tag`, with the share of
+    # `tag`'s videos they appear on and their Jaccard similarity
+    def co_occurring(self, tag, limit=20):
+        rows = self._rows(
+            "SELECT other.tag, COUNT(*), s.videos, base.videos FROM tags t"
+            " JOIN tag_stats base ON base.tag_id = t.tag_id"
+            " JOIN video_tags a ON a.tag_id = t.tag_id"
+            " JOIN video_tags b ON b.video_id = a.video_id AND b.tag_id != a.tag_id"
+            " JOIN tag_stats s ON s.tag_id = b.tag_id"
+            " JOIN tags other ON other.tag_id = b.tag_id"
+            " WHERE t.tag = ? GROUP BY b.tag_id ORDER BY COUNT(*) DESC, s.videos DESC LIMIT ?",
+            (normalize_tag(tag), limit),
+        )
+        return [{
+            "tag": other,
+            "videos_together": together,
+            "share": together / base_videos,
+            "jaccard": together / (base_videos + other_videos - together),
+        } for other, together, other_videos, base_videos in rows]
+
+    # Tags most correlated with view velocity within a niche: all videos,
+    # one category, or the videos carrying a niche tag (itself excluded)
+    def velocity_tags(self, niche=None, category_id=None, min_videos=MIN_VIDEOS, limit=20):
+        if niche:
+            scope = (
+                " FROM video_tags n JOIN videos v ON v.video_id = n.video_id"
+                " WHERE n.tag_id = (SELECT tag_id FROM tags WHERE tag = ?)"
+            )
+            parameters = (normalize_tag(niche),)
+        elif category_id:
+            scope = " FROM videos v WHERE v.category_id = ?"
+            parameters = (category_id,)
+        else:
+            scope, parameters = None, ()
+
+        if scope is None:
+            population = self._rows("SELECT videos, sum_velocity, sum_velocity_sq FROM totals WHERE id = 0")
+            candidates = "SELECT tag_id, videos, sum_velocity, total_views FROM tag_stats WHERE videos >= ?"
+        else:
+            population = self._rows("SELECT COUNT(*), SUM(v.velocity), SUM(v.velocity * v.velocity)" + scope, parameters)
+            candidates = (
+                "SELECT vt.tag_id, COUNT(*) AS videos, SUM(v.velocity) AS sum_velocity, SUM(v.view_count) AS total_views"
+                + scope.replace(" WHERE", " JOIN video_tags vt ON vt.video_id = v.video_id WHERE", 1)
+                + " GROUP BY vt.tag_id HAVING COUNT(*) >= ?"
+            )
+        if not population or not population[0][0]:
+            return []
+        n, s, ss = population[0]
+
+        # Rank in SQL by the correlation without its constant factors: the
+        # difference in mean velocity d times sqrt(n1 * n0), squared with its
+        # sign kept (d * |d| * n1 * n0) so no sqrt is needed. The niche tag
+        # itself sorts as 0 and is dropped below, hence the extra row.
+        difference = "(c.sum_velocity / c.videos - (? - c.sum_velocity) / (? - c.videos))"
+        rows = self._rows(
+            f"SELECT tags.tag, c.videos, c.sum_velocity, c.total_views FROM ({candidates}) c"
+            " JOIN tags ON tags.tag_id = c.tag_id"
+            f" ORDER BY CASE WHEN c.videos >= ? THEN 0 ELSE {difference} * ABS({difference}) * c.videos * (? - c.videos) END DESC"
+            " LIMIT ?",
+            parameters + (min_videos, n, s, n, s, n, n, limit + 1),
+        )
+
+        results = []
+        for tag, videos, sum_velocity, total_views in rows:
+            if niche and tag == normalize_tag(niche):
+                continue
+            row = self._tag_row(tag, videos, total_views, sum_velocity)
+            row["lift"] = math.expm1(sum_velocity / videos) / max(math.expm1(s / n), 1e-9)
+            row["correlation"] = point_biserial(n, s, ss, videos, sum_velocity)
+            results.append(row)
+        results.sort(key=lambda row: row["correlation"], reverse=True)
+        return results[:limit]
+
+    # velocity is the typical (geometric mean) views/day of the tag's videos
+    def _tag_row(self, tag, videos, total_views, sum_velocity):
+        return {
+            "tag": tag,
+            "videos": videos,
+            "total_views": total_views,
+            "velocity": math.expm1(sum_velocity / videos) if videos else None,
+        }
+
+    def clear(self):
+        with self._lock:
+            db = self._connect()
+            with db:
+                for table in ("videos", "tags", "video_tags", "tag_stats", "tag_ranks", "totals"):
+                    db.execute(f"DELETE FROM {table}")
+            self._ranks_dirty = True
+
+    def stats(self):
+        with self._lock:
+            db = self._connect()
+            videos = db.execute("SELECT videos FROM totals WHERE id = 0").fetchone()
+            tags = db.execute("SELECT COUNT(*) FROM tag_stats").fetchone()[0]
+        return {"videos": videos[0] if videos else 0, "tags": tags}
+
+
+tag_index = TagIndex()
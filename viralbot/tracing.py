@@ -0,0 +1,193 @@
+# Lightweight spans for the hot paths
+#
+# Spans time a stage (API call, client build, channel scrape, render step)
+# and carry attributes such as the API method, a hash of the parameters, the
+# response size and whether a cache answered. Nesting follows a context
+# variable, so spans opened in fetch engine workers attach to the caller's
+# span. Finished spans are kept in a bounded buffer and can be exported as
+# JSON lines or as OpenTelemetry (OTLP/JSON) resource spans.
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from collections import deque
+
+MAX_SPANS = 5000
+SERVICE_NAME = "youtube-viral-bot"
+
+_current = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._start = time.perf_counter()
+        self.duration = None
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, error):
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration_ms(self):
+        return None if self.duration is None else self.duration * 1000
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Tracer:
+    def __init__(self, max_spans=MAX_SPANS, enabled=None):
+        if enabled is None:
+            enabled = os.environ.get("VIRALBOT_TRACING", "1") != "0"
+        self.enabled = enabled
+        self._spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    # Open a span as a child of the current one (or a new trace with
+    # root=True). Use span() as a context manager, or call end() yourself
+    # for spans that don't fit a with-block.
+    def start(self, name, activate=False, root=False, **attributes):
+        span = Span(name, None if root else _current.get(), attributes)
+        if activate:
+            span._token = _current.set(span)
+        return span
+
+    def end(self, span):
+        if span.end_ns is not None:
+            return
+        span.duration = time.perf_counter() - span._start
+        span.end_ns = time.time_ns()
+        if span._token is not None:
+            try:
+                _current.reset(span._token)
+            except ValueError:
+                # Ended from another context; nothing to restore
+                pass
+        if self.enabled:
+            with self._lock:
+                self._spans.append(span)
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        span = self.start(name, activate=True, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            span.fail(e)
+            raise
+        finally:
+            self.end(span)
+
+    def traced(self, name=None):
+        def decorator(function):
+            span_name = name or f"{function.__module__}.{function.__qualname__}"
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def spans(self, trace_id=None):
+        with self._lock:
+            spans = list(self._spans)
+        if trace_id is not None:
+            spans = [span for span in spans if span.trace_id == trace_id]
+        return spans
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+    # Per span name: count, total, mean, p95 and max latency in ms
+    def summary(self, spans=None):
+        durations = {}
+        for span in self.spans() if spans is None else spans:
+            durations.setdefault(span.name, []).append(span.duration_ms)
+        summary = {}
+        for name, values in durations.items():
+            values.sort()
+            summary[name] = {
+                "count": len(values),
+                "total_ms": sum(values),
+                "mean_ms": sum(values) / len(values),
+                "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+                "max_ms": values[-1],
+            }
+        return summary
+
+    def to_jsonl(self, spans=None):
+        return "".join(json.dumps(span.to_dict()) + "\n" for span in (self.spans() if spans is None else spans))
+
+    # OTLP/JSON export request, accepted by OpenTelemetry collectors
+    def to_otlp(self, spans=None):
+        return json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{
+                "scope": {"name": "viralbot.tracing"},
+                "spans": [{
+                    "traceId": span.trace_id,
+                    "spanId": span.span_id,
+                    "parentSpanId": span.parent_id or "",
+                    "name": span.name,
+                    "kind": 3 if span.name.startswith("youtube.") else 1,  # CLIENT / INTERNAL
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.end_ns),
+                    "attributes": [
+                        {"key": key, "value": _otlp_value(value)}
+                        for key, value in span.attributes.items() if value is not None
+                    ],
+                    "status": {"code": 2, "message": span.error} if span.status == "error" else {"code": 1},
+                } for span in (self.spans() if spans is None else spans)],
+            }],
+        }]})
+
+
+tracer = Tracer()
+
+
+def span(name, **attributes):
+    return tracer.span(name, **attributes)
+
+
+def current_span():
+    return _current.get()
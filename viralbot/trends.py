@@ -0,0 +1,179 @@
+# Google Trends interest for many keywords in few requests
+#
+# One TrendReq session is reused for every request. Keywords are sent in
+# pytrends' 5-term payloads, each carrying a shared reference term, and every
+# keyword's interest is reported relative to that term (reference = 100) so
+# numbers from different payloads, and from the cache, are comparable.
+# Requests are spaced out adaptively: a 429 doubles the spacing and retries,
+# successes slowly bring it back down.
+import os
+import threading
+import time
+
+from pytrends.exceptions import TooManyRequestsError
+from pytrends.request import TrendReq
+
+from .tracing import span
+
+MAX_TERMS = 5  # pytrends/Google Trends payload limit
+REFERENCE_TERM = "weather"
+TIMEFRAME = "now 7-d"
+CACHE_TTL = 6 * 60 * 60
+MIN_INTERVAL = float(os.environ.get("VIRALBOT_TRENDS_INTERVAL", 1.0))
+MAX_INTERVAL = 60.0
+MAX_RETRIES = 5
+
+# trending_searches() takes a country name, the interest endpoints a geo code
+PN_TO_GEO = {
+    "argentina": "AR", "australia": "AU", "austria": "AT", "belgium": "BE", "brazil": "BR",
+    "canada": "CA", "chile": "CL", "colombia": "CO", "czechia": "CZ", "denmark": "DK",
+    "egypt": "EG", "finland": "FI", "france": "FR", "germany": "DE", "greece": "GR",
+    "hong_kong": "HK", "hungary": "HU", "india": "IN", "indonesia": "ID", "ireland": "IE",
+    "israel": "IL", "italy": "IT", "japan": "JP", "kenya": "KE", "malaysia": "MY",
+    "mexico": "MX", "netherlands": "NL", "new_zealand": "NZ", "nigeria": "NG", "norway": "NO",
+    "philippines": "PH", "poland": "PL", "portugal": "PT", "romania": "RO", "russia": "RU",
+    "saudi_arabia": "SA", "singapore": "SG", "south_africa": "ZA", "south_korea": "KR",
+    "spain": "ES", "sweden": "SE", "switzerland": "CH", "taiwan": "TW", "thailand": "TH",
+    "turkey": "TR", "ukraine": "UA", "united_kingdom": "GB", "united_states": "US", "vietnam": "VN",
+}
+
+
+class TrendsClient:
+    def __init__(self, hl="en-US", tz=360, reference_term=REFERENCE_TERM, timeframe=TIMEFRAME,
+                 cache_ttl=CACHE_TTL, min_interval=MIN_INTERVAL):
+        self.hl = hl
+        self.tz = tz
+        self.reference_term = reference_term
+        self.timeframe = timeframe
+        self.cache_ttl = cache_ttl
+        self.min_interval = min_interval
+        self.requests = 0
+        self.throttled = 0
+        self._session = None
+        self._interval = min_interval
+        self._last_request = 0.0
+        # One session means one request at a time. Requests may sleep through
+        # pacing and backoff, so they hold their own lock and cache lookups
+        # never wait on them.
+        self._request_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._cache = {}  # (kind, geo, keyword, timeframe) -> (fetched_at, value)
+
+    @property
+    def session(self):
+        if self._session is None:
+            self._session = TrendReq(hl=self.hl, tz=self.tz)
+        return self._session
+
+    # (hit, value); a cached value may itself be None
+    def _cached(self, key):
+        entry = self._cache.get(key)
+        if entry is not None and time.time() - entry[0] <= self.cache_ttl:
+            return True, entry[1]
+        return False, None
+
+    # Callers hold _request_lock
+    def _request(self, fn):
+        error = None
+        for _ in range(MAX_RETRIES):
+            wait = self._last_request + self._interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                with span("trends.request", waited=max(wait, 0.0)):
+                    result = fn()
+                self._interval = max(self.min_interval, self._interval * 0.8)
+                return result
+            except TooManyRequestsError as e:
+                error = e
+                self.throttled += 1
+                self._interval = min(self._interval * 2, MAX_INTERVAL)
+            finally:
+                self._last_request = time.monotonic()
+                self.requests += 1
+        raise error
+
+    def trending_searches(self, pn="united_states"):
+        key = ("trending", pn, None, None)
+        with self._lock:
+            hit, keywords = self._cached(key)
+        if hit:
+            return keywords
+        with self._request_lock:
+            # Another session may have fetched it while this one waited
+            with self._lock:
+                hit, keywords = self._cached(key)
+            if hit:
+                return keywords
+            df = self._request(lambda: self.session.trending_searches(pn=pn))
+            keywords = df[0].tolist()
+            with self._lock:
+                self._cache[key] = (time.time(), keywords)
+        return keywords
+
+    # Fill results from the cache; returns the keywords it didn't have
+    def _lookup(self, keywords, geo, timeframe, results):
+        missing = []
+        with self._lock:
+            for keyword in keywords:
+                hit, value = self._cached(("interest", geo, keyword.lower(), timeframe))
+                if hit:
+                    results[keyword] = value
+                else:
+                    missing.append(keyword)
+        return missing
+
+    # Mean interest for each keyword relative to the reference term (=100).
+    # Returns {keyword: value}; None where Trends had too little data.
+    def interest(self, keywords, geo="", timeframe=None):
+        timeframe = timeframe or self.timeframe
+        keywords = list(dict.fromkeys(k for k in keywords if k))
+        reference = self.reference_term.lower()
+        results = {keyword: 100.0 for keyword in keywords if keyword.lower() == reference}
+        missing = self._lookup([k for k in keywords if k not in results], geo, timeframe, results)
+
+        # Each payload is the reference term plus up to four keywords
+        batch_size = MAX_TERMS - 1
+        for offset in range(0, len(missing), batch_size):
+            with self._request_lock:
+                batch = self._lookup(missing[offset:offset + batch_size], geo, timeframe, results)
+                if not batch:
+                    continue
+                values = self._batch_interest(batch, geo, timeframe)
+                fetched_at = time.time()
+                with self._lock:
+                    for keyword in batch:
+                        results[keyword] = values.get(keyword)
+                        self._cache[("interest", geo, keyword.lower(), timeframe)] = (fetched_at, values.get(keyword))
+        return {keyword: results.get(keyword) for keyword in keywords}
+
+    def _batch_interest(self, batch, geo, timeframe):
+        terms = [self.reference_term] + batch
+
+        def fetch():
+            self.session.build_payload(terms, timeframe=timeframe, geo=geo)
+            return self.session.interest_over_time()
+
+        df = self._request(fetch)
+        if df.empty or self.reference_term not in df:
+            return {}
+        means = df[terms].mean()
+        reference = means[self.reference_term]
+        if reference <= 0:
+            return {}
+        return {keyword: float(means[keyword] / reference * 100) for keyword in batch}
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "interval": self._interval,
+            "cached": len(self._cache),
+        }
+
+
+trends_client = TrendsClient()
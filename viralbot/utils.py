@@ -0,0 +1,69 @@
+# Helpers shared by the app and the API modules
+import os
+import re
+from urllib.parse import parse_qs, urlparse
+
+_VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+_DURATION_RE = re.compile(
+    r"^P(?:(?P<days>\d+)D)?(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?$"
+)
+
+
+# Helper function to convert large numbers to thousands, millions, etc.
+def format_number(number):
+    if number >= 1_000_000_000:
+        return f"{number / 1_000_000_000:.1f}B"
+    elif number >= 1_000_000:
+        return f"{number / 1_000_000:.1f}M"
+    elif number >= 1_000:
+        return f"{number / 1_000:.1f}K"
+    return str(number)
+
+
+# Accepts a bare video ID or any of the usual URL shapes
+# (watch?v=, youtu.be/, /shorts/, /embed/, /live/)
+def extract_video_id(video_url):
+    video_url = (video_url or "").strip()
+    if _VIDEO_ID_RE.match(video_url):
+        return video_url
+
+    parsed = urlparse(video_url if "://" in video_url else f"https://{video_url}")
+    query_id = parse_qs(parsed.query).get("v")
+    if query_id:
+        return query_id[0]
+
+    # Take the last part of the path, dropping any query string (e.g. ?si=...)
+    video_id = parsed.path.rstrip("/").split("/")[-1]
+    return video_id
+
+
+def is_valid_video_id(video_id):
+    return bool(video_id and _VIDEO_ID_RE.match(video_id))
+
+
+# Split an iterable into lists of at most `size` items
+def chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ISO 8601 duration from contentDetails.duration (e.g. PT1H2M3S) in seconds
+def parse_duration(duration):
+    match = _DURATION_RE.match(duration or "")
+    if not match:
+        return None
+    parts = {name: int(value or 0) for name, value in match.groupdict().items()}
+    return parts["days"] * 86400 + parts["hours"] * 3600 + parts["minutes"] * 60 + parts["seconds"]
+
+
+# Directory for on-disk caches and indexes (override with VIRALBOT_DATA_DIR)
+def data_path(name):
+    directory = os.environ.get("VIRALBOT_DATA_DIR") or os.path.join(os.path.expanduser("~"), ".youtube_viral_bot")
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, name)
@@ -0,0 +1,357 @@
+# View, like and comment velocity from periodic statistics snapshots
+#
+# A background collector snapshots the statistics of a watchlist of videos
+# and channels using the batched videos.list/channels.list calls and appends
+# them to a Parquet store partitioned by kind and day. Velocity queries scan
+# the store a chunk of IDs at a time with column projection and partition
+# pruning, so histories of millions of samples never have to be loaded
+# whole.
+import datetime
+import json
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from .channel_batch import fetch_channels
+from .quota import LOW, quota_priority
+from .utils import data_path
+from .video_batch import fetch_videos
+
+COLLECT_INTERVAL = 15 * 60
+# IDs processed together by the velocity queries
+QUERY_CHUNK_SIZE = 2_000
+KINDS = ("video", "channel")
+METRICS = ("views", "likes", "comments", "subscribers", "videos")
+
+SNAPSHOT_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("ts", pa.timestamp("s", tz="UTC")),
+    ("views", pa.int64()),
+    ("likes", pa.int64()),
+    ("comments", pa.int64()),
+    ("subscribers", pa.int64()),
+    ("videos", pa.int64()),
+])
+_PARTITIONING = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+
+
+def _int(value):
+    return int(value) if value is not None else None
+
+
+def _utc(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return datetime.datetime.fromtimestamp(value, datetime.timezone.utc)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value
+
+
+class Watchlist:
+    # Videos and channels to snapshot, saved as JSON
+
+    def __init__(self, path=None):
+        self._path = path
+        self._lock = threading.Lock()
+        self._ids = None
+
+    @property
+    def path(self):
+        if self._path is None:
+            self._path = data_path("watchlist.json")
+        return self._path
+
+    # Loaded on first use so importing the module never touches the disk
+    def _load(self):
+        if self._ids is None:
+            self._ids = {kind: set() for kind in KINDS}
+            if os.path.exists(self.path):
+                with open(self.path) as f:
+                    for kind, ids in json.load(f).items():
+                        self._ids[kind] = set(ids)
+        return self._ids
+
+    def _save(self):
+        with open(self.path + ".tmp", "w") as f:
+            json.dump({kind: sorted(ids) for kind, ids in self._ids.items()}, f)
+        os.replace(self.path + ".tmp", self.path)
+
+    def add(self, kind, ids):
+        with self._lock:
+            self._load()[kind].update(ids)
+            self._save()
+
+    def remove(self, kind, ids):
+        with self._lock:
+            self._load()[kind].difference_update(ids)
+            self._save()
+
+    def ids(self, kind):
+        with self._lock:
+            return sorted(self._load()[kind])
+
+
+class SnapshotStore:
+    # Append-only Parquet files under <root>/kind=<kind>/date=<YYYY-MM-DD>/
+
+    def __init__(self, root=None):
+        self._root = root
+
+    @property
+    def root(self):
+        if self._root is None:
+            self._root = data_path("snapshots")
+        return self._root
+
+    def _kind_dir(self, kind):
+        return os.path.join(self.root, f"kind={kind}")
+
+    def append(self, kind, rows, ts=None):
+        if not rows:
+            return None
+        ts = _utc(ts) or datetime.datetime.now(datetime.timezone.utc)
+        for row in rows:
+            row.setdefault("ts", ts)
+        directory = os.path.join(self._kind_dir(kind), f"date={ts.date().isoformat()}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{int(ts.timestamp())}-{uuid.uuid4().hex[:8]}.parquet")
+        pq.write_table(pa.Table.from_pylist(rows, schema=SNAPSHOT_SCHEMA), path)
+        return path
+
+    def dataset(self, kind):
+        directory = self._kind_dir(kind)
+        if not os.path.isdir(directory):
+            return None
+        return ds.dataset(directory, format="parquet", partitioning=_PARTITIONING)
+
+    @staticmethod
+    def _filter(ids=None, start=None, end=None):
+        expression = None
+
+        def both(condition):
+            return condition if expression is None else expression & condition
+
+        # Day partitions outside the range are skipped without being opened
+        if start is not None:
+            expression = both((ds.field("date") >= start.date().isoformat()) & (ds.field("ts") >= pa.scalar(start, pa.timestamp("s", tz="UTC"))))
+        if end is not None:
+            expression = both((ds.field("date") <= end.date().isoformat()) & (ds.field("ts") <= pa.scalar(end, pa.timestamp("s", tz="UTC"))))
+        if ids is not None:
+            expression = both(ds.field("id").isin(list(ids)))
+        return expression
+
+    # Stream record batches with only the requested columns
+    def scan(self, kind, ids=None, start=None, end=None, columns=None):
+        dataset = self.dataset(kind)
+        if dataset is None:
+            return
+        yield from dataset.to_batches(columns=columns, filter=self._filter(ids, _utc(start), _utc(end)))
+
+    def ids(self, kind):
+        seen = set()
+        for batch in self.scan(kind, columns=["id"]):
+            seen.update(pc.unique(batch.column("id")).to_pylist())
+        return sorted(seen)
+
+    def history(self, kind, ids, start=None, end=None, metric="views"):
+        batches = list(self.scan(kind, ids=ids, start=start, end=end, columns=["id", "ts", metric]))
+        if not batches:
+            return pd.DataFrame(columns=["id", "ts", metric])
+        return pa.Table.from_batches(batches).to_pandas().sort_values(["id", "ts"], ignore_index=True)
+
+    # Merge a finished day's part files into one file sorted by (id, ts)
+    def compact(self, kind, date):
+        directory = os.path.join(self._kind_dir(kind), f"date={date}")
+        parts = sorted(f for f in os.listdir(directory) if f.endswith(".parquet")) if os.path.isdir(directory) else []
+        if len(parts) < 2:
+            return False
+        table = pq.read_table([os.path.join(directory, f) for f in parts], schema=SNAPSHOT_SCHEMA)
+        table = table.sort_by([("id", "ascending"), ("ts", "ascending")])
+        merged = os.path.join(directory, f"part-compacted-{uuid.uuid4().hex[:8]}.parquet")
+        pq.write_table(table, merged)
+        for f in parts:
+            os.remove(os.path.join(directory, f))
+        return True
+
+    def compact_before(self, day):
+        for kind in KINDS:
+            directory = self._kind_dir(kind)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if name.startswith("date=") and name[5:] < day.isoformat():
+                    self.compact(kind, name[5:])
+
+    # Per-sample velocity for every ID, one DataFrame per chunk of IDs.
+    # Samples from `window` before `start` are read so growth is complete.
+    def iter_velocity(self, kind, metric="views", ids=None, start=None, end=None, window=datetime.timedelta(hours=24)):
+        start, end = _utc(start), _utc(end)
+        ids = list(ids) if ids is not None else self.ids(kind)
+        scan_start = start - window if start is not None else None
+        for offset in range(0, len(ids), QUERY_CHUNK_SIZE):
+            chunk = ids[offset:offset + QUERY_CHUNK_SIZE]
+            batches = list(self.scan(kind, ids=chunk, start=scan_start, end=end, columns=["id", "ts", metric]))
+            if not batches:
+                continue
+            table = pa.Table.from_batches(batches)
+            codes, names = pd.factorize(table.column("id").to_numpy(zero_copy_only=False))
+            ts = table.column("ts").cast(pa.timestamp("s", tz="UTC")).cast(pa.int64()).to_numpy()
+            values = table.column(metric).to_numpy(zero_copy_only=False).astype("float64")
+            result = compute_velocity(codes, ts, values, window.total_seconds())
+            df = pd.DataFrame({
+                "id": pd.Categorical.from_codes(result["codes"], names),
+                "ts": pd.to_datetime(result["ts"], unit="s", utc=True),
+                metric: result["values"],
+                "per_hour": result["per_hour"],
+                "acceleration": result["acceleration"],
+                "window_growth": result["window_growth"],
+                "window_growth_pct": result["window_growth_pct"],
+            })
+            if start is not None:
+                df = df[df["ts"] >= start].reset_index(drop=True)
+            yield df
+
+    # Latest velocity figures per ID
+    def velocity_summary(self, kind, metric="views", ids=None, start=None, end=None, window=datetime.timedelta(hours=24)):
+        frames = []
+        for df in self.iter_velocity(kind, metric, ids, start, end, window):
+            last = df["id"].ne(df["id"].shift(-1)).to_numpy()
+            frames.append(df[last])
+        if not frames:
+            return pd.DataFrame(columns=["id", "ts", metric, "per_hour", "acceleration", "window_growth", "window_growth_pct"])
+        summary = pd.concat(frames, ignore_index=True)
+        summary["id"] = summary["id"].astype(str)
+        return summary.sort_values("per_hour", ascending=False, ignore_index=True)
+
+
+# Vectorized velocity over samples of many series at once.
+# codes identify the series, ts are epoch seconds. Rates are per hour,
+# acceleration per hour squared, and growth is measured against the oldest
+# sample within `window_seconds` of each sample.
+def compute_velocity(codes, ts, values, window_seconds):
+    order = np.lexsort((ts, codes))
+    codes, ts, values = codes[order], ts[order], values[order]
+    n = len(codes)
+    index = np.arange(n)
+
+    same_series = np.zeros(n, dtype=bool)
+    same_series[1:] = codes[1:] == codes[:-1]
+    dt_hours = np.zeros(n)
+    dt_hours[1:] = (ts[1:] - ts[:-1]) / 3600.0
+    valid = same_series & (dt_hours > 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        per_hour = np.full(n, np.nan)
+        per_hour[1:] = (values[1:] - values[:-1]) / dt_hours[1:]
+        per_hour[~valid] = np.nan
+
+        acceleration = np.full(n, np.nan)
+        acceleration[1:] = (per_hour[1:] - per_hour[:-1]) / dt_hours[1:]
+        acceleration[~valid] = np.nan
+
+        # Find the first sample inside the trailing window with one sorted
+        # search over (series, time) keys, clamped to the series start
+        series_start = np.maximum.accumulate(np.where(same_series, 0, index))
+        span = int(ts.max() - ts.min()) + int(window_seconds) + 1 if n else 1
+        keys = codes.astype(np.int64) * span + (ts - (ts.min() if n else 0))
+        window_start = np.maximum(np.searchsorted(keys, keys - int(window_seconds), side="left"), series_start)
+
+        baseline = values[window_start]
+        window_growth = values - baseline
+        window_growth_pct = np.where(baseline > 0, window_growth / baseline * 100.0, np.nan)
+
+    return {
+        "codes": codes,
+        "ts": ts,
+        "values": values,
+        "per_hour": per_hour,
+        "acceleration": acceleration,
+        "window_growth": window_growth,
+        "window_growth_pct": window_growth_pct,
+    }
+
+
+class SnapshotCollector:
+    # Background thread that snapshots the watchlist every `interval` seconds
+
+    def __init__(self, store, watchlist, interval=COLLECT_INTERVAL):
+        self.store = store
+        self.watchlist = watchlist
+        self.interval = interval
+        self.youtube = None
+        self.last_run = None
+        self.last_error = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def collect_once(self, youtube=None):
+        youtube = youtube or self.youtube
+        ts = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        counts = {}
+        # Snapshots are background work and yield to interactive requests
+        with quota_priority(LOW):
+            items, _ = fetch_videos(youtube, self.watchlist.ids("video"), part="statistics")
+            self.store.append("video", [{
+                "id": video_id,
+                "views": _int(item["statistics"].get("viewCount")),
+                "likes": _int(item["statistics"].get("likeCount")),
+                "comments": _int(item["statistics"].get("commentCount")),
+            } for video_id, item in items.items()], ts)
+            counts["video"] = len(items)
+
+            items, _ = fetch_channels(youtube, self.watchlist.ids("channel"), part="statistics")
+            self.store.append("channel", [{
+                "id": channel_id,
+                "views": _int(item["statistics"].get("viewCount")),
+                "subscribers": _int(item["statistics"].get("subscriberCount")),
+                "videos": _int(item["statistics"].get("videoCount")),
+            } for channel_id, item in items.items()], ts)
+            counts["channel"] = len(items)
+
+        self.last_run = ts
+        return counts
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.collect_once()
+                self.store.compact_before(datetime.datetime.now(datetime.timezone.utc).date())
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+            self._stop.wait(self.interval)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # Start collecting with the given client (or switch to a new one)
+    def start(self, youtube):
+        with self._lock:
+            self.youtube = youtube
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="snapshot-collector", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+snapshot_store = SnapshotStore()
+watchlist = Watchlist()
+snapshot_collector = SnapshotCollector(snapshot_store, watchlist)
@@ -0,0 +1,107 @@
+# Bulk video lookups: up to 50 IDs per videos.list call
+import pandas as pd
+
+from .utils import chunked, extract_video_id, is_valid_video_id, parse_duration
+from .fetch_engine import fetch_all
+from .tag_index import tag_index
+from .youtube_api import private_scope
+
+MAX_IDS_PER_CALL = 50
+VIDEO_PARTS = "snippet,statistics,contentDetails,status"
+
+VIDEO_COLUMNS = {
+    "video_id": "string",
+    "title": "string",
+    "channel_id": "string",
+    "channel_title": "string",
+    "published_at": "datetime64[ns, UTC]",
+    "category_id": "string",
+    "duration": "string",
+    "duration_seconds": "Int64",
+    "view_count": "Int64",
+    "like_count": "Int64",
+    "comment_count": "Int64",
+    "tag_count": "Int64",
+}
+FAILURE_COLUMNS = {"input": "string", "video_id": "string", "error": "string"}
+
+
+# Turn URLs or IDs into a de-duplicated list of IDs (first occurrence wins)
+# plus failures for inputs that don't look like a video at all
+def normalize_video_ids(videos):
+    video_ids, failures, seen = [], [], set()
+    for video in videos:
+        video_id = extract_video_id(video)
+        if not is_valid_video_id(video_id):
+            failures.append({"input": video, "video_id": video_id, "error": "Invalid video URL or ID"})
+            continue
+        if video_id not in seen:
+            seen.add(video_id)
+            video_ids.append(video_id)
+    return video_ids, failures
+
+
+# Fetch raw video resources for many IDs. Returns ({id: item}, failures);
+# a failed call only fails the IDs in its own chunk. Chunks are fetched
+# concurrently through the fetch engine. Fetched videos feed the tag index.
+def fetch_videos(youtube, video_ids, part=VIDEO_PARTS):
+    chunks = list(chunked(video_ids, MAX_IDS_PER_CALL))
+    results = fetch_all(
+        (youtube.videos().list, {"part": part, "id": ",".join(chunk)}) for chunk in chunks
+    )
+
+    items, failures = {}, []
+    for chunk, result in zip(chunks, results):
+        if not result.ok:
+            failures.extend({"input": video_id, "video_id": video_id, "error": f"API request failed: {result.error}"} for video_id in chunk)
+            continue
+
+        for item in result.value.get("items", []):
+            items[item["id"]] = item
+        failures.extend(
+            {"input": video_id, "video_id": video_id, "error": "Video not found or private"}
+            for video_id in chunk if video_id not in items
+        )
+    tag_index.add_videos(items.values(), private_scope(getattr(youtube, "_http", None)))
+    return items, failures
+
+
+def video_row(item):
+    snippet = item.get("snippet", {})
+    statistics = item.get("statistics", {})
+    content_details = item.get("contentDetails", {})
+    return {
+        "video_id": item["id"],
+        "title": snippet.get("title"),
+        "channel_id": snippet.get("channelId"),
+        "channel_title": snippet.get("channelTitle"),
+        "published_at": snippet.get("publishedAt"),
+        "category_id": snippet.get("categoryId"),
+        "duration": content_details.get("duration"),
+        "duration_seconds": parse_duration(content_details.get("duration")),
+        "view_count": statistics.get("viewCount"),
+        "like_count": statistics.get("likeCount"),
+        "comment_count": statistics.get("commentCount"),
+        "tag_count": len(snippet.get("tags", [])) if snippet else None,
+    }
+
+
+def to_frame(rows, columns):
+    df = pd.DataFrame(rows, columns=list(columns))
+    for column, dtype in columns.items():
+        if dtype.startswith("datetime"):
+            df[column] = pd.to_datetime(df[column], utc=True, errors="coerce")
+        elif dtype == "Int64":
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype("Int64")
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+# Bulk video analytics for any iterable of video URLs or IDs.
+# Returns (videos_df, failures_df) with one row per unique video.
+def get_videos_bulk(youtube, videos, part=VIDEO_PARTS):
+    video_ids, failures = normalize_video_ids(videos)
+    items, fetch_failures = fetch_videos(youtube, video_ids, part=part)
+    rows = [video_row(items[video_id]) for video_id in video_ids if video_id in items]
+    return to_frame(rows, VIDEO_COLUMNS), to_frame(failures + fetch_failures, FAILURE_COLUMNS)
@@ -0,0 +1,147 @@
+# Shared per-video snapshot cache
+#
+# The video views all read overlapping parts of the same videos.list
+# resource. Parts are cached per video with their own TTL and only missing or
+# stale parts are requested, so moving between views of one video normally
+# costs a single API call.
+#
+# Public videos are shared by every session. Anything else fetched through
+# an OAuth client (private or unlisted videos of the signed-in account) is
+# kept under that client's credential key and only served back to it.
+import threading
+import time
+from collections import OrderedDict
+
+from .video_batch import fetch_videos
+from .youtube_api import private_scope
+
+# Counts move much faster than titles, tags and durations
+PART_TTLS = {
+    "statistics": 5 * 60,
+    "snippet": 6 * 60 * 60,
+    "contentDetails": 24 * 60 * 60,
+}
+DEFAULT_PART_TTL = 60 * 60
+# Parts fetched alongside whatever a view asks for. videos.list costs the
+# same quota whatever the part list, so this warms the cache for other views.
+# status says whether a video may be shared between users.
+PREFETCH_PARTS = ("snippet", "statistics", "contentDetails", "status")
+MAX_VIDEOS = 20_000
+
+
+class VideoSnapshotStore:
+    def __init__(self, part_ttls=None, prefetch_parts=PREFETCH_PARTS, max_videos=MAX_VIDEOS):
+        self.part_ttls = dict(PART_TTLS, **(part_ttls or {}))
+        self.prefetch_parts = tuple(prefetch_parts)
+        self.max_videos = max_videos
+        self.hits = 0
+        self.misses = 0
+        self._videos = OrderedDict()  # (scope, video_id) -> {part: (fetched_at, data)}
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, fetched_at, part, now):
+        return now - fetched_at <= self.part_ttls.get(part, DEFAULT_PART_TTL)
+
+    # A user's own copy of a video wins over the shared one
+    def _key(self, scope, video_id):
+        if scope is not None and (scope, video_id) in self._videos:
+            return scope, video_id
+        return None, video_id
+
+    def _missing_parts(self, key, parts, now):
+        cached = self._videos.get(key, {})
+        return frozenset(
+            part for part in parts
+            if part not in cached or not self._is_fresh(cached[part][0], part, now)
+        )
+
+    def _snapshot(self, key, parts):
+        cached = self._videos.get(key)
+        if cached is None or any(part not in cached for part in parts):
+            return None
+        self._videos.move_to_end(key)
+        item = {"id": key[1]}
+        item.update((part, cached[part][1]) for part in parts)
+        return item
+
+    # Returns ({video_id: item}, failures). Items carry exactly the requested
+    # parts, shaped like videos.list items.
+    def get_many(self, youtube, video_ids, parts):
+        parts = tuple(parts)
+        scope = private_scope(getattr(youtube, "_http", None))
+        now = time.time()
+
+        # Group videos by the parts they are missing so each group is one
+        # batched request
+        to_fetch = {}
+        with self._lock:
+            for video_id in dict.fromkeys(video_ids):
+                key = self._key(scope, video_id)
+                if not self._missing_parts(key, parts, now):
+                    self.hits += 1
+                    continue
+                self.misses += 1
+                missing = self._missing_parts(key, parts + self.prefetch_parts, now)
+                to_fetch.setdefault(missing, []).append(video_id)
+
+        failures = []
+        for missing, ids in to_fetch.items():
+            fetched, fetch_failures = fetch_videos(youtube, ids, part=",".join(sorted(missing)))
+            failures.extend(fetch_failures)
+            fetched_at = time.time()
+            with self._lock:
+                for video_id, item in fetched.items():
+                    cached = self._store_entry(scope, video_id, item)
+                    for part in missing:
+                        if part in item:
+                            cached[part] = (fetched_at, item[part])
+                while len(self._videos) > self.max_videos:
+                    self._videos.popitem(last=False)
+
+        with self._lock:
+            items = {}
+            for video_id in dict.fromkeys(video_ids):
+                item = self._snapshot(self._key(scope, video_id), parts)
+                if item is not None:
+                    items[video_id] = item
+        return items, failures
+
+    def get(self, youtube, video_id, parts):
+        items, failures = self.get_many(youtube, [video_id], parts)
+        return items.get(video_id), failures
+
+    # The entry a freshly fetched item belongs in: the shared one when the
+    # video is public or came through an API key, else the user's own. A
+    # video that changed visibility moves, keeping the parts already cached.
+    def _store_entry(self, scope, video_id, item):
+        target, other = (None, video_id), (scope, video_id)
+        if scope is not None:
+            known = self._videos.get(self._key(scope, video_id), {})
+            status = item.get("status") or known.get("status", (None, {}))[1]
+            if status.get("privacyStatus") != "public":
+                target, other = other, target
+        cached = self._videos.setdefault(target, {})
+        if scope is not None:
+            for part, value in self._videos.pop(other, {}).items():
+                cached.setdefault(part, value)
+        self._videos.move_to_end(target)
+        return cached
+
+    # Drop snapshots: all of them, one video's, or the private copies kept
+    # for one credential scope
+    def invalidate(self, video_id=None, scope=None):
+        with self._lock:
+            if video_id is None and scope is None:
+                self._videos.clear()
+            elif video_id is None:
+                for key in [key for key in self._videos if key[0] == scope]:
+                    del self._videos[key]
+            else:
+                self._videos.pop((scope, video_id), None)
+
+    def stats(self):
+        with self._lock:
+            return {"videos": len(self._videos), "hits": self.hits, "misses": self.misses}
+
+
+video_store = VideoSnapshotStore()
@@ -0,0 +1,351 @@
+# YouTube Data API clients and request execution
+#
+# Building a client re-reads the discovery document and opens a new HTTP
+# transport, so clients are built once per set of credentials and reused
+# across reruns and sessions until they go idle or the session signs out.
+import copy
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import google.oauth2.credentials
+import google_auth_httplib2
+import httplib2
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+from .quota import quota_ledger, quota_scheduler
+from .resilience import call_with_retries, error_reasons
+from .response_cache import cache_key, is_public_request, response_cache, response_cache_bypassed
+from .singleflight import single_flight
+from .tracing import span
+
+YOUTUBE_API_SERVICE = "youtube"
+YOUTUBE_API_VERSION = "v3"
+
+# Socket timeout for every API call, in seconds
+HTTP_TIMEOUT = 30
+# Idle transports kept per client
+POOL_SIZE = 8
+# Clients unused for this long are dropped
+CLIENT_IDLE_TTL = 60 * 60
+MAX_CLIENTS = 256
+# Alternative API root, e.g. a local stub for benchmarks
+API_ENDPOINT = os.environ.get("VIRALBOT_API_ENDPOINT") or None
+
+
+# Stable identity for a set of credentials. The refresh token survives token
+# refreshes, so a refreshed session keeps hitting the same cached client.
+def credential_key(credentials=None, developer_key=None):
+    if developer_key:
+        material = f"key|{developer_key}"
+    elif isinstance(credentials, dict):
+        material = "oauth|{}|{}".format(
+            credentials.get("client_id"),
+            credentials.get("refresh_token") or credentials.get("token"),
+        )
+    elif credentials is not None:
+        material = "oauth|{}|{}".format(
+            getattr(credentials, "client_id", None),
+            getattr(credentials, "refresh_token", None) or getattr(credentials, "token", None),
+        )
+    else:
+        return None
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+
+# The Google Cloud project a client's calls are billed to, which owns the
+# daily quota: the OAuth client ID, or the developer key's own project
+def project_key(credentials=None, developer_key=None):
+    if developer_key:
+        material = f"key|{developer_key}"
+    else:
+        if isinstance(credentials, dict):
+            client_id = credentials.get("client_id")
+        else:
+            client_id = getattr(credentials, "client_id", None)
+        if not client_id:
+            return None
+        material = f"client|{client_id}"
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+
+# Who a client's responses may be shared with: None for API-key clients,
+# which only ever see public data, otherwise the credential key of the OAuth
+# client, which may see its owner's private and unlisted resources. Takes a
+# client's or a request's http.
+def private_scope(http):
+    if getattr(http, "credentials", None) is None:
+        return None
+    return http.key
+
+
+# Session state may hold either a Credentials object or its dict form
+def to_credentials(credentials):
+    if isinstance(credentials, dict):
+        return google.oauth2.credentials.Credentials(**credentials)
+    return credentials
+
+
+class PooledHttp:
+    # Thread-safe stand-in for httplib2.Http. httplib2 connections must not be
+    # shared between threads, so every request borrows an authorized transport
+    # from a small pool and returns it afterwards, keeping keep-alive
+    # connections warm between calls.
+
+    def __init__(self, credentials=None, key=None, project=None, pool_size=POOL_SIZE, timeout=HTTP_TIMEOUT):
+        self.credentials = credentials
+        self.key = key
+        self.project = project
+        self.timeout = timeout
+        self._pool_size = pool_size
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _new_transport(self):
+        http = httplib2.Http(timeout=self.timeout)
+        if self.credentials is None:
+            return http
+        return google_auth_httplib2.AuthorizedHttp(self.credentials, http=http)
+
+    def _checkout(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._new_transport()
+
+    def _checkin(self, transport):
+        with self._lock:
+            if len(self._idle) < self._pool_size:
+                self._idle.append(transport)
+                return
+        transport.close()
+
+    def request(self, *args, **kwargs):
+        transport = self._checkout()
+        try:
+            return transport.request(*args, **kwargs)
+        finally:
+            self._checkin(transport)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for transport in idle:
+            transport.close()
+
+
+class _Entry:
+    def __init__(self, service, http, credentials):
+        self.service = service
+        self.http = http
+        self.credentials = credentials
+        self.last_used = time.monotonic()
+
+
+class ClientRegistry:
+    # Process-wide cache of built YouTube clients keyed by credential identity.
+    # hits/misses are exposed so reuse can be checked in production.
+
+    def __init__(self, idle_ttl=CLIENT_IDLE_TTL, max_clients=MAX_CLIENTS, api_endpoint=API_ENDPOINT):
+        self.idle_ttl = idle_ttl
+        self.max_clients = max_clients
+        self.api_endpoint = api_endpoint
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, credentials=None, developer_key=None):
+        credentials = to_credentials(credentials)
+        key = credential_key(credentials, developer_key)
+        if key is None:
+            raise ValueError("Credentials or an API key are required to build a YouTube client")
+
+        with self._lock:
+            self._evict_idle()
+            entry = self._clients.get(key)
+            if entry is not None and self._is_dead(entry):
+                self._drop(key)
+                entry = None
+            if entry is not None:
+                entry.last_used = time.monotonic()
+                self._clients.move_to_end(key)
+                self.hits += 1
+                return entry.service
+            self.misses += 1
+
+        # Build outside the lock so one slow build doesn't stall other sessions
+        http = PooledHttp(credentials, key=key, project=project_key(credentials, developer_key))
+        with span("youtube.build"):
+            service = build(
+                YOUTUBE_API_SERVICE,
+                YOUTUBE_API_VERSION,
+                http=http,
+                developerKey=developer_key,
+                static_discovery=True,
+                cache_discovery=False,
+                client_options={"api_endpoint": self.api_endpoint} if self.api_endpoint else None,
+            )
+
+        with self._lock:
+            existing = self._clients.get(key)
+            if existing is not None:
+                # Another session built the same client first
+                http.close()
+                return existing.service
+            self._clients[key] = _Entry(service, http, credentials)
+            while len(self._clients) > self.max_clients:
+                self._drop(next(iter(self._clients)))
+        return service
+
+    # Drop the client for a session that signed out or expired
+    def evict(self, credentials=None, developer_key=None):
+        key = credential_key(to_credentials(credentials), developer_key)
+        with self._lock:
+            if key in self._clients:
+                self._drop(key)
+                return True
+        return False
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._clients):
+                self._drop(key)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "clients": len(self._clients),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    # Expired credentials that can never be refreshed mean the session is over
+    def _is_dead(self, entry):
+        credentials = entry.credentials
+        if credentials is None:
+            return False
+        return bool(getattr(credentials, "expired", False)) and not getattr(credentials, "refresh_token", None)
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - self.idle_ttl
+        for key in [k for k, e in self._clients.items() if e.last_used < cutoff]:
+            self._drop(key)
+
+    def _drop(self, key):
+        entry = self._clients.pop(key)
+        entry.http.close()
+        self.evictions += 1
+
+
+client_registry = ClientRegistry()
+
+
+def get_client(credentials=None, developer_key=None):
+    return client_registry.get(credentials, developer_key)
+
+
+# Keep the response headers and raw body of a request for the caches
+# and the trace
+def _capture_response(request):
+    captured = {}
+    postproc = request.postproc
+
+    def capture(resp, content):
+        captured["etag"] = resp.get("etag")
+        captured["content"] = content
+        return postproc(resp, content)
+
+    request.postproc = capture
+    return captured
+
+
+# Run one API method and return the parsed response. Errors propagate so
+# callers can decide whether to report them or carry on. Every call is
+# admitted by the quota scheduler and charged to the quota ledger, against
+# the budget of the project its client is billed to. Public
+# GET responses are cached on disk and revalidated with If-None-Match.
+# Each call is traced with its method, a parameter hash, the response size
+# and the cache outcome. Transient failures are retried with backoff and
+# every endpoint sits behind a circuit breaker (see resilience). Identical
+# public requests made at the same time share one call (see singleflight);
+# requests from OAuth clients are only shared with the same credentials.
+def execute_request(client_library_function, **kwargs):
+    request = client_library_function(**kwargs)
+    method = request.methodId
+    user = getattr(request.http, "key", None)
+    project = getattr(request.http, "project", None)
+    key = cache_key(request)
+    with span("youtube.execute", method=method, params_hash=key[:16], cache="bypass") as call:
+        # Identical public requests from concurrent sessions share one call,
+        # and only that call is admitted and charged. OAuth clients may see
+        # their owner's private resources, so they only share with themselves.
+        if single_flight.enabled and not response_cache_bypassed() and is_public_request(request):
+            response, shared = single_flight.do(
+                (private_scope(request.http), key), lambda: _execute(request, method, user, project, call)
+            )
+            if shared:
+                call.set(cache="coalesced")
+            return response
+        return _execute(request, method, user, project, call)
+
+
+def _execute(request, method, user, project, call):
+    quota_scheduler.admit(method, user, project=project)
+    key = cached = None
+    if response_cache.active(request):
+        key = cache_key(request)
+        cached = response_cache.get(key)
+        if cached is not None:
+            request.headers["If-None-Match"] = cached.etag
+        call.set(cache="miss")
+    captured = _capture_response(request)
+
+    # Every attempt is charged, retries included
+    def attempt():
+        try:
+            return request.execute()
+        finally:
+            quota_ledger.record(method, user, project=project)
+
+    try:
+        response = call_with_retries(
+            attempt, method,
+            on_retry=lambda retry, error, delay: call.set(retries=retry, last_error=str(error))
+        )
+    except HttpError as e:
+        call.set(status=e.resp.status)
+        if cached is not None and e.resp.status == 304:
+            response_cache.touch(key)
+            call.set(cache="hit", bytes=cached.size)
+            return copy.deepcopy(cached.response)
+        if "quotaExceeded" in error_reasons(e):
+            quota_ledger.mark_exhausted(project)
+        raise
+
+    call.set(status=200, bytes=len(captured.get("content") or b""))
+    if key is not None:
+        response_cache.miss()
+        if captured.get("etag"):
+            response_cache.put(key, method, captured["etag"], response, captured["content"])
+    return response
+
+
+# Follow nextPageToken, yielding each page's response
+def iter_pages(client_library_function, max_pages=None, **kwargs):
+    pages = 0
+    while True:
+        response = execute_request(client_library_function, **kwargs)
+        yield response
+        pages += 1
+        page_token = response.get("nextPageToken")
+        if not page_token or (max_pages is not None and pages >= max_pages):
+            return
+        kwargs["pageToken"] = page_token